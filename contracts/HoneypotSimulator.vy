@@ -0,0 +1,132 @@
+# pragma version ~=0.4.3
+"""
+@title HoneypotSimulator
+@notice Buy-then-sell probe for honeypot and transfer-tax detection
+@dev Never deployed. The bot injects this contract's runtime bytecode at a
+     scratch address through an eth_call state override and calls simulate()
+     from a throwaway, balance-overridden account, so the whole round trip
+     costs a single RPC and nothing touches chain state.
+
+     The compiled runtime code is embedded in model/honeypot.py; after editing
+     this file, regenerate it with:
+         pip install vyper==0.4.3
+         vyper -f bytecode_runtime contracts/HoneypotSimulator.vy
+"""
+
+interface IERC20Minimal:
+    def balanceOf(account: address) -> uint256: view
+    def approve(spender: address, amount: uint256) -> bool: nonpayable
+
+interface IWETH9:
+    def deposit(): payable
+
+struct QuoteExactInputSingleParams:
+    tokenIn: address
+    tokenOut: address
+    amountIn: uint256
+    fee: uint24
+    sqrtPriceLimitX96: uint160
+
+struct ExactInputSingleParams:
+    tokenIn: address
+    tokenOut: address
+    fee: uint24
+    recipient: address
+    amountIn: uint256
+    amountOutMinimum: uint256
+    sqrtPriceLimitX96: uint160
+
+interface ISwapRouter02:
+    def exactInputSingle(params: ExactInputSingleParams) -> uint256: payable
+
+MAX_FEE_TIERS: constant(uint256) = 8
+
+
+@internal
+def _quote(quoter: address, token_in: address, token_out: address, amount: uint256, fee: uint24) -> uint256:
+    # A reverting quote (no pool on this tier) reads as zero
+    success: bool = False
+    response: Bytes[128] = b""
+    success, response = raw_call(
+        quoter,
+        abi_encode(
+            QuoteExactInputSingleParams(tokenIn=token_in, tokenOut=token_out, amountIn=amount, fee=fee, sqrtPriceLimitX96=0),
+            method_id=method_id("quoteExactInputSingle((address,address,uint256,uint24,uint160))"),
+        ),
+        max_outsize=128,
+        revert_on_failure=False,
+    )
+    if not success or len(response) < 32:
+        return 0
+    return convert(slice(response, 0, 32), uint256)
+
+
+@external
+@payable
+def simulate(
+    router: address,
+    quoter: address,
+    weth: address,
+    token: address,
+    fees: DynArray[uint24, MAX_FEE_TIERS],
+) -> (uint24, uint256, uint256, uint256, uint256, bool):
+    """
+    @notice Buys `token` with msg.value on the deepest of `fees` tiers, then sells everything back
+    @return (fee tier used, tokens quoted for the buy, tokens received (quoted minus
+            transfer tax), WETH quoted for selling them, WETH received from the sell,
+            whether the sell or its approval reverted)
+    """
+    # Pick the tier that quotes the most tokens
+    fee: uint24 = 0
+    buy_quoted: uint256 = 0
+    for tier: uint24 in fees:
+        amount_out: uint256 = self._quote(quoter, weth, token, msg.value, tier)
+        if amount_out > buy_quoted:
+            buy_quoted = amount_out
+            fee = tier
+    assert buy_quoted > 0, "no pool"
+
+    # Buy
+    extcall IWETH9(weth).deposit(value=msg.value)
+    extcall IERC20Minimal(weth).approve(router, max_value(uint256))
+    token_before: uint256 = staticcall IERC20Minimal(token).balanceOf(self)
+    extcall ISwapRouter02(router).exactInputSingle(
+        ExactInputSingleParams(
+            tokenIn=weth, tokenOut=token, fee=fee, recipient=self,
+            amountIn=msg.value, amountOutMinimum=0, sqrtPriceLimitX96=0,
+        )
+    )
+    buy_received: uint256 = staticcall IERC20Minimal(token).balanceOf(self) - token_before
+    if buy_received == 0:
+        return (fee, buy_quoted, 0, 0, 0, True)
+
+    # Sell everything back
+    sell_quoted: uint256 = self._quote(quoter, token, weth, buy_received, fee)
+
+    success: bool = False
+    response: Bytes[32] = b""
+    success, response = raw_call(
+        token,
+        abi_encode(router, max_value(uint256), method_id=method_id("approve(address,uint256)")),
+        max_outsize=32,
+        revert_on_failure=False,
+    )
+    if not success:
+        return (fee, buy_quoted, buy_received, sell_quoted, 0, True)
+
+    weth_before: uint256 = staticcall IERC20Minimal(weth).balanceOf(self)
+    success, response = raw_call(
+        router,
+        abi_encode(
+            ExactInputSingleParams(
+                tokenIn=token, tokenOut=weth, fee=fee, recipient=self,
+                amountIn=buy_received, amountOutMinimum=0, sqrtPriceLimitX96=0,
+            ),
+            method_id=method_id("exactInputSingle((address,address,uint24,address,uint256,uint256,uint160))"),
+        ),
+        max_outsize=32,
+        revert_on_failure=False,
+    )
+    if not success:
+        return (fee, buy_quoted, buy_received, sell_quoted, 0, True)
+    return (fee, buy_quoted, buy_received, sell_quoted, staticcall IERC20Minimal(weth).balanceOf(self) - weth_before, False)
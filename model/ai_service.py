@@ -56,6 +56,8 @@ class AIService:
             f"Liquidity: {token_data.get('liquidity')}\n"
             f"Renounced: {token_data.get('renounced')}\n"
             f"Honeypot: {token_data.get('honeypot')}\n"
+            f"Simulated buy/sell tax: {token_data.get('buy_tax')} / {token_data.get('sell_tax')}\n"
+            f"Bytecode risk flags: {', '.join(token_data.get('risks') or []) or 'none detected'}\n"
             f"\nProvide a concise 2-3 sentence summary of the risk level (Low, Medium, High) and why."
         )
 
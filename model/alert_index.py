@@ -0,0 +1,229 @@
+"""
+In-memory index of every active user alert, checked on each price tick, trade
+and listing.
+
+  price       - fires when a tick crosses target_value (USD) from either side,
+                i.e. the threshold lies between the previous tick and this one.
+                Ticks come from token lookups (get_token_info) only; there is no
+                background price feed, so an alert on a token nobody looks up
+                never fires
+  volume      - fires once the token's ETH volume for the UTC day reaches target_value
+  new_listing - a standing subscription to every listing the monitor finds
+
+Price and volume thresholds sit in a sorted list per token, so a tick finds the
+crossed ones with two bisects: O(log n + matches) however many alerts are set.
+Fired alerts leave the index immediately and are deactivated in the database in
+one write-behind batch per tick. Notifications go out on the outbox's alert
+lane, and a user's queued notifications merge into one digest.
+"""
+import bisect
+import math
+import os
+import time
+
+from dotenv import load_dotenv
+from eth_utils import is_address
+
+from outbox import LANE_ALERT, get_outbox
+from store_to_db import (
+    create_alert,
+    deactivate_alerts,
+    get_active_alerts,
+    get_token_day_volumes,
+    get_user_alerts,
+)
+from utils import shorten_address
+from write_behind import get_write_queue
+
+load_dotenv()
+
+MAX_ALERTS_PER_USER = int(os.getenv("BASEFLOW_MAX_ALERTS_PER_USER", "20"))
+WEI_PER_ETH = 10**18
+DAY_SECONDS = 86400
+
+PRICE = "price"
+VOLUME = "volume"
+NEW_LISTING = "new_listing"
+ALERT_TYPES = (PRICE, VOLUME, NEW_LISTING)
+
+ALERT_DIGEST_TITLE = "🔔 *{count} Alerts Triggered*\n━━━━━━━━━━━━━━━"
+
+
+def _today() -> int:
+    now = int(time.time())
+    return now - now % DAY_SECONDS
+
+
+class AlertIndex:
+    def __init__(self):
+        self._alerts = {}  # alert id -> (user_id, type, token, value)
+        self._thresholds = {PRICE: {}, VOLUME: {}}  # type -> token -> sorted [(value, alert id)]
+        self._listing_subscribers = {}  # user_id -> alert id
+        self._last_price = {}  # token -> previous tick
+        self._volumes = {}  # token -> ETH volume since _volume_day
+        self._volume_day = None
+        self.loaded = False
+
+    async def load(self) -> int:
+        """Load every active alert and today's volumes (called from post_init); returns the alert count."""
+        rows = await get_active_alerts()
+        for row in rows:
+            self._insert(row["id"], row["user_id"], row["type"], row["target"], row["value"], keep_sorted=False)
+        for tokens in self._thresholds.values():
+            for entries in tokens.values():
+                entries.sort()
+        self._volume_day = _today()
+        self._volumes = await get_token_day_volumes(self._volume_day)
+        self.loaded = True
+        return len(rows)
+
+    def _insert(self, alert_id: int, user_id: int, alert_type: str, token: str, value: float, keep_sorted: bool = True) -> None:
+        token = token.lower() if token else None
+        if alert_type == NEW_LISTING:
+            self._listing_subscribers[user_id] = alert_id
+        elif alert_type in self._thresholds and token and value is not None:
+            entries = self._thresholds[alert_type].setdefault(token, [])
+            if keep_sorted:
+                bisect.insort(entries, (value, alert_id))
+            else:
+                entries.append((value, alert_id))
+        else:
+            return
+        self._alerts[alert_id] = (user_id, alert_type, token, value)
+
+    def _discard(self, alert_id: int) -> None:
+        entry = self._alerts.pop(alert_id, None)
+        if entry is None:
+            return
+        user_id, alert_type, token, value = entry
+        if alert_type == NEW_LISTING:
+            self._listing_subscribers.pop(user_id, None)
+            return
+        tokens = self._thresholds[alert_type]
+        entries = tokens.get(token, [])
+        i = bisect.bisect_left(entries, (value, alert_id))
+        if i < len(entries) and entries[i] == (value, alert_id):
+            del entries[i]
+        if not entries:
+            tokens.pop(token, None)
+
+    async def add(self, user_id: int, alert_type: str, token: str = None, value: float = None) -> int:
+        """Store a new alert and start matching it; raises ValueError for a bad or duplicate alert."""
+        if alert_type not in ALERT_TYPES:
+            raise ValueError(f"Unknown alert type '{alert_type}'")
+        if alert_type == NEW_LISTING:
+            if user_id in self._listing_subscribers:
+                raise ValueError("You're already subscribed to new listings")
+            token = value = None
+        else:
+            if not token or not is_address(token):
+                raise ValueError("That isn't a valid token address")
+            if value is None or not math.isfinite(value) or value <= 0:
+                raise ValueError("The target must be a positive number")
+            token = token.lower()
+        if len(await get_user_alerts(user_id)) >= MAX_ALERTS_PER_USER:
+            raise ValueError(f"You can have at most {MAX_ALERTS_PER_USER} active alerts")
+
+        alert_id = await create_alert(user_id, alert_type, token, value)
+        self._insert(alert_id, user_id, alert_type, token, value)
+        return alert_id
+
+    async def remove_user_alerts(self, user_id: int, alert_type: str = None) -> int:
+        """Deactivate a user's alerts (only `alert_type` ones if given); returns how many."""
+        alert_ids = [a["id"] for a in await get_user_alerts(user_id) if alert_type in (None, a["type"])]
+        if not alert_ids:
+            return 0
+        await deactivate_alerts(alert_ids, triggered=False)
+        for alert_id in alert_ids:
+            self._discard(alert_id)
+        return len(alert_ids)
+
+    def last_price(self, token: str) -> float:
+        return self._last_price.get(token.lower())
+
+    def on_price(self, token: str, price: float) -> list:
+        """Match a USD price tick; returns the alerts it fired."""
+        if not self.loaded or price <= 0:
+            # A failed lookup reports 0; recording it would fire every alert below the price
+            return []
+        token = token.lower()
+        last = self._last_price.get(token)
+        self._last_price[token] = price
+        entries = self._thresholds[PRICE].get(token)
+        if not entries or last is None or price == last:
+            return []
+        if price > last:
+            # Rising: last < value <= price
+            lo = bisect.bisect_right(entries, (last, math.inf))
+            hi = bisect.bisect_right(entries, (price, math.inf))
+        else:
+            # Falling: price <= value < last
+            lo = bisect.bisect_left(entries, (price, -math.inf))
+            hi = bisect.bisect_left(entries, (last, -math.inf))
+        return self._fire(PRICE, token, lo, hi, price)
+
+    def on_volume(self, token: str, eth_value_wei: int) -> list:
+        """Add a trade to the token's volume for the day; returns the alerts it fired."""
+        if not self.loaded:
+            return []
+        day = _today()
+        if day != self._volume_day:
+            self._volume_day = day
+            self._volumes = {}
+        token = token.lower()
+        volume = self._volumes.get(token, 0.0) + (eth_value_wei or 0) / WEI_PER_ETH
+        self._volumes[token] = volume
+        entries = self._thresholds[VOLUME].get(token)
+        if not entries:
+            return []
+        return self._fire(VOLUME, token, 0, bisect.bisect_right(entries, (volume, math.inf)), volume)
+
+    def on_listing(self, text: str, summary: str, title: str) -> int:
+        """Queue a new-listing notification for every subscriber; returns how many."""
+        outbox = get_outbox()
+        for user_id in self._listing_subscribers:
+            outbox.submit(
+                user_id, text, lane=LANE_ALERT, digest="listings", summary=summary, title=title,
+                parse_mode="Markdown", disable_web_page_preview=True,
+            )
+        return len(self._listing_subscribers)
+
+    def _fire(self, alert_type: str, token: str, lo: int, hi: int, observed: float) -> list:
+        if lo >= hi:
+            return []
+        tokens = self._thresholds[alert_type]
+        entries = tokens[token]
+        fired = entries[lo:hi]
+        del entries[lo:hi]
+        if not entries:
+            del tokens[token]
+
+        alerts = []
+        for value, alert_id in fired:
+            user_id = self._alerts.pop(alert_id)[0]
+            alerts.append({"id": alert_id, "user_id": user_id, "type": alert_type, "target": token, "value": value})
+        get_write_queue().submit(deactivate_alerts, [a["id"] for a in alerts])
+
+        outbox = get_outbox()
+        for alert in alerts:
+            if alert_type == PRICE:
+                line = f"📈 `{shorten_address(token)}` crossed `${alert['value']:.8g}` (now `${observed:.8g}`)"
+                title = "🔔 *Price Alert*"
+            else:
+                line = f"📊 `{shorten_address(token)}` traded `{observed:.4g} ETH` today (target `{alert['value']:.4g} ETH`)"
+                title = "🔔 *Volume Alert*"
+            text = f"{title}\n━━━━━━━━━━━━━━━\n{line}\n\n[DexScreener](https://dexscreener.com/base/{token})"
+            outbox.submit(
+                alert["user_id"], text, lane=LANE_ALERT, digest="alerts", summary=line, title=ALERT_DIGEST_TITLE,
+                parse_mode="Markdown", disable_web_page_preview=True,
+            )
+        return alerts
+
+# Global instance for use in the bot
+_index = None
+
+def get_alert_index() -> AlertIndex:
+    global _index
+    if _index is None:
+        _index = AlertIndex()
+    return _index
@@ -0,0 +1,170 @@
+"""
+Vectorized backtester for the auto-buy and TP/SL settings.
+
+Every token the monitor caught is replayed from its first recorded candle as if
+auto-buy had fired there, and each (take-profit, stop-loss) pair in the grid is
+evaluated for all tokens at once with NumPy.
+"""
+import time
+
+import numpy as np
+
+DEFAULT_TP_GRID = (25.0, 50.0, 100.0, 200.0, 300.0, 500.0)
+DEFAULT_SL_GRID = (10.0, 20.0, 30.0, 50.0, 75.0)
+
+
+def load_price_paths(rows: list, max_hold: int = 86400):
+    """
+    Arrange listing candles (store_to_db.get_listing_candles rows) into padded
+    (tokens x steps) matrices.
+
+    Each row starts at the token's first candle (the simulated entry) and is cut
+    off `max_hold` seconds later. Missing tail steps are forward-filled.
+    Returns (tokens, entry, high, low, close) or None if there is no history.
+    """
+    if not rows:
+        return None
+
+    token_col = np.array([r[0] for r in rows])
+    data = np.array([r[1:] for r in rows], dtype=float)
+    tokens, start, group = np.unique(token_col, return_index=True, return_inverse=True)
+    pos = np.arange(len(rows)) - start[group]
+
+    keep = data[:, 0] - data[start, 0][group] <= max_hold
+    data, group, pos = data[keep], group[keep], pos[keep]
+
+    # Tokens with a single candle have no path to replay
+    counts = np.bincount(group, minlength=len(tokens))
+    valid = counts >= 2
+    if not valid.any():
+        return None
+    remap = np.cumsum(valid) - 1
+    mask = valid[group]
+    data, group, pos = data[mask], remap[group[mask]], pos[mask]
+    tokens = tokens[valid]
+
+    shape = (len(tokens), int(pos.max()) + 1)
+    high, low, close = (np.full(shape, np.nan) for _ in range(3))
+    high[group, pos] = data[:, 2]
+    low[group, pos] = data[:, 3]
+    close[group, pos] = data[:, 4]
+    entry = np.full(len(tokens), np.nan)
+    entry[group[pos == 0]] = data[pos == 0, 1]
+
+    # Forward-fill past each token's last candle
+    idx = np.where(np.isnan(close), 0, np.arange(shape[1]))
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    rows_idx = np.arange(shape[0])[:, None]
+    return tokens, entry, high[rows_idx, idx], low[rows_idx, idx], close[rows_idx, idx]
+
+
+def _first_reach(running: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    """
+    For non-decreasing rows, return the first step index at which each row reaches
+    each level (shape tokens x levels); rows that never reach a level get the row length.
+    All rows are searched in a single searchsorted call by offsetting them apart.
+    """
+    n_rows, n_steps = running.shape
+    # Values beyond the outermost levels don't change the answer; clipping keeps offsets small
+    lo, hi = levels.min() - 1, levels.max() + 1
+    running = np.clip(running, lo, hi)
+    span = hi - lo + 1
+    offsets = np.arange(n_rows)[:, None] * span
+    flat = (running - lo + offsets).ravel()
+    queries = (levels[None, :] - lo + offsets).ravel()
+    found = np.searchsorted(flat, queries, side="left").reshape(n_rows, len(levels))
+    return found - np.arange(n_rows)[:, None] * n_steps
+
+
+def simulate(entry, high, low, close, tp_grid, sl_grid, fee_pct: float = 1.0) -> np.ndarray:
+    """
+    Return per-trade returns with shape (tokens, len(tp_grid), len(sl_grid)).
+
+    Take-profit fills at +tp%, stop-loss at -sl%; when both trigger inside the same
+    candle the stop-loss is assumed to fill first. Positions that never exit are
+    marked to the last close. `fee_pct` is the round-trip cost deducted from each trade.
+    """
+    tp = np.asarray(tp_grid, dtype=float)
+    sl = np.asarray(sl_grid, dtype=float)
+    n_steps = close.shape[1]
+
+    rel_high = np.maximum.accumulate(high / entry[:, None], axis=1)
+    rel_low = np.maximum.accumulate(-low / entry[:, None], axis=1)
+    tp_idx = _first_reach(rel_high, 1 + tp / 100)
+    sl_idx = _first_reach(rel_low, -(1 - sl / 100))
+
+    tp_i = tp_idx[:, :, None]
+    sl_i = sl_idx[:, None, :]
+    final = (close[:, -1] / entry - 1)[:, None, None]
+
+    returns = np.where(
+        tp_i < sl_i,
+        (tp / 100)[None, :, None],
+        np.where(sl_i < n_steps, -(sl / 100)[None, None, :], final)
+    )
+    return returns - fee_pct / 100
+
+
+def run_backtest(
+    rows: list,
+    tp_grid=DEFAULT_TP_GRID,
+    sl_grid=DEFAULT_SL_GRID,
+    amount_eth: float = 0.1,
+    max_hold_hours: int = 24,
+    fee_pct: float = 1.0
+) -> dict:
+    """
+    Replay recorded listings against a grid of TP/SL settings.
+
+    Returns a dict with the grids, per-combination `win_rate`, `pnl_eth` and
+    `avg_return` matrices (tp x sl), the best combination and the token count.
+    """
+    started = time.perf_counter()
+    tp_grid = np.asarray(tp_grid, dtype=float)
+    sl_grid = np.asarray(sl_grid, dtype=float)
+
+    paths = load_price_paths(rows, max_hold_hours * 3600)
+    if paths is None:
+        return {"tokens": 0, "tp_grid": tp_grid, "sl_grid": sl_grid}
+
+    tokens, entry, high, low, close = paths
+    returns = simulate(entry, high, low, close, tp_grid, sl_grid, fee_pct)
+
+    win_rate = (returns > 0).mean(axis=0)
+    pnl_eth = returns.sum(axis=0) * amount_eth
+    best = np.unravel_index(np.argmax(pnl_eth), pnl_eth.shape)
+
+    return {
+        "tokens": len(tokens),
+        "tp_grid": tp_grid,
+        "sl_grid": sl_grid,
+        "win_rate": win_rate,
+        "pnl_eth": pnl_eth,
+        "avg_return": returns.mean(axis=0),
+        "best": {
+            "tp": float(tp_grid[best[0]]),
+            "sl": float(sl_grid[best[1]]),
+            "win_rate": float(win_rate[best]),
+            "pnl_eth": float(pnl_eth[best]),
+        },
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+def backtest_settings(settings: dict, rows: list) -> dict:
+    """
+    Backtest a user's own auto-buy settings, alongside the default grid for comparison.
+    """
+    tp, sl = float(settings["auto_sell_tp"]), float(settings["auto_sell_sl"])
+    tp_grid = sorted(set(DEFAULT_TP_GRID) | {tp})
+    sl_grid = sorted(set(DEFAULT_SL_GRID) | {sl})
+    result = run_backtest(rows, tp_grid, sl_grid, float(settings["auto_buy_amount"]))
+    if result["tokens"]:
+        i, j = tp_grid.index(tp), sl_grid.index(sl)
+        result["user"] = {
+            "tp": tp,
+            "sl": sl,
+            "win_rate": float(result["win_rate"][i, j]),
+            "pnl_eth": float(result["pnl_eth"][i, j]),
+        }
+    return result
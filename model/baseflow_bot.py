@@ -5,6 +5,7 @@ BaseFlow - Telegram-first trading bot for Base launchpad assets
 from typing import Final
 from store_to_db import init_db
 from telegram import (
+    Bot,
     Update, 
     ReplyKeyboardMarkup, 
     KeyboardButton
@@ -18,16 +19,21 @@ from telegram.ext import (
     ContextTypes,
     CallbackQueryHandler
 )
-from telegram.request import HTTPXRequest
+from telegram_http import make_request, pool_stats_loop
+from update_processor import PerUserUpdateProcessor
 import requests
 from commands import (
     start_command,
     price_command,
     Trades_command,
+    Export_command,
     help_command,
     Buysell_command,
     Settings_command,
+    Backtest_command,
     CreateWallet_command,
+    Vanity_command,
+    Alert_command,
     tip_command,
     profile_command,
     referral_command,
@@ -41,7 +47,9 @@ from commands import (
     message_handler
 )
 from dotenv import load_dotenv
+import asyncio
 import os
+import secrets
 
 load_dotenv()
 
@@ -51,9 +59,26 @@ init_db()  # Initialize the database when the script runs
 TELEGRAM_TOKEN = os.getenv('BASEFLOW_BOT_API')
 ALERTS_CHANNEL = os.getenv('BASEFLOW_ALERTS_CHANNEL') # e.g. @BaseFlowAlerts or -100...
 TOKEN: Final = TELEGRAM_TOKEN
+LISTING_DIGEST_TITLE = "🚀 *{count} New Base Listings* 🚀\n━━━━━━━━━━━━━━━"
+
+# "polling" (default) or "webhook". Webhook mode runs an embedded HTTP server that
+# Telegram pushes updates to; BASEFLOW_WEBHOOK_URL is its public https:// base URL
+# (typically a reverse proxy in front of BASEFLOW_WEBHOOK_LISTEN:BASEFLOW_WEBHOOK_PORT).
+UPDATE_MODE = os.getenv('BASEFLOW_UPDATE_MODE', 'polling').lower()
+WEBHOOK_URL = os.getenv('BASEFLOW_WEBHOOK_URL')
+WEBHOOK_LISTEN = os.getenv('BASEFLOW_WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('BASEFLOW_WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('BASEFLOW_WEBHOOK_PATH', 'telegram')
+# Telegram echoes this in X-Telegram-Bot-Api-Secret-Token; requests without it are
+# rejected. The webhook is re-registered on every start, so a random one works.
+WEBHOOK_SECRET = os.getenv('BASEFLOW_WEBHOOK_SECRET') or secrets.token_urlsafe(32)
+# Parallel connections Telegram may open to deliver updates (1-100)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('BASEFLOW_WEBHOOK_MAX_CONNECTIONS', '40'))
 
 # Global reference to Application (for background tasks to use the bot)
 _bot_app = None
+# Bot on the broadcast connection pool, used by the outbox (set by build_application)
+_broadcast_bot = None
 
 if not TOKEN:
     print("❌ Error: BASEFLOW_BOT_API not found in .env file!")
@@ -68,38 +93,70 @@ async def monitor_callback(token_address, pool_address):
     """
     from store_to_db import save_ai_signal
     from utils import shorten_address
+    from write_behind import get_write_queue
+    writes = get_write_queue()
     
     print(f"🚀 New Pool Detected: {token_address} at {pool_address}")
     
     # Save to DB for the dashboard
-    await save_ai_signal(token_address, "listing", f"New pool detected at {pool_address}")
+    writes.submit(save_ai_signal, token_address, "listing", f"New pool detected at {pool_address}")
+
+    # Bytecode scan: clones of a known template cost a single eth_getCode
+    risks = []
+    try:
+        from token_scanner import get_scanner
+        report = await get_scanner().scan(token_address)
+        risks = report["risks"]
+        if risks:
+            writes.submit(save_ai_signal, token_address, "security", "Bytecode flags: " + ", ".join(risks))
+    except Exception as e:
+        print(f"⚠️ Security scan failed for {token_address}: {e}")
+
+    # Honeypot probe: one state-override eth_call per listing
+    honeypot_line = "❔ Unchecked"
+    try:
+        from honeypot import get_honeypot_simulator
+        from utils import format_honeypot
+        probe = await get_honeypot_simulator().check(token_address)
+        honeypot_line = format_honeypot(probe)
+        if probe["honeypot"]:
+            writes.submit(save_ai_signal, token_address, "security", f"Honeypot: sell reverted={probe['sell_reverted']}, sell tax {probe['sell_tax']:.1%}")
+    except Exception as e:
+        print(f"⚠️ Honeypot check failed for {token_address}: {e}")
     
-    # Send to Community Channel
-    if ALERTS_CHANNEL and _bot_app:
-        try:
-            from telegram import InlineKeyboardMarkup, InlineKeyboardButton
-            
-            text = (
-                "🚀 *New Base Listing Detected!* 🚀\n"
-                "━━━━━━━━━━━━━━━\n"
-                f"🪙 *Token:* `{token_address}`\n"
-                f"💧 *Pool:* `{pool_address}`\n\n"
-                "🔍 *Quick Actions:*\n"
-                "• [Basescan](https://basescan.org/token/" + token_address + ")\n"
-                "• [DexScreener](https://dexscreener.com/base/" + token_address + ")\n"
-                "━━━━━━━━━━━━━━━\n"
-                "🤖 *Analyze instantly in @de_base_bot*"
-            )
-            
-            await _bot_app.bot.send_message(
-                chat_id=ALERTS_CHANNEL,
-                text=text,
-                parse_mode="Markdown",
-                disable_web_page_preview=True
-            )
-            print(f"📢 Alert sent to channel {ALERTS_CHANNEL}")
-        except Exception as e:
-            print(f"❌ Failed to send alert to channel: {e}")
+    text = (
+        "🚀 *New Base Listing Detected!* 🚀\n"
+        "━━━━━━━━━━━━━━━\n"
+        f"🪙 *Token:* `{token_address}`\n"
+        f"💧 *Pool:* `{pool_address}`\n"
+        f"🛡️ *Contract Flags:* {', '.join(risks) if risks else 'None detected'}\n"
+        f"🍯 *Honeypot:* {honeypot_line}\n\n"
+        "🔍 *Quick Actions:*\n"
+        "• [Basescan](https://basescan.org/token/" + token_address + ")\n"
+        "• [DexScreener](https://dexscreener.com/base/" + token_address + ")\n"
+        "━━━━━━━━━━━━━━━\n"
+        "🤖 *Analyze instantly in @de_base_bot*"
+    )
+    summary = (
+        f"• `{token_address}` | [Basescan](https://basescan.org/token/{token_address})"
+        f" | 🛡️ {', '.join(risks) if risks else 'No flags'} | 🍯 {honeypot_line}"
+    )
+
+    # Send to Community Channel, through the outbox: a burst of listings is merged
+    # into digests instead of tripping Telegram's per-channel limit
+    if ALERTS_CHANNEL:
+        from outbox import LANE_BROADCAST, get_outbox
+        get_outbox().submit(
+            ALERTS_CHANNEL, text, lane=LANE_BROADCAST, digest="listings", summary=summary,
+            title=LISTING_DIGEST_TITLE, parse_mode="Markdown", disable_web_page_preview=True,
+        )
+        print(f"📢 Alert queued for channel {ALERTS_CHANNEL}")
+
+    # And to every user subscribed with /alert listings
+    from alert_index import get_alert_index
+    subscribers = get_alert_index().on_listing(text, summary, LISTING_DIGEST_TITLE)
+    if subscribers:
+        print(f"🔔 Listing alert queued for {subscribers} subscribers")
 
 async def post_init(application: Application):
     """
@@ -107,45 +164,87 @@ async def post_init(application: Application):
     """
     global _bot_app
     _bot_app = application
-    
+    await _broadcast_bot.initialize()
+    asyncio.create_task(pool_stats_loop())
+
+    from outbox import get_outbox
+    get_outbox().start(_broadcast_bot)
+
+    from alert_index import get_alert_index
+    alerts = await get_alert_index().load()
+    print(f"🔔 Alert index loaded ({alerts} active alerts).")
+
+    from key_vault import get_vault
+    vault = get_vault()
+    if vault.is_active:
+        sealed = await vault.seal_plaintext_keys()
+        print(f"🔐 Key vault active ({sealed} plaintext keys sealed).")
+    else:
+        print("⚠️ BASEFLOW_VAULT_PASSPHRASE not set: wallet keys are stored unencrypted.")
+
     from monitor import get_monitor
     monitor = get_monitor()
     asyncio.create_task(monitor.watch_new_pools(monitor_callback))
     print("✅ Background monitor started.")
 
+    from maintenance import maintenance_loop
+    asyncio.create_task(maintenance_loop())
+    print("✅ Database maintenance scheduled.")
 
-if __name__ == '__main__':
-    print('Starting BaseFlow Bot......')
-    import asyncio
-    
-    # Configure request with longer timeouts for slower connections
-    request = HTTPXRequest(
-        connection_pool_size=8,
-        connect_timeout=30.0,
-        read_timeout=30.0,
-        write_timeout=30.0,
-        pool_timeout=30.0,
-    )
-    
-    # Build application with custom request settings
-    app = (
+async def post_shutdown(application: Application):
+    """
+    Release background workers on shutdown.
+    """
+    from charts import get_chart_service
+    from outbox import get_outbox
+    from storage import get_storage
+    from write_behind import get_write_queue
+    get_chart_service().shutdown()
+    await get_outbox().close()
+    await _broadcast_bot.shutdown()
+    await get_write_queue().close()
+    await get_storage().close()
+
+
+def build_application(base_url: str = None, background_tasks: bool = True) -> Application:
+    """
+    Build the bot with every handler registered. `base_url` points it at another
+    Bot API server (webhook_bench.py's stand-in); without `background_tasks` the
+    monitor, maintenance and key sealing aren't started.
+    """
+    global _broadcast_bot
+    # Separate connection pools so the long poll and broadcasts never hold
+    # connections a user's reply is waiting for (see telegram_http.py)
+    bot_urls = {"base_url": base_url} if base_url else {}
+    _broadcast_bot = Bot(TOKEN, request=make_request("broadcast"), **bot_urls)
+
+    builder = (
         ApplicationBuilder()
         .token(TOKEN)
-        .request(request)
-        .get_updates_request(request)
-        .post_init(post_init)
-        .build()
+        .request(make_request("interactive"))
+        .get_updates_request(make_request("updates"))
+        .concurrent_updates(PerUserUpdateProcessor())
+        .post_shutdown(post_shutdown)
     )
+    if base_url:
+        builder = builder.base_url(base_url)
+    if background_tasks:
+        builder = builder.post_init(post_init)
+    app = builder.build()
 
     # Default commands
     app.add_handler(CommandHandler('start', start_command))
     app.add_handler(CommandHandler('prices', price_command))
     app.add_handler(CommandHandler('buysell', Buysell_command))
     app.add_handler(CommandHandler('wallet', CreateWallet_command))
+    app.add_handler(CommandHandler('vanity', Vanity_command))
+    app.add_handler(CommandHandler('alert', Alert_command))
     app.add_handler(CommandHandler('tip', tip_command))
     app.add_handler(CommandHandler('profile', profile_command))
     app.add_handler(CommandHandler('Trades', Trades_command))
+    app.add_handler(CommandHandler('export', Export_command))
     app.add_handler(CommandHandler('settings', Settings_command))
+    app.add_handler(CommandHandler('backtest', Backtest_command))
     app.add_handler(CommandHandler('help', help_command))
     app.add_handler(CommandHandler('referral', referral_command))
     app.add_handler(CommandHandler('leaderboard', Leaderboard_command))
@@ -157,22 +256,48 @@ if __name__ == '__main__':
 
     # Errors
     app.add_error_handler(error)
+    return app
+
+
+if __name__ == '__main__':
+    print('Starting BaseFlow Bot......')
+    app = build_application()
 
-    # Bot Polling with longer timeout
     print('BaseFlow is now running...')
     print('Waiting for user interactions...')
-    print('(If you see timeout errors, check your internet connection)')
-    
-    try:
-        app.run_polling(
-            poll_interval=3,
-            timeout=30,
-            drop_pending_updates=True  # Start fresh, ignore old messages
+
+    if UPDATE_MODE == "webhook":
+        if not WEBHOOK_URL:
+            print("❌ Error: BASEFLOW_UPDATE_MODE=webhook needs BASEFLOW_WEBHOOK_URL (the public https:// base URL)")
+            import sys
+            sys.exit(1)
+        print(f"🌐 Webhook mode: listening on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}")
+        # Telegram opens up to max_connections parallel requests; each update is
+        # acknowledged on arrival and handled by the concurrent update processor
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            drop_pending_updates=True
         )
-    except Exception as e:
-        print(f"❌ Failed to start bot: {e}")
-        print("\\nPossible causes:")
-        print("1. No internet connection")
-        print("2. Telegram is blocked in your network (try VPN)")
-        print("3. Invalid bot token")
-        print("4. Firewall blocking outgoing connections")
+    else:
+        # Bot Polling with longer timeout
+        print('(If you see timeout errors, check your internet connection)')
+        try:
+            # Long polling already waits server-side for up to `timeout`
+            # seconds; no extra pause between polls
+            app.run_polling(
+                poll_interval=0,
+                timeout=30,
+                drop_pending_updates=True  # Start fresh, ignore old messages
+            )
+        except Exception as e:
+            print(f"❌ Failed to start bot: {e}")
+            print("\\nPossible causes:")
+            print("1. No internet connection")
+            print("2. Telegram is blocked in your network (try VPN)")
+            print("3. Invalid bot token")
+            print("4. Firewall blocking outgoing connections")
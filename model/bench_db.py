@@ -0,0 +1,85 @@
+"""
+Storage layer benchmark: connect-per-call (the old store_to_db pattern) vs the
+pooled WAL layer in db.py. Runs against a throwaway database, never wallet.db.
+
+Usage: python bench_db.py [operations]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from db import Database
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    tx_hash TEXT UNIQUE NOT NULL,
+    amount_in TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)'''
+INSERT_SQL = "INSERT INTO trades (user_id, tx_hash, amount_in) VALUES (?, ?, ?)"
+SELECT_SQL = "SELECT tx_hash, amount_in FROM trades WHERE user_id = ? ORDER BY created_at DESC LIMIT 10"
+
+
+def bench_connect_per_call(path: str, ops: int) -> tuple:
+    """Open, execute, commit and close for every call, like the original store_to_db."""
+    conn = sqlite3.connect(path)
+    conn.execute(SCHEMA)
+    conn.commit()
+    conn.close()
+
+    started = time.perf_counter()
+    for i in range(ops):
+        conn = sqlite3.connect(path)
+        conn.execute(INSERT_SQL, (i % 100, f"0x{i:064x}", "0.1"))
+        conn.commit()
+        conn.close()
+    writes = ops / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for i in range(ops):
+        conn = sqlite3.connect(path)
+        conn.execute(SELECT_SQL, (i % 100,)).fetchall()
+        conn.close()
+    reads = ops / (time.perf_counter() - started)
+    return writes, reads
+
+
+def bench_pooled(path: str, ops: int) -> tuple:
+    db = Database(path)
+    with db.writer() as conn:
+        conn.execute(SCHEMA)
+
+    started = time.perf_counter()
+    for i in range(ops):
+        with db.writer() as conn:
+            conn.execute(INSERT_SQL, (i % 100, f"0x{i:064x}", "0.1"))
+    writes = ops / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for i in range(ops):
+        with db.reader() as conn:
+            conn.execute(SELECT_SQL, (i % 100,)).fetchall()
+    reads = ops / (time.perf_counter() - started)
+    db.close()
+    return writes, reads
+
+
+def main():
+    ops = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        before = bench_connect_per_call(os.path.join(tmp, "before.db"), ops)
+        after = bench_pooled(os.path.join(tmp, "after.db"), ops)
+
+    print(f"📊 SQLite storage benchmark ({ops} ops each)")
+    print(f"{'':<18}{'writes/sec':>12}{'reads/sec':>12}")
+    print(f"{'connect-per-call':<18}{before[0]:>12.0f}{before[1]:>12.0f}")
+    print(f"{'pooled WAL':<18}{after[0]:>12.0f}{after[1]:>12.0f}")
+    print(f"{'speedup':<18}{after[0] / before[0]:>11.1f}x{after[1] / before[1]:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
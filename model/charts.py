@@ -0,0 +1,144 @@
+"""
+Token price charts rendered from the locally stored 1-minute candles.
+
+Rendering happens in a process pool so matplotlib never blocks the bot loop,
+and finished images are cached by (token, timeframe, last candle time): a hot
+token's chart is drawn once per candle no matter how many users ask for it.
+"""
+import asyncio
+import io
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from store_to_db import get_candles
+
+# Candle size in seconds for each selectable timeframe
+TIMEFRAMES = {
+    "5m": 300,
+    "15m": 900,
+    "1h": 3600,
+    "4h": 14400,
+}
+DEFAULT_TIMEFRAME = "15m"
+CANDLES_PER_CHART = 60
+
+
+def aggregate_candles(rows: list, size: int) -> list:
+    """
+    Merge 1-minute (open_time, open, high, low, close) rows into `size`-second candles.
+    Rows must be sorted by open_time.
+    """
+    candles = []
+    for open_time, o, h, l, c in rows:
+        bucket = open_time - open_time % size
+        if candles and candles[-1][0] == bucket:
+            t, co, ch, cl, _ = candles[-1]
+            candles[-1] = (t, co, max(ch, h), min(cl, l), c)
+        else:
+            candles.append((bucket, o, h, l, c))
+    return candles
+
+
+def _render_png(title: str, timeframe: str, candles: list) -> bytes:
+    """Draw a candlestick chart and return it as PNG bytes (runs in a worker process)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from datetime import datetime, timezone
+
+    fig, ax = plt.subplots(figsize=(8, 4), dpi=110)
+    fig.patch.set_facecolor("#0b1220")
+    ax.set_facecolor("#0b1220")
+
+    for i, (_, o, h, l, c) in enumerate(candles):
+        color = "#16c784" if c >= o else "#ea3943"
+        ax.vlines(i, l, h, color=color, linewidth=1)
+        body = abs(c - o) or max(h - l, c) * 0.002  # keep dojis visible
+        ax.bar(i, body, bottom=min(o, c), width=0.6, color=color)
+
+    step = max(1, len(candles) // 6)
+    ticks = list(range(0, len(candles), step))
+    fmt = "%H:%M" if TIMEFRAMES[timeframe] < 3600 else "%d %b %H:%M"
+    ax.set_xticks(ticks)
+    ax.set_xticklabels(
+        [datetime.fromtimestamp(candles[i][0], tz=timezone.utc).strftime(fmt) for i in ticks],
+        color="#9aa4b2", fontsize=8
+    )
+    ax.tick_params(axis="y", colors="#9aa4b2", labelsize=8)
+    ax.yaxis.tick_right()
+    ax.grid(color="#1f2a3c", linewidth=0.5)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    ax.set_title(f"{title} · {timeframe} · USD", color="white", fontsize=11, loc="left")
+
+    buf = io.BytesIO()
+    fig.tight_layout()
+    fig.savefig(buf, format="png", facecolor=fig.get_facecolor())
+    plt.close(fig)
+    return buf.getvalue()
+
+
+class ChartService:
+    def __init__(self, max_workers: int = 2, cache_size: int = 256):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._executor = None
+        self._cache = OrderedDict()
+        self._inflight = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def get_chart(self, token_address: str, timeframe: str = DEFAULT_TIMEFRAME, title: str = None):
+        """
+        Return PNG bytes for the token's chart, or None if there are not enough candles yet.
+        """
+        size = TIMEFRAMES[timeframe]
+        token = token_address.lower()
+        since = int(time.time()) - size * CANDLES_PER_CHART
+        rows = await get_candles(token, since - since % size)
+        candles = aggregate_candles(rows, size)[-CANDLES_PER_CHART:]
+        if len(candles) < 2:
+            return None
+
+        key = (token, timeframe, candles[-1][0])
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        # Concurrent requests for the same chart share a single render
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self._get_executor(), _render_png, title or token_address, timeframe, candles
+            )
+            self._inflight[key] = future
+        try:
+            png = await future
+        finally:
+            self._inflight.pop(key, None)
+
+        self._cache[key] = png
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return png
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Global instance for use in the bot
+_chart_service = None
+
+def get_chart_service() -> ChartService:
+    global _chart_service
+    if _chart_service is None:
+        workers = int(os.getenv("BASEFLOW_CHART_WORKERS", "2"))
+        _chart_service = ChartService(max_workers=workers)
+    return _chart_service
@@ -1,9 +1,10 @@
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton, ForceReply
 from telegram.ext import ContextTypes
 from decimal import Decimal
-from utils import shorten_address
+from utils import shorten_address, format_honeypot
 from store_to_db import (
     create_wallet_db, 
+    create_wallets_db,
     fetch_all_from_wallet, 
     fetch_from_wallet, 
     init_db, 
@@ -14,6 +15,7 @@ from store_to_db import (
     register_user,
     get_referral_stats,
     get_leaderboard,
+    get_window_leaderboard,
     update_user_settings,
     get_user_settings,
     save_ai_signal,
@@ -21,12 +23,16 @@ from store_to_db import (
     create_alert,
     get_user_alerts,
     get_trade_count,
-    get_user_trades
+    get_user_trades,
+    export_user_trades
 )
 from api import get_eth_price
 from telegram.helpers import escape_markdown
-from generate_wallet import generate_wallet
+from key_vault import get_vault
 import asyncio
+import os
+import tempfile
+import time
 
 # Note: web3 and trader are imported lazily to avoid slow startup
 _trader = None
@@ -186,6 +192,15 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         
         elif query.data == "trades":
             await Trades_command(update, context)
+
+        elif query.data.startswith("trades_older_"):
+            await Trades_command(update, context, before=_trade_cursor(query.data))
+
+        elif query.data.startswith("trades_newer_"):
+            await Trades_command(update, context, after=_trade_cursor(query.data))
+
+        elif query.data == "export_trades":
+            await Export_command(update, context)
         
         elif query.data == "profile":
             await profile_command(update, context)
@@ -198,6 +213,9 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             
         elif query.data == "leaderboard":
             await Leaderboard_command(update, context)
+
+        elif query.data.startswith("leaderboard_"):
+            await Leaderboard_command(update, context, query.data.split('_')[1])
         
         elif query.data == "settings":
             await Settings_command(update, context)
@@ -229,6 +247,11 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         elif query.data.startswith('look_'):
             token_address = query.data.split('_')[1]
             await look_token(update, context, token_address)
+
+        elif query.data.startswith('chart_'):
+            parts = query.data.split('_')
+            timeframe = parts[2] if len(parts) > 2 else None
+            await chart_command(update, context, parts[1], timeframe)
         
         # === WALLET ACTIONS ===
         elif query.data == "Generate_wallet":
@@ -246,6 +269,14 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await send_or_edit(update, text, reply_markup)
             context.user_data["awaiting_confirmation"] = "remove_all"
         
+        elif query.data == "vanity":
+            await Vanity_command(update, context)
+
+        elif query.data == "vanity_cancel":
+            running = _vanity_jobs.get(update.effective_user.id)
+            if running:
+                running[0].cancel()
+
         elif query.data == "import_wallet":
             await import_wallet_prompt(update, context)
         
@@ -295,7 +326,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             # This is the initial "Buy Token" click from analyze_token
             token_address = query.data.split('_')[1]
             user_id = update.effective_user.id
-            wallets = fetch_all_from_wallet(user_id)
+            wallets = await fetch_all_from_wallet(user_id)
             
             # Save context for next steps
             context.user_data['trade_token'] = token_address
@@ -347,6 +378,9 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await update_user_settings(user_id, gas_price_mode=mode)
             await Settings_command(update, context)
 
+        elif query.data == "backtest":
+            await Backtest_command(update, context)
+
         elif query.data == "config_tpsl":
             text = "🚀 *Set TP/SL Targets*\n\nEnter the Take Profit % (e.g., 100):"
             context.user_data["awaiting_config"] = "auto_sell_tp"
@@ -388,7 +422,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             token_addr = query.data.split('_')[2]
             context.user_data['trade_token'] = token_addr
             user_id = update.effective_user.id
-            wallets = fetch_all_from_wallet(user_id)
+            wallets = await fetch_all_from_wallet(user_id)
             
             held_wallets = []
             trader = get_trader()
@@ -472,11 +506,10 @@ async def execute_buy(update: Update, context: ContextTypes.DEFAULT_TYPE, wallet
             await status_msg.edit_text("❌ *Error:* Trading engine not configured. Router contract not set.", parse_mode="Markdown")
             return
             
-        # Find private key from DB
-        wallets = fetch_all_from_wallet(user_id)
-        pk = next((w["private_key"] for w in wallets if w["address"].lower() == wallet_addr.lower()), None)
+        # Fetch (and decrypt) only this wallet's key
+        signer = await get_vault().get_signer(user_id, wallet_addr)
         
-        if not pk:
+        if not signer:
             await status_msg.edit_text("❌ *Error:* Could not find private key for this wallet.", parse_mode="Markdown")
             return
 
@@ -484,7 +517,7 @@ async def execute_buy(update: Update, context: ContextTypes.DEFAULT_TYPE, wallet
         result = await trader.swap_eth_for_tokens(
             token_out=token_addr,
             wallet=wallet_addr,
-            key=pk,
+            key=signer.key,
             amount_eth=Decimal(amount),
             user_id=user_id
         )
@@ -500,7 +533,10 @@ async def execute_buy(update: Update, context: ContextTypes.DEFAULT_TYPE, wallet
             await status_msg.edit_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="Markdown")
         else:
             print(f"Swap Failed: {result.get('error')}")
-            await status_msg.edit_text("❌ *Swap Failed:* We couldn't complete the purchase. This could be due to gas issues or price movement.", parse_mode="Markdown")
+            if result.get("simulated"):
+                await status_msg.edit_text("🚫 *Trade Rejected:* A pre-flight simulation shows this buy would revert (honeypot, insufficient liquidity or slippage). No gas was spent.", parse_mode="Markdown")
+            else:
+                await status_msg.edit_text("❌ *Swap Failed:* We couldn't complete the purchase. This could be due to gas issues or price movement.", parse_mode="Markdown")
             
     except Exception as e:
         print(f"ERROR in execute_buy: {e}")
@@ -519,10 +555,9 @@ async def execute_sell(update: Update, context: ContextTypes.DEFAULT_TYPE, walle
     
     try:
         trader = get_trader()
-        wallets = fetch_all_from_wallet(user_id)
-        pk = next((w["private_key"] for w in wallets if w["address"].lower() == wallet_addr.lower()), None)
+        signer = await get_vault().get_signer(user_id, wallet_addr)
         
-        if not pk:
+        if not signer:
             await query.message.edit_text("❌ *Error:* Could not find private key for this wallet.")
             return
 
@@ -530,7 +565,7 @@ async def execute_sell(update: Update, context: ContextTypes.DEFAULT_TYPE, walle
         result = await trader.swap_tokens_for_eth(
             token_in=token_addr,
             wallet=wallet_addr,
-            key=pk,
+            key=signer.key,
             amount_token=Decimal(amount),
             user_id=user_id
         )
@@ -546,7 +581,10 @@ async def execute_sell(update: Update, context: ContextTypes.DEFAULT_TYPE, walle
             await query.message.edit_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="Markdown")
         else:
             print(f"Sell Failed: {result.get('error')}")
-            await query.message.edit_text("❌ *Sell Failed:* We couldn't complete the sale. This could be due to low liquidity or extreme volatility.")
+            if result.get("simulated"):
+                await query.message.edit_text("🚫 *Trade Rejected:* A pre-flight simulation shows this sell would revert (transfer restrictions, insufficient liquidity or slippage). No gas was spent.", parse_mode="Markdown")
+            else:
+                await query.message.edit_text("❌ *Sell Failed:* We couldn't complete the sale. This could be due to low liquidity or extreme volatility.")
             
     except Exception as e:
         print(f"ERROR in execute_sell: {e}")
@@ -574,24 +612,72 @@ async def show_wallet_details(update: Update, address: str):
     ]
     await send_or_edit(update, text, InlineKeyboardMarkup(keyboard))
 
-async def Trades_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+TRADES_PAGE_SIZE = 8
+
+def _trade_cursor(data: str) -> tuple:
+    """Parse a "trades_<older|newer>_<id>_<created_at>" callback into a (created_at, id) cursor."""
+    _, _, trade_id, created_at = data.split('_', 3)
+    return created_at, int(trade_id)
+
+async def Trades_command(update: Update, context: ContextTypes.DEFAULT_TYPE, before: tuple = None, after: tuple = None) -> None:
     user_id = update.effective_user.id
-    trades = get_user_trades(user_id, limit=5)
+    # One extra row tells us whether there is another page in that direction
+    trades = await get_user_trades(user_id, limit=TRADES_PAGE_SIZE + 1, before=before, after=after)
+    more = len(trades) > TRADES_PAGE_SIZE
+    if more:
+        trades = trades[1:] if after is not None else trades[:-1]
+    has_newer = after is not None and more or before is not None
+    has_older = after is not None or more
     
     if not trades:
         text = "📊 *Recent Trades*\n\nNo trades found in your history. Go to /buysell to start trading!"
     else:
-        text = "📊 *Recent Trades*\n━━━━━━━━━━━━━━━\n"
+        text = "📊 *Trade History*\n━━━━━━━━━━━━━━━\n"
         for t in trades:
             status = "🟢" if t["status"] == "success" else "🔴"
-            text += f"{status} *{t['trade_type'].upper()}* | {t['amount_in']} → {t['amount_out']}\n"
+            text += f"{status} *{t['trade_type'].upper()}* | {t['amount_in']} → {t['amount_out']} | `{str(t['created_at'])[:16]}`\n"
     
-    keyboard = [[InlineKeyboardButton("⬅️ Menu", callback_data="start"), InlineKeyboardButton("❌ Close", callback_data="close")]]
+    keyboard = []
+    page_buttons = []
+    if trades and has_newer:
+        page_buttons.append(InlineKeyboardButton("⬅️ Newer", callback_data=f"trades_newer_{trades[0]['id']}_{trades[0]['created_at']}"))
+    if trades and has_older:
+        page_buttons.append(InlineKeyboardButton("Older ➡️", callback_data=f"trades_older_{trades[-1]['id']}_{trades[-1]['created_at']}"))
+    if page_buttons:
+        keyboard.append(page_buttons)
+    if trades:
+        keyboard.append([InlineKeyboardButton("📤 Export CSV", callback_data="export_trades")])
+    keyboard.append([InlineKeyboardButton("⬅️ Menu", callback_data="start"), InlineKeyboardButton("❌ Close", callback_data="close")])
     await send_or_edit(update, text, InlineKeyboardMarkup(keyboard))
 
+async def Export_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Sends the user's full trade history as a CSV document."""
+    user_id = update.effective_user.id
+    msg = update.callback_query.message if update.callback_query else update.message
+    status_msg = await msg.reply_text("📤 *Preparing your trade history...*", parse_mode="Markdown")
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, f"baseflow_trades_{user_id}.csv")
+            count = await export_user_trades(user_id, path)
+            if not count:
+                await status_msg.edit_text("📊 No trades to export yet. Go to /buysell to start trading!")
+                return
+            with open(path, "rb") as f:
+                await msg.reply_document(
+                    document=f,
+                    filename=f"baseflow_trades_{user_id}.csv",
+                    caption=f"📊 *Trade history:* `{count}` trades",
+                    parse_mode="Markdown"
+                )
+        await status_msg.delete()
+    except Exception as e:
+        print(f"ERROR in Export_command: {e}")
+        await status_msg.edit_text("❌ *Export failed.* Please try again shortly.", parse_mode="Markdown")
+
 async def CreateWallet_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    wallets = fetch_all_from_wallet(user_id)
+    wallets = await fetch_all_from_wallet(user_id)
     
     text = "💳 *Your Wallets*\n"
     if wallets:
@@ -607,6 +693,7 @@ async def CreateWallet_command(update: Update, context: ContextTypes.DEFAULT_TYP
     nav_buttons = [
         [InlineKeyboardButton("➕ Generate 1 Wallet", callback_data='Generate_wallet')],
         [InlineKeyboardButton("➕ Generate 5 Wallets", callback_data='5_wallets')],
+        [InlineKeyboardButton("🎯 Vanity Wallet", callback_data='vanity')],
         [InlineKeyboardButton("📥 Import Wallet", callback_data='import_wallet')],
         [InlineKeyboardButton("🗑️ Remove All", callback_data='remove_all')],
         [InlineKeyboardButton("⬅️ Menu", callback_data="start"), InlineKeyboardButton("❌ Close", callback_data="close")]
@@ -616,8 +703,8 @@ async def CreateWallet_command(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    wallets = fetch_all_from_wallet(user_id)
-    trade_count = get_trade_count(user_id)
+    wallets = await fetch_all_from_wallet(user_id)
+    trade_count = await get_trade_count(user_id)
     
     text = (
         f"👤 *Profile: @{update.effective_user.username or 'Trader'}*\n"
@@ -656,9 +743,14 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "━━━━━━━━━━━━━━━\n"
         "• `/start` - Access main dashboard\n"
         "• `/wallet` - Manage your trading wallets\n"
+        "• `/vanity <prefix> [suffix]` - Generate a wallet with a custom address\n"
+        "• `/alert` - Price, volume & new listing alerts\n"
         "• `/buysell` - Analyze and trade tokens\n"
         "• `/profile` - View your stats\n"
-        "• `/settings` - Configure slippage & fees\n\n"
+        "• `/Trades` - Browse your trade history\n"
+        "• `/export` - Download your full trade history (CSV)\n"
+        "• `/settings` - Configure slippage & fees\n"
+        "• `/backtest [days]` - Test your TP/SL settings on past listings\n\n"
         "❓ *Need Help?* Check our [Documentation](https://debase-bot.gitbook.io/debase_bot/) or join our [Community](https://t.me/+jNYLaVDd7lpjODJk)."
     )
     keyboard = [[InlineKeyboardButton("⬅️ Menu", callback_data="start"), InlineKeyboardButton("❌ Close", callback_data="close")]]
@@ -666,7 +758,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
 async def Settings_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    settings = get_user_settings(user_id)
+    settings = await get_user_settings(user_id)
     
     text = (
         "⚙️ *Settings*\n"
@@ -692,10 +784,62 @@ async def Settings_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             InlineKeyboardButton("⛽ Gas Price", callback_data="config_gas"),
             InlineKeyboardButton("🚀 TP/SL", callback_data="config_tpsl")
         ],
+        [InlineKeyboardButton("🧪 Backtest Settings", callback_data="backtest")],
         [InlineKeyboardButton("⬅️ Menu", callback_data="start"), InlineKeyboardButton("❌ Close", callback_data="close")]
     ]
     await send_or_edit(update, text, InlineKeyboardMarkup(keyboard))
 
+async def Backtest_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Replays recorded listings against the user's auto-buy and TP/SL settings."""
+    user_id = update.effective_user.id
+    settings = await get_user_settings(user_id)
+
+    days = 30
+    if context.args:
+        try:
+            days = max(1, min(int(context.args[0]), 90))
+        except ValueError:
+            pass
+
+    try:
+        from backtest import backtest_settings
+        from store_to_db import get_listing_candles
+        rows = await get_listing_candles(int(time.time()) - days * 86400)
+        result = await asyncio.to_thread(backtest_settings, settings, rows)
+    except Exception as e:
+        print(f"ERROR in Backtest_command: {e}")
+        result = None
+
+    keyboard = [
+        [InlineKeyboardButton("⚙️ Settings", callback_data="settings")],
+        [InlineKeyboardButton("⬅️ Menu", callback_data="start"), InlineKeyboardButton("❌ Close", callback_data="close")]
+    ]
+
+    if not result or not result["tokens"]:
+        text = (
+            "🧪 *Strategy Backtest*\n"
+            "━━━━━━━━━━━━━━━\n"
+            "Not enough recorded listing history to backtest yet. Check back once the monitor has collected more data."
+        )
+        await send_or_edit(update, text, InlineKeyboardMarkup(keyboard))
+        return
+
+    mine, best = result["user"], result["best"]
+    text = (
+        "🧪 *Strategy Backtest*\n"
+        "━━━━━━━━━━━━━━━\n"
+        f"📅 *Period:* last `{days}` days | *Listings:* `{result['tokens']}`\n"
+        f"💰 *Auto-Buy Amount:* `{settings['auto_buy_amount']} ETH`\n\n"
+        f"🎯 *Your TP/SL* (`{mine['tp']:g}%` / `{mine['sl']:g}%`)\n"
+        f"   Win rate: `{mine['win_rate']:.1%}` | PnL: `{mine['pnl_eth']:+.4f} ETH`\n\n"
+        f"🏆 *Best Tested* (`{best['tp']:g}%` / `{best['sl']:g}%`)\n"
+        f"   Win rate: `{best['win_rate']:.1%}` | PnL: `{best['pnl_eth']:+.4f} ETH`\n"
+        "━━━━━━━━━━━━━━━\n"
+        f"_Simulated {result['win_rate'].size} setting combos in {result['elapsed']:.2f}s. "
+        "Entries at first recorded price, 24h max hold, 1% round-trip fees. Past performance is not indicative of future results._"
+    )
+    await send_or_edit(update, text, InlineKeyboardMarkup(keyboard))
+
 async def price_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     # Just a quick ETH price check for now
     try:
@@ -719,23 +863,22 @@ async def analyze_token(update: Update, context: ContextTypes.DEFAULT_TYPE, toke
             return
 
         # Sprint 4: Auto-Buy Logic
-        settings = get_user_settings(user_id)
+        settings = await get_user_settings(user_id)
         if settings.get("auto_buy_enabled") and settings.get("auto_buy_amount", 0) > 0:
             # Auto-execute buy!
             auto_amt = settings["auto_buy_amount"]
             # Find a wallet with balance
-            wallets_full = fetch_all_from_wallet(user_id)
+            wallets_full = await fetch_all_from_wallet(user_id)
             exec_wallet = wallets_full[0]["address"] if wallets_full else None
             
             if exec_wallet:
                 await loading_msg.edit_text(f"🤖 *Auto-Buy Triggered!*\n\nExecuting buy for `{auto_amt} ETH` via `{shorten_address(exec_wallet)}`...", parse_mode="Markdown")
-                # We need the PK, which fetch_all_from_wallet now provides
-                pk = next((w["private_key"] for w in wallets_full if w["address"] == exec_wallet), None)
+                signer = await get_vault().get_signer(user_id, exec_wallet)
                 
                 result = await trader.swap_eth_for_tokens(
                     token_out=token_address,
                     wallet=exec_wallet,
-                    key=pk,
+                    key=signer.key,
                     amount_eth=Decimal(str(auto_amt)),
                     user_id=user_id
                 )
@@ -750,7 +893,7 @@ async def analyze_token(update: Update, context: ContextTypes.DEFAULT_TYPE, toke
                 
         # (Continue with normal analysis if auto-buy failed or was off)
         info = await trader.get_token_info(token_address)
-        wallets = fetch_all_from_wallet(user_id)
+        wallets = await fetch_all_from_wallet(user_id)
         total_token_balance = Decimal("0")
         held_wallets = []
         
@@ -760,6 +903,8 @@ async def analyze_token(update: Update, context: ContextTypes.DEFAULT_TYPE, toke
                 total_token_balance += bal
                 held_wallets.append((w["address"], bal))
 
+        risk_lines = "".join(f"- ⚠️ {r}\n" for r in info.get("risks", []))
+
         text = (
             f"🪙 *{info['name']} ({info['symbol']})*\n"
             f"━━━━━━━━━━━━━━━\n"
@@ -769,7 +914,8 @@ async def analyze_token(update: Update, context: ContextTypes.DEFAULT_TYPE, toke
             f"👤 *Your Balance:* `{total_token_balance} {info['symbol']}`\n\n"
             f"🛡️ *Safety Check:*\n"
             f"- Renounced: {'✅' if info['renounced'] else '❌'}\n"
-            f"- Honeypot: {'✅ Clean' if not info.get('honeypot', False) else '🚨 Warning'}\n"
+            f"- Honeypot: {format_honeypot(info)}\n"
+            f"{risk_lines}"
             f"━━━━━━━━━━━━━━━\n"
             f"🔗 [Basescan](https://basescan.org/token/{token_address}) | [DexScreener](https://dexscreener.com/base/{token_address})"
         )
@@ -781,7 +927,10 @@ async def analyze_token(update: Update, context: ContextTypes.DEFAULT_TYPE, toke
         if total_token_balance > 0:
             keyboard.append([InlineKeyboardButton("🚀 Sell Token", callback_data=f"sell_init_{token_address}")])
         
-        keyboard.append([InlineKeyboardButton("🤖 AI Security Analysis", callback_data=f"ai_analyze_{token_address}")])
+        keyboard.append([
+            InlineKeyboardButton("🤖 AI Security Analysis", callback_data=f"ai_analyze_{token_address}"),
+            InlineKeyboardButton("📈 Chart", callback_data=f"chart_{token_address}")
+        ])
         keyboard.append([InlineKeyboardButton("🔄 Refresh", callback_data=f"refresh_{token_address}")])
         keyboard.append([InlineKeyboardButton("⬅️ Back", callback_data="buysell"), InlineKeyboardButton("❌ Close", callback_data="close")])
         
@@ -800,14 +949,11 @@ async def wallet_callback_handler(update: Update, context: ContextTypes.DEFAULT_
     
     try:
         count = num if num > 0 else 1
-        results = []
-        for _ in range(count):
-            pk, addr = await generate_wallet()
-            await create_wallet_db(user_id, addr, pk, 0.0)
-            results.append((addr, pk))
+        # Derived from the user's HD seed and stored in one batch; only indexes are saved
+        results = await get_vault().create_hd_wallets(user_id, count)
         
         text = f"✅ *{count} Wallet(s) Generated!*\n━━━━━━━━━━━━━━━\n"
-        for addr, pk in results:
+        for pk, addr in results:
             text += f"📍 `{addr}`\n🔑 `<tg-spoiler>{pk}</tg-spoiler>`\n\n"
         
         text += "⚠️ *Save your private keys safely!* They will only be shown once."
@@ -819,6 +965,168 @@ async def wallet_callback_handler(update: Update, context: ContextTypes.DEFAULT_
         print(f"ERROR in wallet_callback_handler: {e}")
         await query.message.edit_text("❌ *Generation Failed:* We encountered an error while generating your wallets. Please try again.")
 
+# Running /vanity searches by user_id: (VanityJob, task). Each one uses every core.
+_vanity_jobs = {}
+
+async def Vanity_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Searches for a wallet whose address starts (and optionally ends) with the given hex."""
+    from vanity import VANITY_MAX_JOBS, VANITY_MAX_PATTERN, VanityJob, normalize_pattern
+    user_id = update.effective_user.id
+    keyboard = [[InlineKeyboardButton("⬅️ My Wallets", callback_data="wallet"), InlineKeyboardButton("❌ Close", callback_data="close")]]
+
+    if not context.args:
+        text = (
+            "🎯 *Vanity Wallet*\n"
+            "━━━━━━━━━━━━━━━\n"
+            "Generate a wallet with a recognizable address:\n"
+            "• `/vanity cafe` → `0xcafe…`\n"
+            "• `/vanity cafe 42` → `0xcafe…42`\n"
+            "• `/vanity - beef` → `0x…beef`\n\n"
+            f"Use up to `{VANITY_MAX_PATTERN}` characters from 0-9 and a-f. Each extra character takes ~16x longer."
+        )
+        await send_or_edit(update, text, InlineKeyboardMarkup(keyboard))
+        return
+
+    try:
+        prefix = normalize_pattern(context.args[0] if context.args[0] != "-" else "")
+        suffix = normalize_pattern(context.args[1] if len(context.args) > 1 else "")
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}.")
+        return
+    if not prefix and not suffix:
+        await update.message.reply_text("❌ Give a prefix and/or suffix, e.g. `/vanity cafe`.", parse_mode="Markdown")
+        return
+    if len(prefix) + len(suffix) > VANITY_MAX_PATTERN:
+        await update.message.reply_text(f"❌ Patterns are limited to {VANITY_MAX_PATTERN} characters in total.")
+        return
+    if user_id in _vanity_jobs:
+        await update.message.reply_text("⏳ Your previous vanity search is still running.")
+        return
+    if len(_vanity_jobs) >= VANITY_MAX_JOBS:
+        await update.message.reply_text("⏳ The vanity generator is busy. Please try again in a few minutes.")
+        return
+
+    job = VanityJob(1, prefix, suffix)
+    status_msg = await update.message.reply_text(
+        f"⏳ *Searching for* `0x{prefix}…{suffix}`\n\nExpected attempts: `~{job.expected_attempts:,}`",
+        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🛑 Cancel", callback_data="vanity_cancel")]]),
+        parse_mode="Markdown"
+    )
+    # Runs in the background so other updates (including Cancel) are handled meanwhile
+    _vanity_jobs[user_id] = (job, asyncio.create_task(_run_vanity_job(user_id, job, status_msg)))
+
+async def _run_vanity_job(user_id: int, job, status_msg) -> None:
+    pattern = f"0x{job.prefix}…{job.suffix}"
+    cancel_markup = InlineKeyboardMarkup([[InlineKeyboardButton("🛑 Cancel", callback_data="vanity_cancel")]])
+
+    async def report(progress: dict) -> None:
+        remaining = max(progress["expected_attempts"] - progress["attempts"], 0)
+        eta = f"~{remaining / progress['rate']:.0f}s" if progress["rate"] else "estimating..."
+        try:
+            await status_msg.edit_text(
+                f"⏳ *Searching for* `{pattern}`\n\n"
+                f"🔢 *Attempts:* `{progress['attempts']:,}` / `~{progress['expected_attempts']:,}`\n"
+                f"⚡ *Speed:* `{progress['rate']:,.0f}/s` | *ETA:* `{eta}`",
+                reply_markup=cancel_markup,
+                parse_mode="Markdown"
+            )
+        except Exception:
+            pass
+
+    results = []
+    try:
+        async for batch in job.stream(report):
+            await create_wallets_db(user_id, batch)
+            results.extend(batch)
+    except Exception as e:
+        print(f"ERROR in vanity search: {e}")
+    finally:
+        _vanity_jobs.pop(user_id, None)
+
+    keyboard = [[InlineKeyboardButton("⬅️ My Wallets", callback_data="wallet"), InlineKeyboardButton("❌ Close", callback_data="close")]]
+    if results:
+        pk, addr = results[0]
+        text = (
+            "✅ *Vanity Wallet Generated!*\n━━━━━━━━━━━━━━━\n"
+            f"📍 `{addr}`\n🔑 `<tg-spoiler>{pk}</tg-spoiler>`\n\n"
+            f"Found after `{job.progress()['attempts']:,}` attempts.\n"
+            "⚠️ *Save your private key safely!* It will only be shown once."
+        )
+    elif job.cancelled:
+        text = "🛑 *Vanity search cancelled.*"
+    elif job.timed_out:
+        text = f"⌛ *No match for* `{pattern}` *in time.* Try a shorter pattern."
+    else:
+        text = "❌ *Generation Failed:* We encountered an error while searching. Please try again."
+    await status_msg.edit_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="Markdown")
+
+async def Alert_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Lists the user's alerts, or sets a price, volume or new-listing alert."""
+    from alert_index import MAX_ALERTS_PER_USER, NEW_LISTING, get_alert_index
+    user_id = update.effective_user.id
+    index = get_alert_index()
+    args = [arg.lower() for arg in context.args or []]
+    keyboard = [[InlineKeyboardButton("⬅️ Menu", callback_data="start"), InlineKeyboardButton("❌ Close", callback_data="close")]]
+
+    if not args:
+        alerts = await get_user_alerts(user_id)
+        lines = []
+        for alert in alerts:
+            if alert["type"] == "price":
+                lines.append(f"📈 `{shorten_address(alert['target'])}` crosses `${alert['value']:.8g}`")
+            elif alert["type"] == "volume":
+                lines.append(f"📊 `{shorten_address(alert['target'])}` trades `{alert['value']:.4g} ETH` in a day")
+            elif alert["type"] == NEW_LISTING:
+                lines.append("🚀 Every new Base listing")
+        text = (
+            "🔔 *Alerts*\n"
+            "━━━━━━━━━━━━━━━\n"
+            + ("\n".join(lines) if lines else "_No active alerts._") + "\n\n"
+            "• `/alert price <token> <usd>` - when the price crosses a level\n"
+            "• `/alert volume <token> <eth>` - when a day's volume reaches a level\n"
+            "• `/alert listings` - every new listing (`/alert listings off` to stop)\n"
+            "• `/alert clear` - remove all your alerts\n\n"
+            f"_Up to {MAX_ALERTS_PER_USER} active alerts. Price and volume alerts fire once; "
+            "prices are checked whenever the token is looked up._"
+        )
+        await send_or_edit(update, text, InlineKeyboardMarkup(keyboard))
+        return
+
+    kind = args[0]
+    try:
+        if kind == "clear":
+            removed = await index.remove_user_alerts(user_id)
+            text = f"🗑️ Removed {removed} alert{'s' if removed != 1 else ''}."
+        elif kind in ("listings", "listing"):
+            if len(args) > 1 and args[1] == "off":
+                removed = await index.remove_user_alerts(user_id, NEW_LISTING)
+                text = "🔕 Unsubscribed from new listings." if removed else "ℹ️ You weren't subscribed to new listings."
+            else:
+                await index.add(user_id, NEW_LISTING)
+                text = "🚀 *Subscribed!* You'll get every new Base listing as it's detected."
+        elif kind in ("price", "volume"):
+            if len(args) < 3:
+                raise ValueError(f"Usage: /alert {kind} <token> <{'usd' if kind == 'price' else 'eth'}>")
+            try:
+                value = float(args[2].lstrip("$"))
+            except ValueError:
+                raise ValueError("The target must be a number")
+            token = args[1]
+            await index.add(user_id, kind, token, value)
+            if kind == "price":
+                current = index.last_price(token)
+                text = f"🔔 *Price alert set:* `{shorten_address(token)}` crossing `${value:.8g}`"
+                if current:
+                    text += f"\n\nLast price: `${current:.8g}`"
+            else:
+                text = f"🔔 *Volume alert set:* `{shorten_address(token)}` reaching `{value:.4g} ETH` in a day"
+        else:
+            raise ValueError("Unknown alert type. Send /alert for the options")
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}.")
+        return
+    await update.message.reply_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="Markdown")
+
 async def check_balance_command(address: str) -> float:
     try:
         trader = get_trader()
@@ -928,7 +1236,7 @@ async def token_swap(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
 async def referral_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Shows the user's referral dashboard."""
     user_id = update.effective_user.id
-    stats = get_referral_stats(user_id)
+    stats = await get_referral_stats(user_id)
     bot_username = context.bot.username
     
     # Generate referral link
@@ -969,11 +1277,22 @@ async def Copytrading_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     keyboard = [[InlineKeyboardButton("⬅️ Menu", callback_data="start"), InlineKeyboardButton("❌ Close", callback_data="close")]]
     await send_or_edit(update, text, InlineKeyboardMarkup(keyboard))
 
-async def Leaderboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Shows global top traders."""
-    top_traders = get_leaderboard(10)
+async def Leaderboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE, period: str = None) -> None:
+    """Shows global top traders, all-time or over the last 24h / 7d / 30d."""
+    from store_to_db import VOLUME_WINDOWS
+    if period is None and context.args:
+        period = context.args[0].lower()
+    if period not in VOLUME_WINDOWS:
+        period = "all"
+
+    if period == "all":
+        top_traders = await get_leaderboard(10)
+        title = "Global Leaderboard"
+    else:
+        top_traders = await get_window_leaderboard(period, 10)
+        title = f"Leaderboard · {period}"
     
-    text = "🏆 *Global Leaderboard*\n━━━━━━━━━━━━━━━\n"
+    text = f"🏆 *{title}*\n━━━━━━━━━━━━━━━\n"
     if not top_traders:
         text += "No trades recorded yet. Be the first to top the chart!"
     else:
@@ -983,7 +1302,13 @@ async def Leaderboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     text += "━━━━━━━━━━━━━━━\nGlobal ranking updates every 5 minutes."
     
-    keyboard = [[InlineKeyboardButton("⬅️ Menu", callback_data="start"), InlineKeyboardButton("❌ Close", callback_data="close")]]
+    keyboard = [
+        [
+            InlineKeyboardButton(f"{'• ' if p == period else ''}{label}", callback_data=f"leaderboard_{p}")
+            for p, label in (("24h", "24h"), ("7d", "7d"), ("30d", "30d"), ("all", "All-time"))
+        ],
+        [InlineKeyboardButton("⬅️ Menu", callback_data="start"), InlineKeyboardButton("❌ Close", callback_data="close")]
+    ]
     await send_or_edit(update, text, InlineKeyboardMarkup(keyboard))
 
 # ============ AI & Intelligence (Sprint 5) ============
@@ -998,7 +1323,7 @@ async def AI_intelligence_command(update: Update, context: ContextTypes.DEFAULT_
         return
 
     # Fetch latest signals from DB
-    signals = get_latest_ai_signals(3)
+    signals = await get_latest_ai_signals(3)
     
     text = (
         "🤖 *BaseFlow AI Intelligence*\n"
@@ -1039,14 +1364,16 @@ async def AI_scan_trends_callback(update: Update, context: ContextTypes.DEFAULT_
             return
 
         # Fetch volume data as a proxy for market activity
-        from store_to_db import get_total_volume
-        market_stats = get_total_volume()
-        
+        from store_to_db import get_total_volume, get_top_tokens_by_volume
+        market_stats = await get_total_volume()
+        trending = await get_top_tokens_by_volume(minutes=15, limit=5)
+
         # Get latest signals
-        signals = get_latest_ai_signals(5)
-        
+        signals = await get_latest_ai_signals(5)
+
         context_data = {
             "market_stats": market_stats,
+            "trending_15m": trending,
             "recent_signals": signals
         }
         
@@ -1088,7 +1415,8 @@ async def AI_security_analysis_command(update: Update, context: ContextTypes.DEF
         insight = await ai.analyze_token_security(info)
         
         # Save insight to DB
-        await save_ai_signal(token_address, "security", insight)
+        from write_behind import get_write_queue
+        get_write_queue().submit(save_ai_signal, token_address, "security", insight)
         
         # Escape markdown special characters in AI response
         safe_insight = insight.replace("_", "\\_").replace("*", "\\*").replace("`", "\\`").replace("[", "\\[")
@@ -1194,7 +1522,8 @@ async def look_token(update: Update, context: ContextTypes.DEFAULT_TYPE, token_a
             f"💧 *Liquidity:* `${info['liquidity']:,.0f}`\n\n"
             f"🛡️ *Security:*\n"
             f"• Renounced: {'✅ Yes' if info['renounced'] else '⚠️ No'}\n"
-            f"• Honeypot: {'✅ Clean' if not info.get('honeypot', False) else '🚨 Detected'}\n"
+            f"• Honeypot: {format_honeypot(info)}\n"
+            f"• Contract Flags: {', '.join(info.get('risks', [])) or '✅ None detected'}\n"
             f"{ai_summary}"
             f"━━━━━━━━━━━━━━━\n"
             f"🔗 [Basescan](https://basescan.org/token/{token_address}) | "
@@ -1203,7 +1532,7 @@ async def look_token(update: Update, context: ContextTypes.DEFAULT_TYPE, token_a
         )
         
         keyboard = [
-            [InlineKeyboardButton("🔄 Refresh", callback_data=f"look_{token_address}")],
+            [InlineKeyboardButton("🔄 Refresh", callback_data=f"look_{token_address}"), InlineKeyboardButton("📈 Chart", callback_data=f"chart_{token_address}")],
             [InlineKeyboardButton("💱 Trade This Token", callback_data=f"refresh_{token_address}")],
             [InlineKeyboardButton("⬅️ Menu", callback_data="start"), InlineKeyboardButton("❌ Close", callback_data="close")]
         ]
@@ -1213,6 +1542,56 @@ async def look_token(update: Update, context: ContextTypes.DEFAULT_TYPE, token_a
         print(f"ERROR in look_token: {e}")
         await loading_msg.edit_text("❌ *Lookup Error*\n\nCouldn't find this token. Check the address and try again.")
 
+async def chart_command(update: Update, context: ContextTypes.DEFAULT_TYPE, token_address: str, timeframe: str = None) -> None:
+    """Sends (or updates) a price chart image built from locally stored candles."""
+    from charts import get_chart_service, TIMEFRAMES, DEFAULT_TIMEFRAME
+    from telegram import InputMediaPhoto
+
+    query = update.callback_query
+    timeframe = timeframe if timeframe in TIMEFRAMES else DEFAULT_TIMEFRAME
+
+    try:
+        png = await get_chart_service().get_chart(token_address, timeframe, title=shorten_address(token_address, 6))
+    except Exception as e:
+        print(f"ERROR in chart_command: {e}")
+        png = None
+
+    if png is None:
+        await query.message.reply_text(
+            "📈 *Chart Unavailable*\n\nNot enough price history recorded for this token yet. "
+            "Check back after a few more lookups, or view it on "
+            f"[DexScreener](https://dexscreener.com/base/{token_address}).",
+            parse_mode="Markdown",
+            disable_web_page_preview=True
+        )
+        return
+
+    caption = f"📈 `{shorten_address(token_address)}` · *{timeframe}* candles"
+    keyboard = [
+        [
+            InlineKeyboardButton(f"{'• ' if tf == timeframe else ''}{tf}", callback_data=f"chart_{token_address}_{tf}")
+            for tf in TIMEFRAMES
+        ],
+        [InlineKeyboardButton("❌ Close", callback_data="close")]
+    ]
+
+    if query.message.photo:
+        try:
+            await query.message.edit_media(
+                InputMediaPhoto(media=png, caption=caption, parse_mode="Markdown"),
+                reply_markup=InlineKeyboardMarkup(keyboard)
+            )
+        except Exception as e:
+            # Same candle, same image
+            print(f"Chart edit failed: {e}")
+    else:
+        await query.message.reply_photo(
+            photo=png,
+            caption=caption,
+            parse_mode="Markdown",
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+
 async def import_wallet_prompt(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Prompts user to enter a private key to import."""
     text = (
@@ -1248,7 +1627,7 @@ async def import_wallet_from_key(update: Update, context: ContextTypes.DEFAULT_T
         address = account.address
         
         # Check if wallet already exists
-        existing = fetch_all_from_wallet(user_id)
+        existing = await fetch_all_from_wallet(user_id)
         if any(w['address'].lower() == address.lower() for w in existing):
             await update.message.reply_text(
                 "⚠️ *Wallet Already Exists*\n\nThis wallet is already in your portfolio.",
@@ -1257,7 +1636,7 @@ async def import_wallet_from_key(update: Update, context: ContextTypes.DEFAULT_T
             return
         
         # Save to database
-        create_wallet_db(user_id, address, pk)
+        await create_wallet_db(user_id, address, pk, 0.0)
         
         # Get balance
         trader = get_trader()
@@ -0,0 +1,4 @@
+# test_baseflow.py and quick_test.py are live-network smoke scripts, run directly
+# (python3 test_baseflow.py). They aren't pytest tests, and quick_test.py
+# initialises the real wallet.db as soon as it is imported
+collect_ignore = ["test_baseflow.py", "quick_test.py"]
@@ -0,0 +1,189 @@
+"""
+SQLite access layer for BaseFlow.
+
+One long-lived writer connection (serialized by a lock) plus a small pool of
+read-only connections. The database runs in WAL mode so readers never block the
+writer, `synchronous` is tuned down from FULL, and every connection keeps
+sqlite3's prepared-statement cache warm because the SQL strings are constant.
+The database path is absolute, so the bot works from any working directory.
+
+run_read() / run_write() execute blocking work on a reader thread pool or on the
+single DB writer thread (whose executor queue serializes writes), so no sqlite
+call ever blocks the event loop; see storage.py for how store_to_db uses them.
+"""
+import asyncio
+import functools
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wallet.db")
+DB_PATH = os.path.abspath(os.getenv("BASEFLOW_DB_PATH", DEFAULT_DB_PATH))
+DB_READERS = int(os.getenv("BASEFLOW_DB_READERS", "4"))
+# NORMAL is durable across application crashes in WAL mode; FULL also survives power loss
+DB_SYNCHRONOUS = os.getenv("BASEFLOW_DB_SYNCHRONOUS", "NORMAL").upper()
+STATEMENT_CACHE_SIZE = 256
+
+
+class Database:
+    def __init__(self, path: str = DB_PATH, readers: int = DB_READERS, synchronous: str = DB_SYNCHRONOUS):
+        self.path = os.path.abspath(path)
+        self.synchronous = synchronous
+        self.max_readers = max(1, readers)
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._depth = 0
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._write_executor = None
+        self._read_executor = None
+
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        # Autocommit mode: transactions are opened explicitly by writer()
+        conn = sqlite3.connect(
+            self.path,
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-16000")  # 16 MB page cache per connection
+        if readonly:
+            conn.execute("PRAGMA query_only=1")
+        return conn
+
+    def _get_writer(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._connect()
+            # Only takes effect on a new, empty file; existing files need vacuum() once
+            self._writer.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self._writer.execute("PRAGMA journal_mode=WAL")
+        return self._writer
+
+    @contextmanager
+    def writer(self):
+        """
+        Yield the writer connection inside a transaction (BEGIN IMMEDIATE),
+        committing on success and rolling back on error. Nested calls on the
+        same thread become savepoints, so a batch of writes can share one
+        commit while each write still rolls back on its own.
+        """
+        with self._write_lock:
+            conn = self._get_writer()
+            if self._depth:
+                savepoint = f"sp{self._depth}"
+                conn.execute(f"SAVEPOINT {savepoint}")
+            else:
+                savepoint = None
+                conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield conn
+            except BaseException:
+                if savepoint:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                else:
+                    conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute(f"RELEASE {savepoint}" if savepoint else "COMMIT")
+            finally:
+                self._depth -= 1
+
+    def vacuum(self, pages: int = None) -> int:
+        """
+        Return free pages to the filesystem and report how many remain free.
+        With `pages`, run an incremental vacuum of at most that many pages (cheap,
+        needs auto_vacuum=INCREMENTAL); without, a full VACUUM, which also switches
+        an existing file to incremental auto_vacuum but rewrites the whole database.
+        """
+        with self._write_lock:
+            if self._depth:
+                raise RuntimeError("vacuum() can't run inside a write transaction")
+            conn = self._get_writer()
+            if pages is None:
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+            elif conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    @contextmanager
+    def reader(self):
+        """
+        Borrow a read-only connection from the pool (opening one if the pool
+        isn't full yet, otherwise waiting for one to be returned).
+        """
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._reader_lock:
+                can_open = self._reader_count < self.max_readers
+                if can_open:
+                    self._reader_count += 1
+            if can_open:
+                # The writer switches the file to WAL before the first reader opens it
+                with self._write_lock:
+                    self._get_writer()
+                conn = self._connect(readonly=True)
+            else:
+                conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._readers.put(conn)
+
+    async def run_write(self, fn, *args, **kwargs):
+        """Queue a blocking write on the DB writer thread and await its result."""
+        if self._write_executor is None:
+            self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="baseflow-db-writer")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._write_executor, functools.partial(fn, *args, **kwargs))
+
+    async def run_read(self, fn, *args, **kwargs):
+        """Run a blocking query on the reader threads (one per pooled connection)."""
+        if self._read_executor is None:
+            self._read_executor = ThreadPoolExecutor(max_workers=self.max_readers, thread_name_prefix="baseflow-db-reader")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._read_executor, functools.partial(fn, *args, **kwargs))
+
+    def close(self) -> None:
+        """Finish queued work, then close every connection."""
+        for executor in (self._write_executor, self._read_executor):
+            if executor is not None:
+                executor.shutdown(wait=True)
+        self._write_executor = self._read_executor = None
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._reader_lock:
+            self._reader_count = 0
+
+# Global instance for use in the bot
+_db = None
+
+def get_db() -> Database:
+    global _db
+    if _db is None:
+        _db = Database()
+    return _db
+
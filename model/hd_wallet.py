@@ -0,0 +1,59 @@
+"""
+BIP-32 / BIP-44 key derivation for generated wallets.
+
+Each user gets one random seed; wallet i is the key at m/44'/60'/0'/0/i, the
+same path MetaMask and hardware wallets use. The account node m/44'/60'/0'/0
+(and its public key) is derived once per seed, so every further wallet costs a
+single HMAC-SHA512 plus one public-key multiplication for its address.
+"""
+import hashlib
+import hmac
+
+from eth_keys import keys
+
+SECP256K1_N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+HARDENED = 0x80000000
+# BIP-44 external chain for Ethereum (and Base): m/44'/60'/0'/0
+ACCOUNT_PATH = (44 | HARDENED, 60 | HARDENED, 0 | HARDENED, 0)
+
+
+def _public_key(private_key: bytes) -> bytes:
+    return keys.PrivateKey(private_key).public_key.to_compressed_bytes()
+
+
+def _child_key(key: bytes, chain_code: bytes, index: int, public_key: bytes = None) -> tuple:
+    """BIP-32 CKDpriv: derive (child key, child chain code) at `index`."""
+    if index & HARDENED:
+        data = b"\x00" + key + index.to_bytes(4, "big")
+    else:
+        data = (public_key or _public_key(key)) + index.to_bytes(4, "big")
+    digest = hmac.new(chain_code, data, hashlib.sha512).digest()
+    tweak = int.from_bytes(digest[:32], "big")
+    child = (tweak + int.from_bytes(key, "big")) % SECP256K1_N
+    if tweak >= SECP256K1_N or child == 0:
+        # Probability below 2**-127; BIP-32 says to skip the index
+        raise ValueError(f"Invalid child key at index {index}")
+    return child.to_bytes(32, "big"), digest[32:]
+
+
+class HDNode:
+    def __init__(self, seed: bytes):
+        digest = hmac.new(b"Bitcoin seed", seed, hashlib.sha512).digest()
+        key, chain_code = digest[:32], digest[32:]
+        for index in ACCOUNT_PATH:
+            key, chain_code = _child_key(key, chain_code, index)
+        self._key = key
+        self._chain_code = chain_code
+        self._public_key = _public_key(key)
+        self._derived = {}
+
+    def derive(self, index: int) -> tuple:
+        """Return (private_key, address) of wallet `index`, as generate_wallet() formats them."""
+        if index not in self._derived:
+            key, _ = _child_key(self._key, self._chain_code, index, self._public_key)
+            address = keys.PrivateKey(key).public_key.to_checksum_address()
+            self._derived[index] = ("0x" + key.hex(), address)
+        return self._derived[index]
+
+    def derive_range(self, start: int, count: int) -> list:
+        return [self.derive(index) for index in range(start, start + count)]
@@ -0,0 +1,163 @@
+"""
+Honeypot detection via a single state-override simulation.
+
+The HoneypotSimulator contract (contracts/HoneypotSimulator.vy) is never
+deployed: its runtime bytecode is injected at a scratch address with an
+eth_call state override and called from a throwaway, balance-overridden
+account. It buys the token and sells it straight back, which exposes the
+effective buy/sell tax and whether selling reverts, for the cost of one RPC.
+"""
+import asyncio
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+
+from web3 import Web3
+from dotenv import load_dotenv
+
+from mainet import TOKENS, UNISWAP_V3_QUOTER, UNISWAP_V3_ROUTER
+
+load_dotenv()
+
+BASE_RPC_URL = os.getenv('BASE_RPC_URL', 'https://mainnet.base.org')
+
+# Runtime bytecode of contracts/HoneypotSimulator.vy. After editing the contract, regenerate with:
+#   pip install vyper==0.4.3 && vyper -f bytecode_runtime contracts/HoneypotSimulator.vy
+SIMULATOR_RUNTIME_CODE = (
+    "0x5f3560e01c63d5581cf581186105b65760a336111561068d576004358060a01c61068d576103e0526024358060a01c"
+    "61068d57610400526044358060a01c61068d57610420526064358060a01c61068d576104405260843560040160088135"
+    "1161068d5780355f816008811161068d57801561009d57905b8060051b6020850101358060181c61068d578160051b61"
+    "04800152600101818118610077575b505080610460525050604036610580375f610460516008811161068d5780156101"
+    "1f57905b8060051b61048001516105c052606061040060405e3460a0526105c05160c0526100ed6106006105ba565b61"
+    "0600516105e0526105a0516105e0511115610114576105e0516105a0526105c051610580525b6001018181186100c257"
+    "5b50506105a0516101a1576020806106205260076105c0527f6e6f20706f6f6c00000000000000000000000000000000"
+    "0000000000000000006105e0526105c08161062001602782825e8051806020830101601f825f03163682375050601f19"
+    "601f8251602001011690509050810190506308c379a0610600528060040161061cfd5b6104205163d0e30db06105c052"
+    "803b1561068d575f6105c060046105dc34855af16101ce573d5f5f3e3d5ffd5b506104205163095ea7b36105c0526103"
+    "e0516105e0527fffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffff6106005260206105c0"
+    "60446105dc5f855af1610223573d5f5f3e3d5ffd5b3d602081183d6020100218806105c0016105e01161068d576105c0"
+    "518060011c61068d5761062052506106205050610440516370a082316105e052306106005260206105e060246105fc84"
+    "5afa61027c573d5f5f3e3d5ffd5b60203d1061068d576105e09050516105c0526103e0516304e45aaf6105e052604061"
+    "04206106005e6105805161064052306106605234610680526040366106a03760206105e060e46105fc5f855af16102d7"
+    "573d5f5f3e3d5ffd5b60203d1061068d576105e05050610440516370a082316106005230610620526020610600602461"
+    "061c845afa61030f573d5f5f3e3d5ffd5b60203d1061068d576106009050516105c05180820382811161068d57905090"
+    "506105e0526105e05161035b5760406105806106005e6060366106403760016106a05260c06106006105b4565b610400"
+    "5160405261044051606052610420516080526105e05160a0526105805160c0526103896106206105ba565b6106205161"
+    "06005260403661062037610440515a63095ea7b36106845260046103e0516106a4527fffffffffffffffffffffffffff"
+    "ffffffffffffffffffffffffffffffffffffff6106c45260400161068052610680506020610720610680516106a05f86"
+    "86f190509050610740523d602081183d6020100218610700526107006040816107605e50610740516106205260406107"
+    "606106405e610620516104525760406105806106805e60406105e06106c05e5f6107005260016107205260c061068061"
+    "05b4565b610420516370a082316106a052306106c05260206106a060246106bc845afa61047d573d5f5f3e3d5ffd5b60"
+    "203d1061068d576106a0905051610680526103e0515a6304e45aaf6106a4526004610440516106c452610420516106e4"
+    "52610580516107045230610724526105e051610744526040366107643760e0016106a0526106a05060206107e06106a0"
+    "516106c05f8686f190509050610800523d602081183d60201002186107c0526107c06040816108205e50610800516106"
+    "205260406108206106405e610620516105485760406105806106a05e60406105e06106e05e5f61072052600161074052"
+    "60c06106a06105b4565b60406105806106e05e60406105e06107205e610420516370a082316106a052306106c0526020"
+    "6106a060246106bc845afa610585573d5f5f3e3d5ffd5b60203d1061068d576106a09050516106805180820382811161"
+    "068d5790509050610760525f6107805260c06106e05bf35b5f5ffd5b60403660e0376040515a63c6a5026a6101a45260"
+    "04608060606101c45e5f6102445260a0016101a0526101a05060806102a06101a0516101c05f8686f190509050610320"
+    "523d608081183d608010021861028052610280602081510180826103405e50506103205160e052602061034051018061"
+    "03406101005e5060e05161064357600161064c565b601f6101005111155b1561065a575f81525061068b565b601f6101"
+    "0051111561068d57610120516101c05260206101a0526101a06020810151815160200360031b1c90508152505b565b5f"
+    "80fd"
+)
+SIMULATOR_ADDRESS = "0x000000000000000000000000000000000000B45E"
+
+SIMULATOR_ABI = json.loads('''[{"inputs":[{"name":"router","type":"address"},{"name":"quoter","type":"address"},{"name":"weth","type":"address"},{"name":"token","type":"address"},{"name":"fees","type":"uint24[]"}],"name":"simulate","outputs":[{"name":"fee","type":"uint24"},{"name":"buyQuoted","type":"uint256"},{"name":"buyReceived","type":"uint256"},{"name":"sellQuoted","type":"uint256"},{"name":"sellReceived","type":"uint256"},{"name":"sellReverted","type":"bool"}],"stateMutability":"payable","type":"function"}]''')
+
+FEE_TIERS = [10000, 3000, 500]
+PROBE_AMOUNT_WEI = Web3.to_wei(0.01, 'ether')
+# Tax above which a token is reported as a honeypot even if selling succeeds
+MAX_SELL_TAX = 0.5
+# Results are reused within a range of blocks (Base produces a block every 2 seconds)
+BLOCK_RANGE = int(os.getenv("HONEYPOT_CACHE_BLOCKS", "150"))
+BASE_BLOCK_TIME = 2
+# Seconds a failed probe (no pool yet, RPC error) is remembered before it is retried
+FAILURE_TTL = int(os.getenv("HONEYPOT_FAILURE_TTL", "30"))
+
+
+class HoneypotSimulator:
+    def __init__(self, rpc_url: str, cache_size: int = 4096):
+        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.runtime_code = SIMULATOR_RUNTIME_CODE
+        self.contract = self.w3.eth.contract(address=Web3.to_checksum_address(SIMULATOR_ADDRESS), abi=SIMULATOR_ABI)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._failures = OrderedDict()  # token -> (expiry, result)
+
+    @staticmethod
+    def _block_bucket() -> int:
+        # Derived from Base's fixed block time so the cache lookup costs no RPC
+        return int(time.time()) // (BASE_BLOCK_TIME * BLOCK_RANGE)
+
+    async def check(self, token_address: str) -> dict:
+        """
+        Simulate a buy and an immediate sell of the token.
+
+        Returns {"honeypot", "buy_tax", "sell_tax", "sell_reverted", "fee"}; "honeypot"
+        is None when the check could not run (no pool, RPC error).
+        """
+        token = Web3.to_checksum_address(token_address)
+        key = (token.lower(), self._block_bucket())
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        # Failures are kept briefly so a token without a pool isn't re-probed on every lookup
+        failure = self._failures.get(token.lower())
+        if failure:
+            if failure[0] > time.monotonic():
+                return failure[1]
+            del self._failures[token.lower()]
+
+        # A fresh, unfunded address is given just enough balance for the probe
+        caller = Web3.to_checksum_address("0x" + secrets.token_hex(20))
+        overrides = {
+            caller: {"balance": hex(PROBE_AMOUNT_WEI * 2)},
+            self.contract.address: {"code": self.runtime_code},
+        }
+        call = self.contract.functions.simulate(
+            Web3.to_checksum_address(UNISWAP_V3_ROUTER),
+            Web3.to_checksum_address(UNISWAP_V3_QUOTER),
+            Web3.to_checksum_address(TOKENS["WETH"]),
+            token,
+            FEE_TIERS
+        ).call
+        try:
+            # web3's HTTP provider blocks, so the call runs in a thread, off the event loop
+            fee, buy_quoted, buy_received, sell_quoted, sell_received, sell_reverted = await asyncio.to_thread(
+                call, {"from": caller, "value": PROBE_AMOUNT_WEI}, "latest", overrides
+            )
+        except Exception as e:
+            # Buy itself reverted: no pool, or the token blocks transfers entirely
+            result = {"honeypot": None, "error": f"Simulation reverted: {e}"}
+            self._failures[token.lower()] = (time.monotonic() + FAILURE_TTL, result)
+            while len(self._failures) > self.cache_size:
+                self._failures.popitem(last=False)
+            return result
+
+        buy_tax = 1 - buy_received / buy_quoted if buy_quoted else 0.0
+        sell_tax = 1 - sell_received / sell_quoted if sell_quoted else (1.0 if sell_reverted else 0.0)
+        result = {
+            "honeypot": bool(sell_reverted or buy_received == 0 or sell_tax > MAX_SELL_TAX),
+            "buy_tax": max(buy_tax, 0.0),
+            "sell_tax": max(sell_tax, 0.0),
+            "sell_reverted": bool(sell_reverted),
+            "fee": fee,
+        }
+
+        self._cache[key] = result
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+# Global instance for use in the bot
+_simulator = None
+
+def get_honeypot_simulator() -> HoneypotSimulator:
+    global _simulator
+    if _simulator is None:
+        _simulator = HoneypotSimulator(BASE_RPC_URL)
+    return _simulator
@@ -0,0 +1,244 @@
+"""
+Encrypted key vault for wallet private keys.
+
+Envelope encryption: every private key is encrypted (AES-256-GCM, bound to its
+wallet address) under its own random data key, and that data key is wrapped with
+a key-encryption key derived from BASEFLOW_VAULT_PASSPHRASE with scrypt. scrypt
+is memory-hard and deliberately slow, so the derived key is kept for the life of
+the process, and decrypted signers are cached per wallet for BASEFLOW_SIGNER_TTL
+seconds: a user's trades within a session pay neither the KDF nor a decrypt.
+
+Generated wallets are derived from a per-user BIP-32 seed (see hd_wallet.py),
+which is sealed the same way; those wallets store only their derivation index.
+
+Without a passphrase the vault is inactive and keys are stored as before, in
+plaintext. Once one is set, new keys are sealed on write and existing plaintext
+keys and seeds are sealed at startup (seal_plaintext_keys).
+"""
+import asyncio
+import hashlib
+import os
+import secrets
+import time
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from dotenv import load_dotenv
+from eth_account import Account
+
+from hd_wallet import HDNode
+from store_to_db import (
+    add_hd_wallets,
+    create_hd_seed,
+    get_hd_seed,
+    get_plaintext_hd_seeds,
+    get_plaintext_wallet_keys,
+    get_vault_meta,
+    get_wallet_key,
+    init_vault_meta,
+    seal_hd_seeds,
+    seal_wallet_keys,
+)
+
+load_dotenv()
+
+VAULT_PASSPHRASE = os.getenv("BASEFLOW_VAULT_PASSPHRASE")
+SIGNER_TTL = int(os.getenv("BASEFLOW_SIGNER_TTL", "900"))
+# scrypt cost: 2**15 * 8 * 128 bytes = 32 MB of memory per derivation
+KDF_N, KDF_R, KDF_P = 2**15, 8, 1
+SEAL_BATCH = 500
+
+BLOB_VERSION = b"\x01"
+NONCE_SIZE = 12
+KEK_CHECK = b"baseflow-vault-check"
+
+
+def _derive_kek(passphrase: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(passphrase.encode(), salt=salt, n=n, r=r, p=p, maxmem=2 * 128 * n * r * p, dklen=32)
+
+
+def _seed_context(user_id: int) -> str:
+    # Binds a sealed seed to its owner, as wallet keys are bound to their address
+    return f"hd-seed:{user_id}"
+
+
+class KeyVault:
+    def __init__(self, passphrase: str = VAULT_PASSPHRASE, ttl: int = SIGNER_TTL):
+        self._passphrase = passphrase
+        self.ttl = ttl
+        self._kek = None
+        self._kek_lock = None
+        self._signers = {}
+        self._hd_nodes = {}
+        self._hd_locks = {}
+
+    @property
+    def is_active(self) -> bool:
+        return bool(self._passphrase)
+
+    async def _get_kek(self) -> AESGCM:
+        """Derive the key-encryption key once (on a worker thread), creating the KDF salt on first use."""
+        if self._kek is not None:
+            return self._kek
+        if self._kek_lock is None:
+            self._kek_lock = asyncio.Lock()
+        async with self._kek_lock:
+            if self._kek is not None:
+                return self._kek
+            meta = await get_vault_meta()
+            if "salt" not in meta:
+                salt = secrets.token_bytes(16)
+                kek = AESGCM(await asyncio.to_thread(_derive_kek, self._passphrase, salt, KDF_N, KDF_R, KDF_P))
+                nonce = secrets.token_bytes(NONCE_SIZE)
+                await init_vault_meta({
+                    "salt": salt,
+                    "kdf": f"scrypt:{KDF_N}:{KDF_R}:{KDF_P}".encode(),
+                    "check": nonce + kek.encrypt(nonce, KEK_CHECK, None),
+                })
+                # Another worker may have initialised the vault first; its salt wins
+                meta = await get_vault_meta()
+
+            _, n, r, p = meta["kdf"].decode().split(":")
+            kek = AESGCM(await asyncio.to_thread(_derive_kek, self._passphrase, meta["salt"], int(n), int(r), int(p)))
+            check = meta["check"]
+            try:
+                kek.decrypt(check[:NONCE_SIZE], check[NONCE_SIZE:], None)
+            except Exception:
+                raise ValueError("BASEFLOW_VAULT_PASSPHRASE doesn't match the one the key vault was created with")
+            self._kek = kek
+            return kek
+
+    async def seal(self, context: str, secret: str) -> tuple:
+        """
+        Encrypt a private key (context: its address) or seed for storage. Returns
+        (secret, ciphertext) as the row should hold them: (None, blob), or
+        (secret, None) when the vault is inactive.
+        """
+        if not self.is_active:
+            return secret, None
+        return None, self._encrypt(await self._get_kek(), context, secret)
+
+    @staticmethod
+    def _encrypt(kek: AESGCM, context: str, secret: str) -> bytes:
+        dek = AESGCM.generate_key(bit_length=256)
+        dek_nonce, key_nonce = secrets.token_bytes(NONCE_SIZE), secrets.token_bytes(NONCE_SIZE)
+        wrapped_dek = kek.encrypt(dek_nonce, dek, None)
+        ciphertext = AESGCM(dek).encrypt(key_nonce, secret.encode(), context.lower().encode())
+        return BLOB_VERSION + dek_nonce + wrapped_dek + key_nonce + ciphertext
+
+    @staticmethod
+    def _decrypt(kek: AESGCM, context: str, blob: bytes) -> str:
+        if blob[:1] != BLOB_VERSION:
+            raise ValueError("Unknown key vault blob version")
+        dek_nonce, rest = blob[1:1 + NONCE_SIZE], blob[1 + NONCE_SIZE:]
+        wrapped_dek, rest = rest[:48], rest[48:]  # 32-byte key + 16-byte tag
+        key_nonce, ciphertext = rest[:NONCE_SIZE], rest[NONCE_SIZE:]
+        dek = kek.decrypt(dek_nonce, wrapped_dek, None)
+        return AESGCM(dek).decrypt(key_nonce, ciphertext, context.lower().encode()).decode()
+
+    async def _hd_node(self, user_id: int):
+        """The user's BIP-44 account node, or None if they have no seed yet (cached like signers)."""
+        cached = self._hd_nodes.get(user_id)
+        now = time.monotonic()
+        if cached and cached[0] > now:
+            return cached[1]
+
+        row = await get_hd_seed(user_id)
+        if row is None:
+            return None
+        seed, encrypted_seed, _ = row
+        if encrypted_seed is not None:
+            if not self.is_active:
+                raise ValueError("HD seed is encrypted but BASEFLOW_VAULT_PASSPHRASE is not set")
+            seed = self._decrypt(await self._get_kek(), _seed_context(user_id), encrypted_seed)
+        node = HDNode(bytes.fromhex(seed))
+        self._hd_nodes[user_id] = (now + self.ttl, node)
+        return node
+
+    async def create_hd_wallets(self, user_id: int, count: int) -> list:
+        """
+        Derive `count` new wallets from the user's seed (created on first use) and
+        store them in one batch. Returns [(private_key, address)] to show the user once.
+        """
+        lock = self._hd_locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            row = await get_hd_seed(user_id)
+            if row is None:
+                seed, encrypted_seed = await self.seal(_seed_context(user_id), secrets.token_bytes(32).hex())
+                await create_hd_seed(user_id, seed, encrypted_seed)
+                row = await get_hd_seed(user_id)
+            start_index = row[2]
+            node = await self._hd_node(user_id)
+            wallets = await asyncio.to_thread(node.derive_range, start_index, count)
+            await add_hd_wallets(user_id, start_index, [address for _, address in wallets])
+        return wallets
+
+    async def get_signer(self, user_id: int, address: str):
+        """
+        The eth_account LocalAccount for one of the user's wallets, or None if the
+        user has no such wallet. Only that wallet's key is read and decrypted.
+        """
+        cache_key = (user_id, address.lower())
+        cached = self._signers.get(cache_key)
+        now = time.monotonic()
+        if cached and cached[0] > now:
+            return cached[1]
+
+        row = await get_wallet_key(user_id, address)
+        if row is None:
+            return None
+        private_key, encrypted_key, hd_index = row
+        if hd_index is not None:
+            private_key = (await self._hd_node(user_id)).derive(hd_index)[0]
+        elif encrypted_key is not None:
+            if not self.is_active:
+                raise ValueError("Wallet key is encrypted but BASEFLOW_VAULT_PASSPHRASE is not set")
+            private_key = self._decrypt(await self._get_kek(), address, encrypted_key)
+        signer = Account.from_key(private_key)
+
+        # Drop expired signers while we're here, so the cache only holds live sessions
+        for key in [k for k, (expires, _) in self._signers.items() if expires <= now]:
+            del self._signers[key]
+        self._signers[cache_key] = (now + self.ttl, signer)
+        return signer
+
+    def forget(self, user_id: int = None) -> None:
+        """Drop cached signers for one user (after wallet deletion), or for everyone."""
+        if user_id is None:
+            self._signers.clear()
+            self._hd_nodes.clear()
+            return
+        for key in [k for k in self._signers if k[0] == user_id]:
+            del self._signers[key]
+        self._hd_nodes.pop(user_id, None)
+
+    async def seal_plaintext_keys(self) -> int:
+        """Encrypt every key and HD seed still stored in plaintext; returns how many were sealed."""
+        if not self.is_active:
+            return 0
+        kek = await self._get_kek()
+        sealed = 0
+        while True:
+            rows = await get_plaintext_wallet_keys(SEAL_BATCH)
+            if not rows:
+                break
+            await seal_wallet_keys([
+                (wallet_id, self._encrypt(kek, address, private_key)) for wallet_id, address, private_key in rows
+            ])
+            sealed += len(rows)
+        while True:
+            rows = await get_plaintext_hd_seeds(SEAL_BATCH)
+            if not rows:
+                return sealed
+            await seal_hd_seeds([
+                (user_id, self._encrypt(kek, _seed_context(user_id), seed)) for user_id, seed in rows
+            ])
+            sealed += len(rows)
+
+# Global instance for use in the bot
+_vault = None
+
+def get_vault() -> KeyVault:
+    global _vault
+    if _vault is None:
+        _vault = KeyVault()
+    return _vault
@@ -1,10 +1,12 @@
 from web3 import Web3
+from web3.exceptions import ContractLogicError
 import json
 import time
 from decimal import Decimal
 import os
 from dotenv import load_dotenv
 from typing import Optional, Dict, Any
+from collections import OrderedDict, deque
 import asyncio
 
 load_dotenv()
@@ -38,6 +40,47 @@ BASEFLOW_ROUTER_ABI = json.loads('''[{"inputs":[{"name":"tokenOut","type":"addre
 # Uniswap V3 SwapRouter ABI (for exactInputSingle)
 UNISWAP_V3_ROUTER_ABI = json.loads('''[{"inputs":[{"components":[{"name":"tokenIn","type":"address"},{"name":"tokenOut","type":"address"},{"name":"fee","type":"uint24"},{"name":"recipient","type":"address"},{"name":"deadline","type":"uint256"},{"name":"amountIn","type":"uint256"},{"name":"amountOutMinimum","type":"uint256"},{"name":"sqrtPriceLimitX96","type":"uint160"}],"name":"params","type":"tuple"}],"name":"exactInputSingle","outputs":[{"name":"amountOut","type":"uint256"}],"stateMutability":"payable","type":"function"}]''')
 
+# Gas limits used until a route has been observed on-chain
+DEFAULT_GAS_LIMITS = {"buy": 350000, "router_buy": 400000, "sell": 400000, "approve": 100000}
+# Headroom applied on top of estimates and observed usage
+GAS_LIMIT_MARGIN = Decimal("1.25")
+
+
+class PreflightError(Exception):
+    """Raised when a transaction would revert if it were sent."""
+
+
+class GasEstimateCache:
+    """
+    Observed gas usage per (router, token, direction).
+    Limits are sized from the largest of the last few successful swaps on a route.
+    """
+    def __init__(self, samples: int = 8, max_routes: int = 4096):
+        self.samples = samples
+        self.max_routes = max_routes
+        self._observed = OrderedDict()
+
+    @staticmethod
+    def key(router: str, token: str, direction: str) -> tuple:
+        return (router.lower(), token.lower(), direction)
+
+    def limit_for(self, key: tuple) -> Optional[int]:
+        history = self._observed.get(key)
+        if not history:
+            return None
+        self._observed.move_to_end(key)
+        return int(max(history) * GAS_LIMIT_MARGIN)
+
+    def record(self, key: tuple, gas_used: int) -> None:
+        history = self._observed.get(key)
+        if history is None:
+            history = self._observed[key] = deque(maxlen=self.samples)
+        history.append(gas_used)
+        self._observed.move_to_end(key)
+        while len(self._observed) > self.max_routes:
+            self._observed.popitem(last=False)
+
+
 class BaseFlowTrader:
     def __init__(self):
         self.w3 = Web3(Web3.HTTPProvider(BASE_RPC_URL))
@@ -56,6 +99,34 @@ class BaseFlowTrader:
             print("ℹ️ Using Uniswap V3 SwapRouter for trades")
             
         self.quoter = self.w3.eth.contract(address=Web3.to_checksum_address(UNISWAP_V3_QUOTER), abi=QUOTER_ABI)
+        self.gas_cache = GasEstimateCache()
+
+    def _preflight(self, tx: dict, route: tuple) -> dict:
+        """
+        Simulate `tx` against the latest state and give it a tight gas limit.
+
+        Routes with observed history only need an eth_call to prove the trade
+        still succeeds; new routes use eth_estimateGas, which simulates as well.
+        Raises PreflightError if the transaction would revert; RPC failures
+        (timeouts, rate limits, dropped connections) propagate unchanged.
+        """
+        call = {k: tx[k] for k in ("from", "to", "value", "data") if k in tx}
+        try:
+            cached = self.gas_cache.limit_for(route)
+            if cached:
+                self.w3.eth.call(call)
+                gas = cached
+            else:
+                gas = int(self.w3.eth.estimate_gas(call) * GAS_LIMIT_MARGIN)
+        except ContractLogicError as e:
+            # Reverts, panics and custom errors; anything else is the node, not the trade
+            raise PreflightError(f"Simulation reverted: {e}") from e
+        tx["gas"] = gas
+        return tx
+
+    async def _wait_for_receipt(self, tx_hash, timeout: int = 120):
+        # web3's wait polls with blocking sleeps; keep it off the event loop
+        return await asyncio.to_thread(self.w3.eth.wait_for_transaction_receipt, tx_hash, timeout)
 
     async def get_eth_price(self) -> float:
         # Chainlink ETH/USD Base
@@ -122,13 +193,46 @@ class BaseFlowTrader:
                 price = float(eth_p / (float(quote)*10)) if quote > 0 else 0
             except:
                 pass
+
+        # Bytecode security scan (cached per contract template)
+        security = {"renounced": False, "frozen": False, "risks": [], "flags": {}}
+        try:
+            from token_scanner import get_scanner
+            security = await get_scanner().scan(address)
+        except Exception as e:
+            print(f"Security scan error: {e}")
+
+        # Buy/sell round trip in one state-override eth_call
+        honeypot = {"honeypot": None}
+        try:
+            from honeypot import get_honeypot_simulator
+            honeypot = await get_honeypot_simulator().check(address)
+        except Exception as e:
+            print(f"Honeypot check error: {e}")
+
+        # Feed the local candle store used by the chart renderer
+        try:
+            from store_to_db import record_price_tick
+            from write_behind import get_write_queue
+            get_write_queue().submit(record_price_tick, address, price)
+        except Exception as e:
+            print(f"Candle store error: {e}")
+
+        # Price alerts crossed since the previous tick
+        try:
+            from alert_index import get_alert_index
+            get_alert_index().on_price(address, price)
+        except Exception as e:
+            print(f"Alert matching error: {e}")
         
         return {
             "name": name, "symbol": symbol, "address": address, "decimals": decimals,
             "price": price,
             "market_cap": market_cap, 
             "liquidity": liquidity, 
-            "renounced": True, "frozen": False, "revoked": False,
+            "renounced": security["renounced"], "frozen": security["frozen"], "revoked": False,
+            "risks": security["risks"], "security": security,
+            "honeypot": honeypot["honeypot"], "buy_tax": honeypot.get("buy_tax"), "sell_tax": honeypot.get("sell_tax"),
             "eth_ratio": 0, "website": "", "documentation": ""
         }
 
@@ -158,7 +262,7 @@ class BaseFlowTrader:
                     "from": wallet, 
                     "nonce": self.w3.eth.get_transaction_count(wallet), 
                     "value": Web3.to_wei(amount_eth, 'ether'),
-                    "gas": 350000, 
+                    "gas": DEFAULT_GAS_LIMITS["buy"], 
                     "gasPrice": self.w3.eth.gas_price, 
                     "chainId": BASE_CHAIN_ID
                 })
@@ -166,17 +270,30 @@ class BaseFlowTrader:
                 # Use custom BaseFlow router
                 tx = self.router.functions.swapETHForTokens(Web3.to_checksum_address(token_out), min_out, int(time.time())+300).build_transaction({
                     "from": wallet, "nonce": self.w3.eth.get_transaction_count(wallet), "value": Web3.to_wei(amount_eth, 'ether'),
-                    "gas": 400000, "gasPrice": self.w3.eth.gas_price, "chainId": BASE_CHAIN_ID
+                    "gas": DEFAULT_GAS_LIMITS["router_buy"], "gasPrice": self.w3.eth.gas_price, "chainId": BASE_CHAIN_ID
                 })
+
+            # Reject doomed trades before anything is signed or paid for
+            route = GasEstimateCache.key(self.router_address, token_out, "buy")
+            self._preflight(tx, route)
             
             signed = self.w3.eth.account.sign_transaction(tx, key)
             h = self.w3.eth.send_raw_transaction(signed.raw_transaction)
-            r = self.w3.eth.wait_for_transaction_receipt(h)
+            r = await self._wait_for_receipt(h)
+            if r.status == 1:
+                self.gas_cache.record(route, r.gasUsed)
             if user_id and r.status == 1:
-                from store_to_db import save_trade, update_volume_tracking
-                await save_trade(user_id, wallet, h.hex(), "ETH", token_out, str(amount_eth), str(quote), "buy", "success", r.gasUsed, r.blockNumber)
-                await update_volume_tracking(token_out, float(amount_eth))
+                from write_behind import record_trade
+                amount_in_wei = Web3.to_wei(amount_eth, 'ether')
+                await record_trade(
+                    token_address=token_out,
+                    user_id=user_id, wallet_address=wallet, tx_hash=h.hex(), token_in="ETH", token_out=token_out,
+                    amount_in=str(amount_eth), amount_out=str(quote), trade_type="buy", status="success",
+                    gas_used=r.gasUsed, block_number=r.blockNumber,
+                    amount_in_raw=amount_in_wei, amount_out_raw=int(quote * Decimal(10**d_out)), eth_value_wei=amount_in_wei
+                )
             return {"success": r.status == 1, "tx_hash": h.hex()}
+        except PreflightError as e: return {"success": False, "error": str(e), "simulated": True}
         except Exception as e: return {"success": False, "error": str(e)}
 
 
@@ -195,29 +312,46 @@ class BaseFlowTrader:
                 # Approve router
                 app_tx = c_in.functions.approve(self.router_address, 2**256-1).build_transaction({
                     "from": wallet, "nonce": self.w3.eth.get_transaction_count(wallet),
-                    "gas": 100000, "gasPrice": self.w3.eth.gas_price, "chainId": BASE_CHAIN_ID
+                    "gas": DEFAULT_GAS_LIMITS["approve"], "gasPrice": self.w3.eth.gas_price, "chainId": BASE_CHAIN_ID
                 })
+                app_route = GasEstimateCache.key(self.router_address, token_in, "approve")
+                self._preflight(app_tx, app_route)
                 signed_app = self.w3.eth.account.sign_transaction(app_tx, key)
-                self.w3.eth.send_raw_transaction(signed_app.raw_transaction)
-                time.sleep(2) # Wait for approval
+                app_h = self.w3.eth.send_raw_transaction(signed_app.raw_transaction)
+                # The sell can only be simulated once the approval is mined
+                app_r = await self._wait_for_receipt(app_h, timeout=60)
+                if app_r.status != 1:
+                    return {"success": False, "error": "Approval transaction reverted"}
+                self.gas_cache.record(app_route, app_r.gasUsed)
             
             quote = await self.get_swap_quote(token_in, self.WETH, amount_token)
             min_out = int(quote * (Decimal(1) - slippage/100) * Decimal(10**18))
             
             tx = self.router.functions.swapTokensForETH(token_in, amount_wei, min_out, int(time.time())+300).build_transaction({
                 "from": wallet, "nonce": self.w3.eth.get_transaction_count(wallet),
-                "gas": 400000, "gasPrice": self.w3.eth.gas_price, "chainId": BASE_CHAIN_ID
+                "gas": DEFAULT_GAS_LIMITS["sell"], "gasPrice": self.w3.eth.gas_price, "chainId": BASE_CHAIN_ID
             })
+            route = GasEstimateCache.key(self.router_address, token_in, "sell")
+            self._preflight(tx, route)
             signed = self.w3.eth.account.sign_transaction(tx, key)
             h = self.w3.eth.send_raw_transaction(signed.raw_transaction)
-            r = self.w3.eth.wait_for_transaction_receipt(h)
+            r = await self._wait_for_receipt(h)
+            if r.status == 1:
+                self.gas_cache.record(route, r.gasUsed)
             
             if user_id and r.status == 1:
-                from store_to_db import save_trade, update_volume_tracking
-                await save_trade(user_id, wallet, h.hex(), token_in, "ETH", str(amount_token), str(quote), "sell", "success", r.gasUsed, r.blockNumber)
-                await update_volume_tracking(token_in, float(quote))
+                from write_behind import record_trade
+                amount_out_wei = int(quote * Decimal(10**18))
+                await record_trade(
+                    token_address=token_in,
+                    user_id=user_id, wallet_address=wallet, tx_hash=h.hex(), token_in=token_in, token_out="ETH",
+                    amount_in=str(amount_token), amount_out=str(quote), trade_type="sell", status="success",
+                    gas_used=r.gasUsed, block_number=r.blockNumber,
+                    amount_in_raw=amount_wei, amount_out_raw=amount_out_wei, eth_value_wei=amount_out_wei
+                )
                 
             return {"success": r.status == 1, "tx_hash": h.hex()}
+        except PreflightError as e: return {"success": False, "error": str(e), "simulated": True}
         except Exception as e: return {"success": False, "error": str(e)}
 
     async def check_token_price(self, token_address: str) -> Decimal:
@@ -0,0 +1,100 @@
+"""
+Periodic database maintenance, started from the bot's post_init.
+
+Every BASEFLOW_MAINTENANCE_SECONDS it rolls the leaderboard windows forward
+and applies the retention policy:
+  minute volume buckets - kept BASEFLOW_MINUTE_ROLLUP_HOURS (default 48)
+  hour volume buckets   - kept BASEFLOW_HOUR_ROLLUP_DAYS (default 90)
+  day volume buckets    - kept forever
+  ai_signals            - archived after BASEFLOW_SIGNAL_RETENTION_DAYS (default 14);
+                          listings after BASEFLOW_LISTING_RETENTION_DAYS (default 90,
+                          the longest /backtest window)
+  settled trades        - archived after BASEFLOW_TRADE_RETENTION_DAYS (default 365, 0 = never)
+Archived rows move to compressed archive_batches in bounded batches, and the
+freed pages are handed back to the filesystem a slice at a time.
+
+Existing SQLite files need a one-time conversion before incremental vacuum
+works (rewrites the whole file, so run it with the bot stopped):
+    python maintenance.py vacuum
+"""
+import asyncio
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from store_to_db import (
+    archive_ai_signals,
+    archive_trades,
+    expire_window_volume,
+    prune_volume_rollups,
+    reclaim_free_pages,
+)
+
+load_dotenv()
+
+MAINTENANCE_INTERVAL = int(os.getenv("BASEFLOW_MAINTENANCE_SECONDS", "300"))
+MINUTE_ROLLUP_HOURS = int(os.getenv("BASEFLOW_MINUTE_ROLLUP_HOURS", "48"))
+HOUR_ROLLUP_DAYS = int(os.getenv("BASEFLOW_HOUR_ROLLUP_DAYS", "90"))
+SIGNAL_RETENTION_DAYS = int(os.getenv("BASEFLOW_SIGNAL_RETENTION_DAYS", "14"))
+LISTING_RETENTION_DAYS = int(os.getenv("BASEFLOW_LISTING_RETENTION_DAYS", "90"))
+TRADE_RETENTION_DAYS = int(os.getenv("BASEFLOW_TRADE_RETENTION_DAYS", "365"))
+# Each archive batch is one short write transaction; a run stops after this many
+ARCHIVE_BATCH_ROWS = int(os.getenv("BASEFLOW_ARCHIVE_BATCH_ROWS", "500"))
+ARCHIVE_BATCHES_PER_RUN = int(os.getenv("BASEFLOW_ARCHIVE_BATCHES_PER_RUN", "20"))
+VACUUM_PAGES_PER_RUN = int(os.getenv("BASEFLOW_VACUUM_PAGES_PER_RUN", "2000"))
+
+
+def _days_ago(now: int, days: int) -> str:
+    # Same format and timezone (UTC) as CURRENT_TIMESTAMP
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now - days * 86400))
+
+
+async def _archive_in_batches(archive, *args) -> int:
+    archived = 0
+    for _ in range(ARCHIVE_BATCHES_PER_RUN):
+        count = await archive(*args, limit=ARCHIVE_BATCH_ROWS)
+        archived += count
+        if count < ARCHIVE_BATCH_ROWS:
+            break
+        await asyncio.sleep(0)  # let queued interactive writes in between batches
+    return archived
+
+
+async def run_maintenance() -> dict:
+    """Run every maintenance job once; returns rows removed per table."""
+    now = int(time.time())
+    removed = await prune_volume_rollups(
+        now - MINUTE_ROLLUP_HOURS * 3600,
+        now - HOUR_ROLLUP_DAYS * 86400
+    )
+    await expire_window_volume()
+
+    removed["ai_signals"] = await _archive_in_batches(
+        archive_ai_signals, _days_ago(now, SIGNAL_RETENTION_DAYS), _days_ago(now, LISTING_RETENTION_DAYS)
+    )
+    if TRADE_RETENTION_DAYS > 0:
+        removed["trades"] = await _archive_in_batches(archive_trades, _days_ago(now, TRADE_RETENTION_DAYS))
+    await reclaim_free_pages(VACUUM_PAGES_PER_RUN)
+    return removed
+
+
+async def maintenance_loop():
+    while True:
+        try:
+            removed = await run_maintenance()
+            if any(removed.values()):
+                print(f"🧹 Maintenance removed {sum(removed.values())} rows: {removed}")
+        except Exception as e:
+            print(f"❌ Maintenance error: {e}")
+        await asyncio.sleep(MAINTENANCE_INTERVAL)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "vacuum":
+        from db import get_db
+        free = get_db().vacuum()
+        print(f"✅ Database vacuumed; incremental auto_vacuum enabled ({free} free pages)")
+    else:
+        print(__doc__)
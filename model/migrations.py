@@ -0,0 +1,451 @@
+"""
+Versioned schema migrations for wallet.db.
+
+Each migration runs once, in order, in its own write transaction, and records
+itself in the `schema_version` table. A step is either a list of SQL statements
+or a function taking the writer connection (for data backfills). Steps are
+written to be idempotent, so a database created before versioning existed is
+simply brought up to date. Schema changes go here as a new version, never as
+an edit to an existing one.
+"""
+from decimal import Decimal, InvalidOperation
+
+from db import Database, get_db
+
+WEI_PER_ETH = 10**18
+WEI_PER_GWEI = 10**9
+# How the ETH side of a trade has been recorded in token_in / token_out
+ETH_NAMES = {"eth", "weth", "0x4200000000000000000000000000000000000006"}
+
+# Tables as they existed before versioning (Sprints 1-5, charts, token security)
+BASELINE_TABLES = [
+    # Wallets table
+    '''
+    CREATE TABLE IF NOT EXISTS wallets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        address TEXT UNIQUE NOT NULL,
+        private_key TEXT UNIQUE NOT NULL,
+        balance REAL NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    # Trades table for transaction tracking (Sprint 2)
+    '''
+    CREATE TABLE IF NOT EXISTS trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        wallet_address TEXT NOT NULL,
+        tx_hash TEXT UNIQUE NOT NULL,
+        token_in TEXT NOT NULL,
+        token_out TEXT NOT NULL,
+        amount_in TEXT NOT NULL,
+        amount_out TEXT NOT NULL,
+        trade_type TEXT NOT NULL,
+        status TEXT NOT NULL,
+        gas_used INTEGER,
+        block_number INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    # Users table (Sprint 3)
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        referred_by INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    # Volume tracking table
+    '''
+    CREATE TABLE IF NOT EXISTS volume_tracking (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        token_address TEXT NOT NULL,
+        volume_eth REAL NOT NULL,
+        trade_count INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        UNIQUE(token_address, date)
+    )''',
+    # Referral earnings table (Sprint 3)
+    '''
+    CREATE TABLE IF NOT EXISTS referral_earnings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        referrer_id INTEGER NOT NULL,
+        referred_user_id INTEGER NOT NULL,
+        amount_eth REAL DEFAULT 0,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    # User Settings table (Sprint 4)
+    '''
+    CREATE TABLE IF NOT EXISTS settings (
+        user_id INTEGER PRIMARY KEY,
+        slippage REAL DEFAULT 0.5,
+        auto_buy_enabled INTEGER DEFAULT 0,
+        auto_buy_amount REAL DEFAULT 0.1,
+        auto_sell_tp REAL DEFAULT 100.0,
+        auto_sell_sl REAL DEFAULT 50.0,
+        gas_price_mode TEXT DEFAULT 'normal'
+    )''',
+    # Pending Orders table (Sprint 4)
+    '''
+    CREATE TABLE IF NOT EXISTS pending_orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        wallet_address TEXT NOT NULL,
+        token_address TEXT NOT NULL,
+        order_type TEXT NOT NULL, -- 'limit_buy', 'limit_sell', 'auto_buy'
+        trigger_price REAL,
+        amount_eth REAL,
+        amount_tokens REAL,
+        status TEXT DEFAULT 'pending', -- 'pending', 'filled', 'cancelled'
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    # AI Signals table (Sprint 5)
+    '''
+    CREATE TABLE IF NOT EXISTS ai_signals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        token_address TEXT NOT NULL,
+        signal_type TEXT NOT NULL, -- 'security', 'trend'
+        insight TEXT NOT NULL,
+        reliability REAL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    # Alerts table (Sprint 5)
+    '''
+    CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        alert_type TEXT NOT NULL, -- 'price', 'new_listing', 'volume'
+        target_address TEXT,
+        target_value REAL,
+        is_active INTEGER DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    # Price candles table (1-minute OHLC, feeds the chart renderer)
+    '''
+    CREATE TABLE IF NOT EXISTS candles (
+        token_address TEXT NOT NULL,
+        open_time INTEGER NOT NULL, -- unix seconds, aligned to the minute
+        open REAL NOT NULL,
+        high REAL NOT NULL,
+        low REAL NOT NULL,
+        close REAL NOT NULL,
+        PRIMARY KEY (token_address, open_time)
+    )''',
+    # Bytecode security scans, shared by every token deployed from the same template
+    '''
+    CREATE TABLE IF NOT EXISTS code_scans (
+        code_hash TEXT PRIMARY KEY,
+        result TEXT NOT NULL, -- JSON
+        scanned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+]
+
+# Per-user lookups (trade history, wallets, referrals, alerts) and the order engine's pending scan
+LOOKUP_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_trades_user_created ON trades(user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_wallets_user ON wallets(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_users_referred_by ON users(referred_by)",
+    "CREATE INDEX IF NOT EXISTS idx_alerts_user_active ON alerts(user_id, is_active)",
+    "CREATE INDEX IF NOT EXISTS idx_pending_orders_status_token ON pending_orders(status, token_address)",
+]
+
+
+def _columns(conn, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _parse_wei(amount: str):
+    """Parse a stored ETH display amount ("0.1" or "0.1 ETH") into wei, or None."""
+    try:
+        return int(Decimal(str(amount).split()[0]) * WEI_PER_ETH)
+    except (InvalidOperation, IndexError, ValueError):
+        return None
+
+
+def integer_amounts(conn) -> None:
+    """
+    Integer base units for trade amounts, plus each trade's ETH value in gwei.
+
+    Existing rows are backfilled from their ETH side (amount_in for buys,
+    amount_out for sells). Token-side raw amounts need the token's decimals,
+    which old rows never recorded, so those stay NULL.
+    """
+    trade_columns = _columns(conn, "trades")
+    for column, kind in (("amount_in_raw", "TEXT"), ("amount_out_raw", "TEXT"), ("eth_value_gwei", "INTEGER")):
+        if column not in trade_columns:
+            conn.execute(f"ALTER TABLE trades ADD COLUMN {column} {kind}")
+    if "volume_gwei" not in _columns(conn, "volume_tracking"):
+        conn.execute("ALTER TABLE volume_tracking ADD COLUMN volume_gwei INTEGER NOT NULL DEFAULT 0")
+
+    rows = conn.execute(
+        "SELECT id, token_in, token_out, amount_in, amount_out FROM trades WHERE eth_value_gwei IS NULL"
+    ).fetchall()
+    updates = []
+    for trade_id, token_in, token_out, amount_in, amount_out in rows:
+        if str(token_in).lower() in ETH_NAMES:
+            wei = _parse_wei(amount_in)
+            raw_in, raw_out = wei, None
+        elif str(token_out).lower() in ETH_NAMES:
+            wei = _parse_wei(amount_out)
+            raw_in, raw_out = None, wei
+        else:
+            continue
+        if wei is not None:
+            updates.append((
+                None if raw_in is None else str(raw_in),
+                None if raw_out is None else str(raw_out),
+                wei // WEI_PER_GWEI,
+                trade_id,
+            ))
+    conn.executemany(
+        "UPDATE trades SET amount_in_raw = COALESCE(?, amount_in_raw), amount_out_raw = COALESCE(?, amount_out_raw), "
+        "eth_value_gwei = ? WHERE id = ?",
+        updates
+    )
+
+    conn.execute("UPDATE volume_tracking SET volume_gwei = CAST(ROUND(volume_eth * 1e9) AS INTEGER) WHERE volume_gwei = 0")
+
+
+def user_stats(conn) -> None:
+    """
+    Per-user totals maintained by save_trade, so the leaderboard and profile
+    reads no longer aggregate the whole trades table.
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS user_stats (
+        user_id INTEGER PRIMARY KEY,
+        trade_count INTEGER NOT NULL DEFAULT 0,
+        volume_gwei INTEGER NOT NULL DEFAULT 0,
+        last_trade_at TIMESTAMP
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_stats_volume ON user_stats(volume_gwei DESC)")
+    conn.execute('''
+        INSERT OR REPLACE INTO user_stats (user_id, trade_count, volume_gwei, last_trade_at)
+        SELECT user_id, COUNT(*), COALESCE(SUM(eth_value_gwei), 0), MAX(created_at)
+        FROM trades
+        GROUP BY user_id
+    ''')
+
+
+def windowed_volume(conn) -> None:
+    """
+    Hourly per-user volume buckets and running 24h / 7d / 30d totals built from them.
+    Backfilled from the last 30 days of trades.
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS user_volume_hourly (
+        user_id INTEGER NOT NULL,
+        hour INTEGER NOT NULL, -- unix time // 3600
+        volume_gwei INTEGER NOT NULL DEFAULT 0,
+        trade_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, hour)
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_volume_hourly_hour ON user_volume_hourly(hour)")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS user_volume_windows (
+        period TEXT NOT NULL, -- '24h', '7d', '30d'
+        user_id INTEGER NOT NULL,
+        volume_gwei INTEGER NOT NULL DEFAULT 0,
+        trade_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (period, user_id)
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_volume_windows_rank ON user_volume_windows(period, volume_gwei DESC)")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS volume_window_state (
+        period TEXT PRIMARY KEY,
+        expired_through INTEGER NOT NULL -- last hour already subtracted from the window
+    )''')
+
+    conn.execute('''
+        INSERT OR REPLACE INTO user_volume_hourly (user_id, hour, volume_gwei, trade_count)
+        SELECT user_id, CAST(strftime('%s', created_at) AS INTEGER) / 3600, COALESCE(SUM(eth_value_gwei), 0), COUNT(*)
+        FROM trades
+        WHERE created_at >= datetime('now', '-30 days')
+        GROUP BY 1, 2
+    ''')
+    hour = conn.execute("SELECT CAST(strftime('%s', 'now') AS INTEGER) / 3600").fetchone()[0]
+    for period, hours in (("24h", 24), ("7d", 168), ("30d", 720)):
+        conn.execute("DELETE FROM user_volume_windows WHERE period = ?", (period,))
+        conn.execute('''
+            INSERT INTO user_volume_windows (period, user_id, volume_gwei, trade_count)
+            SELECT ?, user_id, SUM(volume_gwei), SUM(trade_count)
+            FROM user_volume_hourly
+            WHERE hour > ?
+            GROUP BY user_id
+        ''', (period, hour - hours))
+        conn.execute("INSERT OR REPLACE INTO volume_window_state (period, expired_through) VALUES (?, ?)", (period, hour - hours))
+
+
+ROLLUP_TABLES = ("token_volume_1m", "token_volume_1h", "token_volume_1d")
+
+
+def token_volume_rollups(conn) -> None:
+    """
+    Per-token volume at 1-minute, 1-hour and 1-day resolution (UTC buckets), replacing
+    the local-date volume_tracking table. Day buckets are carried over from
+    volume_tracking; minute and hour buckets are rebuilt from recent trades.
+    """
+    for table in ROLLUP_TABLES:
+        conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            bucket INTEGER NOT NULL, -- unix time of the bucket start
+            token_address TEXT NOT NULL,
+            volume_gwei INTEGER NOT NULL DEFAULT 0,
+            trade_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket, token_address)
+        ) WITHOUT ROWID''')
+
+    eth_names = ", ".join(f"'{name}'" for name in ETH_NAMES)
+    trade_token = f"LOWER(CASE WHEN LOWER(token_in) IN ({eth_names}) THEN token_out ELSE token_in END)"
+    for table, seconds, since in (("token_volume_1m", 60, "-2 days"), ("token_volume_1h", 3600, "-90 days")):
+        conn.execute(f'''
+            INSERT OR REPLACE INTO {table} (bucket, token_address, volume_gwei, trade_count)
+            SELECT CAST(strftime('%s', created_at) AS INTEGER) / {seconds} * {seconds}, {trade_token},
+                   SUM(eth_value_gwei), COUNT(*)
+            FROM trades
+            WHERE eth_value_gwei IS NOT NULL AND created_at >= datetime('now', ?)
+            GROUP BY 1, 2
+        ''', (since,))
+
+    if "volume_tracking" in {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}:
+        conn.execute('''
+            INSERT OR REPLACE INTO token_volume_1d (bucket, token_address, volume_gwei, trade_count)
+            SELECT CAST(strftime('%s', date) AS INTEGER), LOWER(token_address), SUM(volume_gwei), SUM(trade_count)
+            FROM volume_tracking
+            GROUP BY 1, 2
+        ''')
+        conn.execute("DROP TABLE volume_tracking")
+
+
+def archive_batches(conn) -> None:
+    """
+    Compressed archive for rows aged out of ai_signals and trades, plus the
+    created_at indexes the retention jobs (and get_latest_ai_signals) range over.
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS archive_batches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source TEXT NOT NULL, -- 'ai_signals' or 'trades'
+        user_id INTEGER, -- trades are archived per user, so /export can find them
+        first_id INTEGER NOT NULL,
+        last_id INTEGER NOT NULL,
+        oldest TIMESTAMP,
+        newest TIMESTAMP,
+        row_count INTEGER NOT NULL,
+        columns TEXT NOT NULL, -- JSON list of column names
+        payload BLOB NOT NULL, -- zlib-compressed JSON list of rows
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_batches_source_user ON archive_batches(source, user_id, first_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_signals_created ON ai_signals(created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_created ON trades(created_at)")
+
+
+def encrypted_wallet_keys(conn) -> None:
+    """
+    Room for key_vault ciphertexts: wallets gains encrypted_key and private_key
+    becomes nullable (SQLite can only drop NOT NULL by rebuilding the table).
+    Plaintext keys are sealed later by the vault, which holds the passphrase.
+    """
+    wallet_columns = _columns(conn, "wallets")
+    if "encrypted_key" not in wallet_columns:
+        _rebuild_wallets(conn, wallet_columns)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_wallets_user ON wallets(user_id)")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS vault_meta (
+        name TEXT PRIMARY KEY,
+        value BLOB NOT NULL
+    )''')
+
+
+def _rebuild_wallets(conn, wallet_columns: set) -> None:
+    conn.execute("DROP TABLE IF EXISTS wallets_new")
+    conn.execute('''
+    CREATE TABLE wallets_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        address TEXT UNIQUE NOT NULL,
+        private_key TEXT UNIQUE, -- NULL once sealed into encrypted_key
+        encrypted_key BLOB,
+        balance REAL NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    # Older files predate some columns (e.g. created_at); copy what exists
+    columns = ", ".join(c for c in ("id", "user_id", "address", "private_key", "balance", "created_at")
+                        if c in wallet_columns)
+    conn.execute(f"INSERT INTO wallets_new ({columns}) SELECT {columns} FROM wallets")
+    conn.execute("DROP TABLE wallets")
+    conn.execute("ALTER TABLE wallets_new RENAME TO wallets")
+
+
+def hd_wallets(conn) -> None:
+    """One BIP-32 seed per user; wallets derived from it store their index, not a key."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS hd_seeds (
+        user_id INTEGER PRIMARY KEY,
+        seed TEXT, -- hex; NULL once sealed into encrypted_seed
+        encrypted_seed BLOB,
+        next_index INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    if "hd_index" not in _columns(conn, "wallets"):
+        conn.execute("ALTER TABLE wallets ADD COLUMN hd_index INTEGER")
+
+def alert_triggers(conn) -> None:
+    """When each alert fired, plus a partial index for the alert index's startup load."""
+    if "triggered_at" not in _columns(conn, "alerts"):
+        conn.execute("ALTER TABLE alerts ADD COLUMN triggered_at TIMESTAMP")
+    # The alert index loads every active alert at startup; fired ones pile up
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_active_type ON alerts(alert_type) WHERE is_active = 1")
+
+
+# (version, description, step)
+MIGRATIONS = [
+    (1, "baseline tables", BASELINE_TABLES),
+    (2, "lookup indexes", LOOKUP_INDEXES),
+    (3, "integer trade amounts", integer_amounts),
+    (4, "user stats", user_stats),
+    (5, "windowed volume", windowed_volume),
+    (6, "token volume rollups", token_volume_rollups),
+    (7, "archive batches", archive_batches),
+    (8, "encrypted wallet keys", encrypted_wallet_keys),
+    (9, "hd wallets", hd_wallets),
+    (10, "alert triggers", alert_triggers),
+]
+
+
+def current_version(conn) -> int:
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(db: Database = None) -> int:
+    """
+    Apply every pending migration and return the resulting schema version.
+    """
+    db = db or get_db()
+    with db.writer() as conn:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+        version = current_version(conn)
+
+    for number, description, step in MIGRATIONS:
+        if number <= version:
+            continue
+        with db.writer() as conn:
+            # Another process may have applied it since; BEGIN IMMEDIATE makes this check race-free
+            version = current_version(conn)
+            if number <= version:
+                continue
+            if callable(step):
+                step(conn)
+            else:
+                for sql in step:
+                    conn.execute(sql)
+            conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)", (number, description))
+        print(f"🗄️ Applied migration {number}: {description}")
+        version = number
+    return version
@@ -0,0 +1,312 @@
+"""
+Outbound message queue for everything the bot sends on its own initiative:
+channel broadcasts, alert notifications and trade confirmations.
+
+Telegram allows a bot about 30 messages a second overall, about one a second in
+a private chat and 20 a minute in a group or channel, and answers 429
+RetryAfter past that. Each queued message takes a token from a global bucket and
+one from its chat's bucket before it is sent:
+
+  global  - BASEFLOW_OUTBOX_RATE per second (default 25; handler replies use the rest)
+  private - 1 per second, bursts of CHAT_BURST
+  group   - 20 per minute, bursts of CHAT_BURST (negative chat ids and @channel names)
+
+When tokens are short, lanes decide what goes first: trade confirmations, then
+alerts, then broadcasts. A chat's messages go out in lane order, one at a time,
+and a chat waiting on its own bucket never holds up the others. A RetryAfter
+pauses the whole queue for as long as Telegram asks, then the message is retried.
+
+Messages submitted with a `digest` key merge while they wait: during a wave of
+listings the channel gets one "N new listings" message per slot, not one each.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+
+from dotenv import load_dotenv
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+load_dotenv()
+
+OUTBOX_RATE = float(os.getenv("BASEFLOW_OUTBOX_RATE", "25"))
+OUTBOX_DRAIN_SECONDS = float(os.getenv("BASEFLOW_OUTBOX_DRAIN_SECONDS", "10"))
+PRIVATE_CHAT_RATE = 1.0
+GROUP_CHAT_RATE = 20 / 60
+CHAT_BURST = 3
+MAX_ATTEMPTS = 3
+MAX_MESSAGE_LENGTH = 4096
+# Idle chat buckets are dropped once this many chats are tracked
+MAX_IDLE_CHATS = 10_000
+
+LANE_TRADE = 0
+LANE_ALERT = 1
+LANE_BROADCAST = 2
+
+DEFAULT_DIGEST_TITLE = "📬 *{count} updates*"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is now)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+def _chat_rate(chat_id) -> float:
+    return GROUP_CHAT_RATE if str(chat_id).startswith(("-", "@")) else PRIVATE_CHAT_RATE
+
+
+class _Message:
+    def __init__(self, text: str, digest: str, summary: str, title: str, kwargs: dict, future: asyncio.Future):
+        self.text = text
+        self.digest = digest
+        self.title = title or DEFAULT_DIGEST_TITLE
+        self.summaries = [summary or text]
+        self.kwargs = kwargs
+        self.futures = [future]
+        self.attempts = 0
+
+    def _digest_text(self, summaries: list) -> str:
+        return self.title.format(count=len(summaries)) + "\n\n" + "\n".join(summaries)
+
+    def merge(self, summary: str, future: asyncio.Future) -> bool:
+        """Fold another message into this one, unless the digest would get too long."""
+        if len(self._digest_text(self.summaries + [summary])) > MAX_MESSAGE_LENGTH:
+            return False
+        self.summaries.append(summary)
+        self.futures.append(future)
+        return True
+
+    def render(self) -> tuple:
+        """(text, send_message kwargs); a digest drops the first message's buttons."""
+        if len(self.summaries) == 1:
+            return self.text, self.kwargs
+        kwargs = {k: v for k, v in self.kwargs.items() if k != "reply_markup"}
+        return self._digest_text(self.summaries), kwargs
+
+    def resolve(self, result) -> None:
+        for future in self.futures:
+            if not future.done():
+                future.set_result(result)
+
+
+class _Chat:
+    def __init__(self, chat_id):
+        self.chat_id = chat_id
+        self.bucket = TokenBucket(_chat_rate(chat_id), CHAT_BURST)
+        self.queue = []  # heap of (lane, seq, message)
+        self.digests = {}  # digest key -> its queued message
+        self.busy = False
+
+
+class Outbox:
+    def __init__(self, rate: float = OUTBOX_RATE):
+        self.bot = None
+        # A fifth of a second's worth of burst: at most 1.2x the rate in any one second
+        self._global = TokenBucket(rate, max(rate / 5, 1))
+        self._chats = {}
+        self._ready = []  # heap of (lane, seq, chat_id): chats whose head message may go now
+        self._waiting = []  # heap of (ready_at, seq, chat_id): chats waiting on their bucket
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._wakeup = asyncio.Event()
+        self._sending = set()
+        self._task = None
+        self._closed = False
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+        self.rate_limited = 0
+
+    def start(self, bot) -> None:
+        """Start sending through `bot` (called from post_init)."""
+        self.bot = bot
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def submit(self, chat_id, text: str, lane: int = LANE_BROADCAST, digest: str = None,
+               summary: str = None, title: str = None, **kwargs) -> asyncio.Future:
+        """
+        Queue a send_message call and return a future for the sent Message (None if
+        it was dropped). Messages to the same chat with the same `digest` key are
+        merged while queued: the digest is `title` (formatted with {count}) over each
+        message's one-line `summary`. Other kwargs go to send_message.
+        """
+        if self._closed:
+            raise RuntimeError("Outbox is closed")
+        future = asyncio.get_running_loop().create_future()
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            if len(self._chats) >= MAX_IDLE_CHATS:
+                self._prune()
+            chat = self._chats[chat_id] = _Chat(chat_id)
+
+        if digest:
+            queued = chat.digests.get(digest)
+            if queued is not None and queued.merge(summary or text, future):
+                self.merged += 1
+                return future
+
+        message = _Message(text, digest, summary, title, kwargs, future)
+        if digest:
+            chat.digests[digest] = message
+        heapq.heappush(chat.queue, (lane, next(self._seq), message))
+        self._schedule(chat)
+        return future
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(len(chat.queue) for chat in self._chats.values()),
+            "sending": len(self._sending),
+            "sent": self.sent,
+            "merged": self.merged,
+            "dropped": self.dropped,
+            "rate_limited": self.rate_limited,
+        }
+
+    def _schedule(self, chat: _Chat) -> None:
+        if chat.busy or not chat.queue:
+            return
+        now = time.monotonic()
+        delay = chat.bucket.delay(now)
+        if delay:
+            heapq.heappush(self._waiting, (now + delay, next(self._seq), chat.chat_id))
+        else:
+            lane, seq, _ = chat.queue[0]
+            heapq.heappush(self._ready, (lane, seq, chat.chat_id))
+        self._wakeup.set()
+
+    def _next_ready(self) -> _Chat:
+        """The chat whose head message has the best lane, skipping entries that went stale."""
+        while self._ready:
+            lane, seq, chat_id = self._ready[0]
+            chat = self._chats.get(chat_id)
+            if chat and not chat.busy and chat.queue and chat.queue[0][:2] == (lane, seq):
+                return chat
+            heapq.heappop(self._ready)
+        return None
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for chat_id, chat in list(self._chats.items()):
+            if not chat.busy and not chat.queue and chat.bucket.is_full(now):
+                del self._chats[chat_id]
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            while self._waiting and self._waiting[0][0] <= now:
+                _, _, chat_id = heapq.heappop(self._waiting)
+                if chat_id in self._chats:
+                    self._schedule(self._chats[chat_id])
+
+            chat = self._next_ready()
+            if chat is None:
+                if self._closed and not self._sending and not self._waiting:
+                    return
+                self._wakeup.clear()
+                timeout = self._waiting[0][0] - now if self._waiting else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Sleep without taking the chat, so a better lane queued meanwhile goes first
+            delay = max(self._paused_until - now, self._global.delay(now))
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            lane, seq, message = heapq.heappop(chat.queue)
+            if chat.digests.get(message.digest) is message:
+                del chat.digests[message.digest]
+            chat.busy = True
+            chat.bucket.take(now)
+            self._global.take(now)
+            task = asyncio.create_task(self._send(chat, lane, seq, message))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, chat: _Chat, lane: int, seq: int, message: _Message) -> None:
+        text, kwargs = message.render()
+        try:
+            result = await self.bot.send_message(chat_id=chat.chat_id, text=text, **kwargs)
+            self.sent += 1
+            message.resolve(result)
+        except RetryAfter as e:
+            wait = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + wait)
+            print(f"⏳ Telegram flood control: outbox paused for {wait:.0f}s")
+            self._requeue(chat, lane, seq, message)
+        except (Forbidden, BadRequest) as e:
+            # Blocked by the user, chat gone, malformed text: retrying won't help
+            self.dropped += 1
+            print(f"❌ Outbox dropped a message to {chat.chat_id}: {e}")
+            message.resolve(None)
+        except NetworkError as e:
+            message.attempts += 1
+            if message.attempts < MAX_ATTEMPTS:
+                self._requeue(chat, lane, seq, message)
+            else:
+                self.dropped += 1
+                print(f"❌ Outbox gave up on a message to {chat.chat_id}: {e}")
+                message.resolve(None)
+        except Exception as e:
+            self.dropped += 1
+            print(f"❌ Outbox error sending to {chat.chat_id}: {e}")
+            message.resolve(None)
+        finally:
+            chat.busy = False
+            self._schedule(chat)
+            self._wakeup.set()
+
+    def _requeue(self, chat: _Chat, lane: int, seq: int, message: _Message) -> None:
+        # Same (lane, seq): it goes back to the front of its chat's queue
+        heapq.heappush(chat.queue, (lane, seq, message))
+        if message.digest:
+            chat.digests.setdefault(message.digest, message)
+
+    async def close(self) -> None:
+        """Stop accepting messages and give the queue OUTBOX_DRAIN_SECONDS to empty (called on shutdown)."""
+        self._closed = True
+        if self._task is None:
+            return
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, OUTBOX_DRAIN_SECONDS)
+        except asyncio.TimeoutError:
+            queued = self.stats()["queued"]
+            if queued:
+                print(f"⚠️ Outbox closed with {queued} messages unsent")
+        self._task = None
+
+# Global instance for use in the bot
+_outbox = None
+
+def get_outbox() -> Outbox:
+    global _outbox
+    if _outbox is None:
+        _outbox = Outbox()
+    return _outbox
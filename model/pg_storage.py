@@ -0,0 +1,1004 @@
+"""
+PostgreSQL storage engine (BASEFLOW_STORAGE=postgres).
+
+Implements every store_to_db operation as a coroutine over an asyncpg
+connection pool, so several bot workers can share one database. Batches from
+the write-behind queue run in one transaction with a savepoint per write, and
+runs of AI signals inside a batch are written with COPY.
+
+Import an existing SQLite database (bulk COPY, table by table):
+    python pg_storage.py import [path/to/wallet.db]
+"""
+import asyncio
+import contextvars
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import asyncpg
+from dotenv import load_dotenv
+
+from store_to_db import (
+    DEFAULT_SETTINGS, EXPORT_CHUNK_ROWS, TRADE_EXPORT_COLUMNS, TRADE_EXPORT_SQL, VOLUME_ROLLUPS, VOLUME_WINDOWS,
+    WEI_PER_GWEI, _export_row, _pack_rows, _rollup_for, _unpack_rows,
+)
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost/baseflow")
+PG_POOL_MIN = int(os.getenv("BASEFLOW_PG_POOL_MIN", "2"))
+PG_POOL_MAX = int(os.getenv("BASEFLOW_PG_POOL_MAX", "10"))
+# Serializes schema upgrades when several workers start at once
+SCHEMA_LOCK_ID = 0xBA5EF10
+
+# The connection of the batch being applied, so nested operations join its transaction
+_batch_conn = contextvars.ContextVar("baseflow_pg_batch_conn", default=None)
+
+# (version, description, statements). Mirrors the SQLite schema in migrations.py.
+PG_MIGRATIONS = [
+    (1, "initial schema", [
+        '''
+        CREATE TABLE IF NOT EXISTS wallets (
+            id BIGSERIAL PRIMARY KEY,
+            user_id BIGINT NOT NULL,
+            address TEXT UNIQUE NOT NULL,
+            private_key TEXT UNIQUE NOT NULL,
+            balance DOUBLE PRECISION NOT NULL,
+            created_at TIMESTAMPTZ DEFAULT now()
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS trades (
+            id BIGSERIAL PRIMARY KEY,
+            user_id BIGINT NOT NULL,
+            wallet_address TEXT NOT NULL,
+            tx_hash TEXT UNIQUE NOT NULL,
+            token_in TEXT NOT NULL,
+            token_out TEXT NOT NULL,
+            amount_in TEXT NOT NULL,
+            amount_out TEXT NOT NULL,
+            trade_type TEXT NOT NULL,
+            status TEXT NOT NULL,
+            gas_used BIGINT,
+            block_number BIGINT,
+            created_at TIMESTAMPTZ DEFAULT now(),
+            amount_in_raw NUMERIC(78, 0),
+            amount_out_raw NUMERIC(78, 0),
+            eth_value_gwei BIGINT
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id BIGINT PRIMARY KEY,
+            username TEXT,
+            referred_by BIGINT,
+            created_at TIMESTAMPTZ DEFAULT now()
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS volume_tracking (
+            id BIGSERIAL PRIMARY KEY,
+            token_address TEXT NOT NULL,
+            volume_eth DOUBLE PRECISION NOT NULL,
+            trade_count INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            volume_gwei BIGINT NOT NULL DEFAULT 0,
+            UNIQUE (token_address, date)
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS referral_earnings (
+            id BIGSERIAL PRIMARY KEY,
+            referrer_id BIGINT NOT NULL,
+            referred_user_id BIGINT NOT NULL,
+            amount_eth DOUBLE PRECISION DEFAULT 0,
+            timestamp TIMESTAMPTZ DEFAULT now()
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS settings (
+            user_id BIGINT PRIMARY KEY,
+            slippage DOUBLE PRECISION DEFAULT 0.5,
+            auto_buy_enabled INTEGER DEFAULT 0,
+            auto_buy_amount DOUBLE PRECISION DEFAULT 0.1,
+            auto_sell_tp DOUBLE PRECISION DEFAULT 100.0,
+            auto_sell_sl DOUBLE PRECISION DEFAULT 50.0,
+            gas_price_mode TEXT DEFAULT 'normal'
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS pending_orders (
+            id BIGSERIAL PRIMARY KEY,
+            user_id BIGINT NOT NULL,
+            wallet_address TEXT NOT NULL,
+            token_address TEXT NOT NULL,
+            order_type TEXT NOT NULL,
+            trigger_price DOUBLE PRECISION,
+            amount_eth DOUBLE PRECISION,
+            amount_tokens DOUBLE PRECISION,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMPTZ DEFAULT now()
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS ai_signals (
+            id BIGSERIAL PRIMARY KEY,
+            token_address TEXT NOT NULL,
+            signal_type TEXT NOT NULL,
+            insight TEXT NOT NULL,
+            reliability DOUBLE PRECISION,
+            created_at TIMESTAMPTZ DEFAULT now()
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS alerts (
+            id BIGSERIAL PRIMARY KEY,
+            user_id BIGINT NOT NULL,
+            alert_type TEXT NOT NULL,
+            target_address TEXT,
+            target_value DOUBLE PRECISION,
+            is_active INTEGER DEFAULT 1,
+            created_at TIMESTAMPTZ DEFAULT now()
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS candles (
+            token_address TEXT NOT NULL,
+            open_time BIGINT NOT NULL,
+            open DOUBLE PRECISION NOT NULL,
+            high DOUBLE PRECISION NOT NULL,
+            low DOUBLE PRECISION NOT NULL,
+            close DOUBLE PRECISION NOT NULL,
+            PRIMARY KEY (token_address, open_time)
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS code_scans (
+            code_hash TEXT PRIMARY KEY,
+            result TEXT NOT NULL,
+            scanned_at TIMESTAMPTZ DEFAULT now()
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id BIGINT PRIMARY KEY,
+            trade_count INTEGER NOT NULL DEFAULT 0,
+            volume_gwei BIGINT NOT NULL DEFAULT 0,
+            last_trade_at TIMESTAMPTZ
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS user_volume_hourly (
+            user_id BIGINT NOT NULL,
+            hour BIGINT NOT NULL,
+            volume_gwei BIGINT NOT NULL DEFAULT 0,
+            trade_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, hour)
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS user_volume_windows (
+            period TEXT NOT NULL,
+            user_id BIGINT NOT NULL,
+            volume_gwei BIGINT NOT NULL DEFAULT 0,
+            trade_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, user_id)
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS volume_window_state (
+            period TEXT PRIMARY KEY,
+            expired_through BIGINT NOT NULL
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_trades_user_created ON trades(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_wallets_user ON wallets(user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_users_referred_by ON users(referred_by)",
+        "CREATE INDEX IF NOT EXISTS idx_alerts_user_active ON alerts(user_id, is_active)",
+        "CREATE INDEX IF NOT EXISTS idx_pending_orders_status_token ON pending_orders(status, token_address)",
+        "CREATE INDEX IF NOT EXISTS idx_user_stats_volume ON user_stats(volume_gwei DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_user_volume_hourly_hour ON user_volume_hourly(hour)",
+        "CREATE INDEX IF NOT EXISTS idx_user_volume_windows_rank ON user_volume_windows(period, volume_gwei DESC)",
+        '''
+        INSERT INTO volume_window_state (period, expired_through)
+        SELECT period, (EXTRACT(EPOCH FROM now())::BIGINT / 3600) - hours
+        FROM (VALUES ('24h', 24), ('7d', 168), ('30d', 720)) AS w(period, hours)
+        ON CONFLICT (period) DO NOTHING''',
+    ]),
+    (2, "token volume rollups", [
+        *(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            bucket BIGINT NOT NULL,
+            token_address TEXT NOT NULL,
+            volume_gwei BIGINT NOT NULL DEFAULT 0,
+            trade_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket, token_address)
+        )''' for table in VOLUME_ROLLUPS),
+        '''
+        INSERT INTO token_volume_1d (bucket, token_address, volume_gwei, trade_count)
+        SELECT EXTRACT(EPOCH FROM date::date)::BIGINT, LOWER(token_address), SUM(volume_gwei), SUM(trade_count)
+        FROM volume_tracking
+        GROUP BY 1, 2
+        ON CONFLICT (bucket, token_address) DO NOTHING''',
+        "DROP TABLE IF EXISTS volume_tracking",
+    ]),
+    (3, "trade history keyset index", [
+        "CREATE INDEX IF NOT EXISTS idx_trades_user_created_id ON trades(user_id, created_at, id)",
+        "DROP INDEX IF EXISTS idx_trades_user_created",
+    ]),
+    (4, "archive batches", [
+        '''
+        CREATE TABLE IF NOT EXISTS archive_batches (
+            id BIGSERIAL PRIMARY KEY,
+            source TEXT NOT NULL,
+            user_id BIGINT,
+            first_id BIGINT NOT NULL,
+            last_id BIGINT NOT NULL,
+            oldest TIMESTAMPTZ,
+            newest TIMESTAMPTZ,
+            row_count INTEGER NOT NULL,
+            columns TEXT NOT NULL,
+            payload BYTEA NOT NULL,
+            archived_at TIMESTAMPTZ DEFAULT now()
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_archive_batches_source_user ON archive_batches(source, user_id, first_id)",
+        "CREATE INDEX IF NOT EXISTS idx_ai_signals_created ON ai_signals(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_trades_created ON trades(created_at)",
+    ]),
+    (5, "encrypted wallet keys", [
+        "ALTER TABLE wallets ALTER COLUMN private_key DROP NOT NULL",
+        "ALTER TABLE wallets ADD COLUMN IF NOT EXISTS encrypted_key BYTEA",
+        '''
+        CREATE TABLE IF NOT EXISTS vault_meta (
+            name TEXT PRIMARY KEY,
+            value BYTEA NOT NULL
+        )''',
+    ]),
+    (6, "hd wallets", [
+        '''
+        CREATE TABLE IF NOT EXISTS hd_seeds (
+            user_id BIGINT PRIMARY KEY,
+            seed TEXT,
+            encrypted_seed BYTEA,
+            next_index INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMPTZ DEFAULT now()
+        )''',
+        "ALTER TABLE wallets ADD COLUMN IF NOT EXISTS hd_index INTEGER",
+    ]),
+    (7, "alert triggers", [
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS triggered_at TIMESTAMPTZ",
+        "CREATE INDEX IF NOT EXISTS idx_alerts_active_type ON alerts(alert_type) WHERE is_active = 1",
+    ]),
+]
+
+# Tables copied by `import`, parents first; timestamps arrive from SQLite as text
+IMPORT_TABLES = [
+    "users", "wallets", "settings", "trades", "referral_earnings",
+    "pending_orders", "ai_signals", "alerts", "candles", "code_scans", "user_stats",
+    "user_volume_hourly", "user_volume_windows", "volume_window_state", *VOLUME_ROLLUPS, "archive_batches",
+    "vault_meta", "hd_seeds",
+]
+TIMESTAMP_COLUMNS = {"created_at", "timestamp", "scanned_at", "last_trade_at", "oldest", "newest", "archived_at", "triggered_at"}
+NUMERIC_COLUMNS = {"amount_in_raw", "amount_out_raw"}
+
+
+def _utc(timestamp: str) -> datetime:
+    """'YYYY-MM-DD HH:MM:SS' (UTC, as store_to_db passes timestamps) to an aware datetime."""
+    return datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc)
+
+
+def _raw(value):
+    return None if value is None else Decimal(int(value))
+
+
+class PostgresStorage:
+    name = "postgres"
+
+    def __init__(self, dsn: str = DATABASE_URL, min_size: int = PG_POOL_MIN, max_size: int = PG_POOL_MAX):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pool = None
+
+    # ============ Engine ============
+
+    def init_schema(self) -> int:
+        # Runs on a loop of its own, so it works before the bot's loop starts and from inside it
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self._migrate()).result()
+
+    async def _migrate(self) -> int:
+        conn = await asyncpg.connect(self.dsn)
+        try:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", SCHEMA_LOCK_ID)
+                await conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMPTZ DEFAULT now()
+                )''')
+                version = await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+                for number, description, statements in PG_MIGRATIONS:
+                    if number <= version:
+                        continue
+                    for sql in statements:
+                        await conn.execute(sql)
+                    await conn.execute("INSERT INTO schema_version (version, description) VALUES ($1, $2)", number, description)
+                    print(f"🗄️ Applied PostgreSQL migration {number}: {description}")
+                    version = number
+            return version
+        finally:
+            await conn.close()
+
+    async def _get_pool(self):
+        if self._pool is None:
+            self._pool = await asyncpg.create_pool(
+                self.dsn, min_size=self.min_size, max_size=self.max_size, command_timeout=30
+            )
+        return self._pool
+
+    @asynccontextmanager
+    async def _tx(self):
+        """A connection inside a transaction; within a batch, a savepoint on the batch's connection."""
+        conn = _batch_conn.get()
+        if conn is not None:
+            async with conn.transaction():
+                yield conn
+            return
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                yield conn
+
+    @asynccontextmanager
+    async def _conn(self):
+        conn = _batch_conn.get()
+        if conn is not None:
+            yield conn
+            return
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            yield conn
+
+    async def read(self, fn, args, kwargs):
+        return await getattr(self, fn.__name__)(*args, **kwargs)
+
+    async def write(self, fn, args, kwargs):
+        return await getattr(self, fn.__name__)(*args, **kwargs)
+
+    async def apply_batch(self, writes: list) -> list:
+        """
+        Apply [(operation, args, kwargs)] in one transaction and return
+        [(ok, result_or_exception)] in the same order.
+        """
+        results = [None] * len(writes)
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                token = _batch_conn.set(conn)
+                try:
+                    for i in await self._copy_signals(conn, writes):
+                        results[i] = (True, None)
+                    for i, (fn, args, kwargs) in enumerate(writes):
+                        if results[i] is not None:
+                            continue
+                        try:
+                            # Each operation opens its own savepoint through _tx()
+                            results[i] = (True, await getattr(self, fn.__name__)(*args, **kwargs))
+                        except Exception as e:
+                            results[i] = (False, e)
+                finally:
+                    _batch_conn.reset(token)
+        return results
+
+    async def _copy_signals(self, conn, writes: list) -> list:
+        """COPY every save_ai_signal of a batch in one go; returns the batch positions written."""
+        positions, records = [], []
+        for i, (fn, args, kwargs) in enumerate(writes):
+            if fn.__name__ == "save_ai_signal":
+                positions.append(i)
+                records.append(self._signal_record(*args, **kwargs))
+        if len(records) < 2:
+            return []
+        try:
+            async with conn.transaction():
+                await conn.copy_records_to_table(
+                    "ai_signals", records=records,
+                    columns=["token_address", "signal_type", "insight", "reliability"]
+                )
+        except Exception as e:
+            print(f"⚠️ COPY into ai_signals failed, inserting one by one: {e}")
+            return []
+        return positions
+
+    @staticmethod
+    def _signal_record(token_address: str, signal_type: str, insight: str, reliability: float = 1.0) -> tuple:
+        return (token_address, signal_type, insight, reliability)
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    # ============ Wallets ============
+
+    async def _create_wallet_db(self, user_id: int, address: str, private_key: str, balance: float, encrypted_key: bytes = None) -> None:
+        async with self._tx() as conn:
+            await conn.execute(
+                "INSERT INTO wallets (user_id, address, private_key, encrypted_key, balance) VALUES ($1, $2, $3, $4, $5)",
+                user_id, address, private_key, encrypted_key, balance
+            )
+
+    async def _create_wallets_db(self, user_id: int, rows: list) -> None:
+        async with self._tx() as conn:
+            await conn.executemany(
+                "INSERT INTO wallets (user_id, address, private_key, encrypted_key, balance) VALUES ($1, $2, $3, $4, 0)",
+                [(user_id, address, private_key, encrypted_key) for address, private_key, encrypted_key in rows]
+            )
+
+    async def fetch_from_wallet(self, user_id: int, address: str, private_key: str):
+        async with self._conn() as conn:
+            result = await conn.fetchrow("SELECT private_key FROM wallets WHERE address = $1", address)
+            result2 = await conn.fetchrow("SELECT address FROM wallets WHERE private_key = $1", private_key)
+        if result and result2:
+            return (tuple(result), tuple(result2))
+        return "Wallet not found."
+
+    async def balance_check(self, address: str):
+        async with self._conn() as conn:
+            balance = await conn.fetchval("SELECT balance FROM wallets WHERE address = $1", address)
+        return balance if balance is not None else "Wallet not found."
+
+    async def _fetch_all_from_wallet(self, user_id: int) -> list:
+        async with self._conn() as conn:
+            rows = await conn.fetch("SELECT address FROM wallets WHERE user_id = $1 ORDER BY id", user_id)
+        return [{"address": r["address"]} for r in rows]
+
+    async def get_wallet_key(self, user_id: int, address: str):
+        async with self._conn() as conn:
+            row = await conn.fetchrow(
+                "SELECT private_key, encrypted_key, hd_index FROM wallets WHERE LOWER(address) = LOWER($1) AND user_id = $2",
+                address, user_id
+            )
+        return None if row is None else (row["private_key"], row["encrypted_key"], row["hd_index"])
+
+    async def get_plaintext_wallet_keys(self, limit: int = 500) -> list:
+        async with self._conn() as conn:
+            rows = await conn.fetch(
+                "SELECT id, address, private_key FROM wallets WHERE encrypted_key IS NULL AND private_key IS NOT NULL LIMIT $1",
+                limit
+            )
+        return [tuple(r) for r in rows]
+
+    async def seal_wallet_keys(self, sealed: list) -> None:
+        async with self._tx() as conn:
+            await conn.executemany(
+                "UPDATE wallets SET encrypted_key = $1, private_key = NULL WHERE id = $2",
+                [(blob, wallet_id) for wallet_id, blob in sealed]
+            )
+
+    async def get_vault_meta(self) -> dict:
+        async with self._conn() as conn:
+            rows = await conn.fetch("SELECT name, value FROM vault_meta")
+        return {r["name"]: bytes(r["value"]) for r in rows}
+
+    async def init_vault_meta(self, meta: dict) -> None:
+        async with self._tx() as conn:
+            await conn.executemany(
+                "INSERT INTO vault_meta (name, value) VALUES ($1, $2) ON CONFLICT (name) DO NOTHING",
+                list(meta.items())
+            )
+
+    async def get_hd_seed(self, user_id: int):
+        async with self._conn() as conn:
+            row = await conn.fetchrow(
+                "SELECT seed, encrypted_seed, next_index FROM hd_seeds WHERE user_id = $1", user_id
+            )
+        return None if row is None else (row["seed"], row["encrypted_seed"], row["next_index"])
+
+    async def create_hd_seed(self, user_id: int, seed: str, encrypted_seed: bytes = None) -> None:
+        async with self._tx() as conn:
+            await conn.execute(
+                "INSERT INTO hd_seeds (user_id, seed, encrypted_seed) VALUES ($1, $2, $3) ON CONFLICT (user_id) DO NOTHING",
+                user_id, seed, encrypted_seed
+            )
+
+    async def get_plaintext_hd_seeds(self, limit: int = 500) -> list:
+        async with self._conn() as conn:
+            rows = await conn.fetch(
+                "SELECT user_id, seed FROM hd_seeds WHERE encrypted_seed IS NULL AND seed IS NOT NULL LIMIT $1", limit
+            )
+        return [tuple(r) for r in rows]
+
+    async def seal_hd_seeds(self, sealed: list) -> None:
+        async with self._tx() as conn:
+            await conn.executemany(
+                "UPDATE hd_seeds SET encrypted_seed = $1, seed = NULL WHERE user_id = $2",
+                [(blob, user_id) for user_id, blob in sealed]
+            )
+
+    async def _add_hd_wallets(self, user_id: int, start_index: int, addresses: list) -> None:
+        async with self._tx() as conn:
+            claimed = await conn.fetchval(
+                "UPDATE hd_seeds SET next_index = next_index + $1 WHERE user_id = $2 AND next_index = $3 RETURNING user_id",
+                len(addresses), user_id, start_index
+            )
+            if claimed is None:
+                raise ValueError(f"HD wallet indexes from {start_index} are already taken for user {user_id}")
+            await conn.executemany(
+                "INSERT INTO wallets (user_id, address, hd_index, balance) VALUES ($1, $2, $3, 0)",
+                [(user_id, address, start_index + i) for i, address in enumerate(addresses)]
+            )
+
+    async def _delete_wallets_by_user(self, user_id: int) -> None:
+        async with self._tx() as conn:
+            await conn.execute("DELETE FROM wallets WHERE user_id = $1", user_id)
+        print(f"All wallets for user {user_id} have been deleted.")
+
+    async def _delete_specific_wallet(self, user_id: int, addr: str) -> None:
+        async with self._tx() as conn:
+            await conn.execute("DELETE FROM wallets WHERE address = $1 AND user_id = $2", addr, user_id)
+        print(f"Wallet with address {addr} for user {user_id} has been deleted.")
+
+    # ============ Trades & Volume ============
+
+    async def save_trade(
+        self, user_id: int, wallet_address: str, tx_hash: str, token_in: str, token_out: str,
+        amount_in: str, amount_out: str, trade_type: str, status: str,
+        gas_used: int = None, block_number: int = None,
+        amount_in_raw: int = None, amount_out_raw: int = None, eth_value_wei: int = None
+    ) -> None:
+        volume_gwei = (eth_value_wei or 0) // WEI_PER_GWEI
+        async with self._tx() as conn:
+            await conn.execute('''
+                INSERT INTO trades (user_id, wallet_address, tx_hash, token_in, token_out,
+                                    amount_in, amount_out, trade_type, status, gas_used, block_number,
+                                    amount_in_raw, amount_out_raw, eth_value_gwei)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
+            ''', user_id, wallet_address, tx_hash, token_in, token_out,
+                amount_in, amount_out, trade_type, status, gas_used, block_number,
+                _raw(amount_in_raw), _raw(amount_out_raw),
+                None if eth_value_wei is None else volume_gwei)
+            await conn.execute('''
+                INSERT INTO user_stats (user_id, trade_count, volume_gwei, last_trade_at)
+                VALUES ($1, 1, $2, now())
+                ON CONFLICT (user_id) DO UPDATE SET
+                    trade_count = user_stats.trade_count + 1,
+                    volume_gwei = user_stats.volume_gwei + excluded.volume_gwei,
+                    last_trade_at = excluded.last_trade_at
+            ''', user_id, volume_gwei)
+            await self._add_window_volume(conn, user_id, volume_gwei)
+
+    async def _add_window_volume(self, conn, user_id: int, volume_gwei: int) -> None:
+        hour = int(time.time()) // 3600
+        await conn.execute('''
+            INSERT INTO user_volume_hourly (user_id, hour, volume_gwei, trade_count)
+            VALUES ($1, $2, $3, 1)
+            ON CONFLICT (user_id, hour) DO UPDATE SET
+                volume_gwei = user_volume_hourly.volume_gwei + excluded.volume_gwei,
+                trade_count = user_volume_hourly.trade_count + 1
+        ''', user_id, hour, volume_gwei)
+        await conn.executemany('''
+            INSERT INTO user_volume_windows (period, user_id, volume_gwei, trade_count)
+            VALUES ($1, $2, $3, 1)
+            ON CONFLICT (period, user_id) DO UPDATE SET
+                volume_gwei = user_volume_windows.volume_gwei + excluded.volume_gwei,
+                trade_count = user_volume_windows.trade_count + 1
+        ''', [(period, user_id, volume_gwei) for period in VOLUME_WINDOWS])
+        await self._expire_window_volume(conn, hour)
+
+    async def _expire_window_volume(self, conn, hour: int) -> None:
+        for period, hours in VOLUME_WINDOWS.items():
+            cutoff = hour - hours
+            # Row lock: two workers rolling the same window forward must not both subtract
+            expired_through = await conn.fetchval(
+                "SELECT expired_through FROM volume_window_state WHERE period = $1 FOR UPDATE", period
+            )
+            if expired_through is None:
+                expired_through = cutoff
+            if cutoff <= expired_through:
+                continue
+            await conn.execute('''
+                UPDATE user_volume_windows w
+                SET volume_gwei = w.volume_gwei - b.volume_gwei,
+                    trade_count = w.trade_count - b.trade_count
+                FROM (
+                    SELECT user_id, SUM(volume_gwei) AS volume_gwei, SUM(trade_count) AS trade_count
+                    FROM user_volume_hourly
+                    WHERE hour > $1 AND hour <= $2
+                    GROUP BY user_id
+                ) b
+                WHERE w.period = $3 AND w.user_id = b.user_id
+            ''', expired_through, cutoff, period)
+            await conn.execute("DELETE FROM user_volume_windows WHERE period = $1 AND trade_count <= 0", period)
+            await conn.execute('''
+                INSERT INTO volume_window_state (period, expired_through) VALUES ($1, $2)
+                ON CONFLICT (period) DO UPDATE SET expired_through = excluded.expired_through
+            ''', period, cutoff)
+        await conn.execute("DELETE FROM user_volume_hourly WHERE hour <= $1", hour - max(VOLUME_WINDOWS.values()))
+
+    async def get_user_trades(self, user_id: int, limit: int = 10, before: tuple = None, after: tuple = None) -> list:
+        # The cursor's created_at comes back from a callback as text (asyncpg returns it in UTC)
+        if before is not None:
+            where, order, args = "AND (created_at, id) < ($3, $4)", "DESC", [_utc(str(before[0])), int(before[1])]
+        elif after is not None:
+            where, order, args = "AND (created_at, id) > ($3, $4)", "ASC", [_utc(str(after[0])), int(after[1])]
+        else:
+            where, order, args = "", "DESC", []
+        async with self._conn() as conn:
+            rows = await conn.fetch(f'''
+                SELECT id, tx_hash, token_in, token_out, amount_in, amount_out, trade_type, status, created_at
+                FROM trades
+                WHERE user_id = $1 {where}
+                ORDER BY created_at {order}, id {order}
+                LIMIT $2
+            ''', user_id, limit, *args)
+        trades = [dict(r) for r in rows]
+        if order == "ASC":
+            trades.reverse()
+        return trades
+
+    async def export_user_trades(self, user_id: int, path: str) -> int:
+        count = 0
+        async with self._conn() as conn, conn.transaction():
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(TRADE_EXPORT_COLUMNS.keys())
+                async for batch in conn.cursor(
+                    "SELECT columns, payload FROM archive_batches WHERE source = 'trades' AND user_id = $1 ORDER BY first_id",
+                    user_id, prefetch=1
+                ):
+                    positions = [json.loads(batch["columns"]).index(c) for c in TRADE_EXPORT_COLUMNS.values()]
+                    rows = _unpack_rows(batch["payload"])
+                    writer.writerows(_export_row([row[i] for i in positions]) for row in rows)
+                    count += len(rows)
+                # Server-side cursor: rows arrive EXPORT_CHUNK_ROWS at a time
+                async for r in conn.cursor(TRADE_EXPORT_SQL.format("$1"), user_id, prefetch=EXPORT_CHUNK_ROWS):
+                    writer.writerow(_export_row(tuple(r)))
+                    count += 1
+        return count
+
+    async def get_trade_count(self, user_id: int) -> int:
+        async with self._conn() as conn:
+            count = await conn.fetchval("SELECT trade_count FROM user_stats WHERE user_id = $1", user_id)
+        return count or 0
+
+    async def update_volume_tracking(self, token_address: str, volume_wei: int, timestamp: int = None) -> None:
+        ts = int(timestamp or time.time())
+        volume_gwei = volume_wei // WEI_PER_GWEI
+        async with self._tx() as conn:
+            for table, seconds in VOLUME_ROLLUPS.items():
+                await conn.execute(f'''
+                    INSERT INTO {table} (bucket, token_address, volume_gwei, trade_count)
+                    VALUES ($1, $2, $3, 1)
+                    ON CONFLICT (bucket, token_address) DO UPDATE SET
+                        volume_gwei = {table}.volume_gwei + excluded.volume_gwei,
+                        trade_count = {table}.trade_count + 1
+                ''', ts - ts % seconds, token_address.lower(), volume_gwei)
+
+    async def save_trade_with_volume(self, token_address: str, **trade) -> None:
+        async with self._tx():
+            await self.save_trade(**trade)
+            await self.update_volume_tracking(token_address, trade.get("eth_value_wei") or 0)
+
+    async def get_total_volume(self) -> dict:
+        async with self._conn() as conn:
+            result = await conn.fetchrow("SELECT SUM(volume_gwei), SUM(trade_count) FROM token_volume_1d")
+            unique_traders = await conn.fetchval("SELECT COUNT(*) FROM user_stats")
+        return {
+            "total_volume_eth": int(result[0] or 0) / WEI_PER_GWEI,
+            "total_trades": int(result[1] or 0),
+            "unique_traders": unique_traders or 0
+        }
+
+    async def get_top_tokens_by_volume(self, minutes: int = 15, limit: int = 10) -> list:
+        table = _rollup_for(minutes * 60)
+        seconds = VOLUME_ROLLUPS[table]
+        since = int(time.time()) - minutes * 60
+        async with self._conn() as conn:
+            rows = await conn.fetch(f'''
+                SELECT token_address, SUM(volume_gwei) AS volume, SUM(trade_count) AS trades
+                FROM {table}
+                WHERE bucket >= $1
+                GROUP BY token_address
+                ORDER BY volume DESC
+                LIMIT $2
+            ''', since - since % seconds, limit)
+        return [{"token": r[0], "volume": int(r[1]) / WEI_PER_GWEI, "trades": int(r[2])} for r in rows]
+
+    async def prune_volume_rollups(self, minute_before: int, hour_before: int) -> dict:
+        async with self._tx() as conn:
+            minutes = await conn.execute("DELETE FROM token_volume_1m WHERE bucket < $1", minute_before)
+            hours = await conn.execute("DELETE FROM token_volume_1h WHERE bucket < $1", hour_before)
+        # execute() returns the command tag, e.g. "DELETE 42"
+        return {"token_volume_1m": int(minutes.split()[-1]), "token_volume_1h": int(hours.split()[-1])}
+
+    # ============ Users, Referrals & Leaderboards ============
+
+    async def register_user(self, user_id: int, username: str, referred_by: int = None) -> None:
+        async with self._tx() as conn:
+            await conn.execute('''
+                INSERT INTO users (user_id, username, referred_by) VALUES ($1, $2, $3)
+                ON CONFLICT (user_id) DO NOTHING
+            ''', user_id, username, referred_by)
+
+    async def get_referral_stats(self, user_id: int) -> dict:
+        async with self._conn() as conn:
+            referral_count = await conn.fetchval("SELECT COUNT(*) FROM users WHERE referred_by = $1", user_id)
+            total_earned = await conn.fetchval("SELECT SUM(amount_eth) FROM referral_earnings WHERE referrer_id = $1", user_id)
+        return {"referral_count": referral_count, "total_earned_eth": total_earned or 0.0}
+
+    async def get_leaderboard(self, limit: int = 10) -> list:
+        async with self._conn() as conn:
+            rows = await conn.fetch('''
+                SELECT u.username, u.user_id, s.trade_count, s.volume_gwei
+                FROM user_stats s
+                JOIN users u ON u.user_id = s.user_id
+                ORDER BY s.volume_gwei DESC
+                LIMIT $1
+            ''', limit)
+        return [{
+            "username": r["username"] or f"User_{r['user_id']}",
+            "trades": r["trade_count"],
+            "volume": r["volume_gwei"] / WEI_PER_GWEI
+        } for r in rows]
+
+    async def expire_window_volume(self) -> None:
+        async with self._tx() as conn:
+            await self._expire_window_volume(conn, int(time.time()) // 3600)
+
+    async def _window_leaderboard(self, period: str, limit: int) -> list:
+        async with self._conn() as conn:
+            rows = await conn.fetch('''
+                SELECT u.username, u.user_id, w.trade_count, w.volume_gwei
+                FROM user_volume_windows w
+                JOIN users u ON u.user_id = w.user_id
+                WHERE w.period = $1
+                ORDER BY w.volume_gwei DESC
+                LIMIT $2
+            ''', period, limit)
+        return [{
+            "username": r["username"] or f"User_{r['user_id']}",
+            "trades": r["trade_count"],
+            "volume": r["volume_gwei"] / WEI_PER_GWEI
+        } for r in rows]
+
+    # ============ Settings & Orders ============
+
+    async def _get_user_settings(self, user_id: int) -> dict:
+        async with self._conn() as conn:
+            row = await conn.fetchrow('''
+                SELECT slippage, auto_buy_enabled, auto_buy_amount, auto_sell_tp, auto_sell_sl, gas_price_mode
+                FROM settings WHERE user_id = $1
+            ''', user_id)
+        if row is None:
+            return dict(DEFAULT_SETTINGS)
+        settings = dict(row)
+        settings["auto_buy_enabled"] = bool(settings["auto_buy_enabled"])
+        return settings
+
+    async def _update_user_settings(self, user_id: int, **kwargs) -> None:
+        columns = ", ".join(["user_id", *kwargs])
+        placeholders = ", ".join(f"${i}" for i in range(1, len(kwargs) + 2))
+        action = "UPDATE SET " + ", ".join(f"{key} = excluded.{key}" for key in kwargs) if kwargs else "NOTHING"
+        async with self._tx() as conn:
+            await conn.execute(
+                f"INSERT INTO settings ({columns}) VALUES ({placeholders}) ON CONFLICT (user_id) DO {action}",
+                user_id, *kwargs.values()
+            )
+
+    async def create_pending_order(self, user_id: int, wallet: str, token: str, order_type: str, amount_eth: float = None, amount_tokens: float = None, trigger_price: float = None) -> int:
+        async with self._tx() as conn:
+            return await conn.fetchval('''
+                INSERT INTO pending_orders (user_id, wallet_address, token_address, order_type, trigger_price, amount_eth, amount_tokens)
+                VALUES ($1, $2, $3, $4, $5, $6, $7)
+                RETURNING id
+            ''', user_id, wallet, token, order_type, trigger_price, amount_eth, amount_tokens)
+
+    # ============ AI & Alerts ============
+
+    async def save_ai_signal(self, token_address: str, signal_type: str, insight: str, reliability: float = 1.0) -> None:
+        async with self._tx() as conn:
+            await conn.execute('''
+                INSERT INTO ai_signals (token_address, signal_type, insight, reliability)
+                VALUES ($1, $2, $3, $4)
+            ''', token_address, signal_type, insight, reliability)
+
+    async def get_latest_ai_signals(self, limit: int = 5) -> list:
+        async with self._conn() as conn:
+            rows = await conn.fetch(
+                "SELECT token_address, signal_type, insight, created_at FROM ai_signals ORDER BY created_at DESC LIMIT $1", limit
+            )
+        return [{"token": r[0], "type": r[1], "insight": r[2], "time": r[3]} for r in rows]
+
+    async def create_alert(self, user_id: int, alert_type: str, target_address: str = None, target_value: float = None) -> int:
+        async with self._tx() as conn:
+            return await conn.fetchval('''
+                INSERT INTO alerts (user_id, alert_type, target_address, target_value)
+                VALUES ($1, $2, $3, $4)
+                RETURNING id
+            ''', user_id, alert_type, target_address, target_value)
+
+    async def get_user_alerts(self, user_id: int) -> list:
+        async with self._conn() as conn:
+            rows = await conn.fetch(
+                "SELECT id, alert_type, target_address, target_value FROM alerts WHERE user_id = $1 AND is_active = 1", user_id
+            )
+        return [{"id": r[0], "type": r[1], "target": r[2], "value": r[3]} for r in rows]
+
+    async def get_active_alerts(self) -> list:
+        async with self._conn() as conn:
+            rows = await conn.fetch(
+                "SELECT id, user_id, alert_type, target_address, target_value FROM alerts WHERE is_active = 1"
+            )
+        return [{"id": r[0], "user_id": r[1], "type": r[2], "target": r[3], "value": r[4]} for r in rows]
+
+    async def deactivate_alerts(self, alert_ids: list, triggered: bool = True) -> int:
+        async with self._tx() as conn:
+            result = await conn.execute('''
+                UPDATE alerts SET is_active = 0, triggered_at = CASE WHEN $2 THEN now() END
+                WHERE id = ANY($1::bigint[]) AND is_active = 1
+            ''', list(alert_ids), triggered)
+        return int(result.split()[-1])
+
+    async def get_token_day_volumes(self, day: int) -> dict:
+        async with self._conn() as conn:
+            rows = await conn.fetch("SELECT token_address, volume_gwei FROM token_volume_1d WHERE bucket = $1", day)
+        return {r[0]: r[1] / WEI_PER_GWEI for r in rows}
+
+    # ============ Market Data & Token Security ============
+
+    async def record_price_tick(self, token_address: str, price: float, timestamp: int = None) -> None:
+        if not price or price <= 0:
+            return
+        ts = int(timestamp or time.time())
+        async with self._tx() as conn:
+            await conn.execute('''
+                INSERT INTO candles (token_address, open_time, open, high, low, close)
+                VALUES ($1, $2, $3, $3, $3, $3)
+                ON CONFLICT (token_address, open_time) DO UPDATE SET
+                    high = GREATEST(candles.high, excluded.close),
+                    low = LEAST(candles.low, excluded.close),
+                    close = excluded.close
+            ''', token_address.lower(), ts - ts % 60, float(price))
+
+    async def get_candles(self, token_address: str, since: int) -> list:
+        async with self._conn() as conn:
+            rows = await conn.fetch('''
+                SELECT open_time, open, high, low, close FROM candles
+                WHERE token_address = $1 AND open_time >= $2
+                ORDER BY open_time ASC
+            ''', token_address.lower(), since)
+        return [tuple(r) for r in rows]
+
+    async def get_listing_candles(self, since: int) -> list:
+        async with self._conn() as conn:
+            rows = await conn.fetch('''
+                SELECT c.token_address, c.open_time, c.open, c.high, c.low, c.close
+                FROM candles c
+                WHERE c.open_time >= $1 AND c.token_address IN (
+                    SELECT DISTINCT LOWER(token_address) FROM ai_signals WHERE signal_type = 'listing'
+                )
+                ORDER BY c.token_address, c.open_time
+            ''', since)
+        return [tuple(r) for r in rows]
+
+    async def get_code_scan(self, code_hash: str):
+        async with self._conn() as conn:
+            return await conn.fetchval("SELECT result FROM code_scans WHERE code_hash = $1", code_hash)
+
+    async def save_code_scan(self, code_hash: str, result: str) -> None:
+        async with self._tx() as conn:
+            await conn.execute('''
+                INSERT INTO code_scans (code_hash, result) VALUES ($1, $2)
+                ON CONFLICT (code_hash) DO UPDATE SET result = excluded.result, scanned_at = now()
+            ''', code_hash, result)
+
+    # ============ Retention & Archive ============
+
+    async def _archive(self, conn, source: str, columns: list, rows: list, user_id: int = None) -> None:
+        created = [row[columns.index("created_at")] for row in rows]
+        await conn.execute('''
+            INSERT INTO archive_batches (source, user_id, first_id, last_id, oldest, newest, row_count, columns, payload)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+        ''', source, user_id, rows[0][0], rows[-1][0], min(created), max(created), len(rows),
+            json.dumps(columns), _pack_rows(rows))
+
+    async def archive_ai_signals(self, before: str, listings_before: str, limit: int = 500) -> int:
+        async with self._tx() as conn:
+            records = await conn.fetch('''
+                SELECT * FROM ai_signals
+                WHERE created_at < $1 AND (signal_type != 'listing' OR created_at < $2)
+                ORDER BY created_at
+                LIMIT $3
+                FOR UPDATE SKIP LOCKED
+            ''', _utc(before), _utc(listings_before), limit)
+            if not records:
+                return 0
+            rows = sorted(tuple(r) for r in records)
+            await self._archive(conn, "ai_signals", list(records[0].keys()), rows)
+            await conn.execute("DELETE FROM ai_signals WHERE id = ANY($1::BIGINT[])", [row[0] for row in rows])
+        return len(rows)
+
+    async def archive_trades(self, before: str, limit: int = 500) -> int:
+        async with self._tx() as conn:
+            records = await conn.fetch('''
+                SELECT * FROM trades
+                WHERE created_at < $1 AND status != 'pending'
+                ORDER BY created_at
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            ''', _utc(before), limit)
+            if not records:
+                return 0
+            columns = list(records[0].keys())
+            by_user = {}
+            for row in sorted(tuple(r) for r in records):
+                by_user.setdefault(row[columns.index("user_id")], []).append(row)
+            for user_id, rows in by_user.items():
+                await self._archive(conn, "trades", columns, rows, user_id)
+            await conn.execute("DELETE FROM trades WHERE id = ANY($1::BIGINT[])", [r["id"] for r in records])
+        return len(records)
+
+    async def reclaim_free_pages(self, pages: int) -> int:
+        # Autovacuum returns dead tuples' space to PostgreSQL; nothing to do per run
+        return 0
+
+    # ============ Import ============
+
+    async def import_sqlite(self, path: str) -> dict:
+        """
+        Bulk-copy every table of a SQLite wallet.db into this (empty) database with COPY.
+        Returns the number of rows copied per table.
+        """
+        source = sqlite3.connect(path)
+        copied = {}
+        pool = await self._get_pool()
+        try:
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    for table in IMPORT_TABLES:
+                        exists = source.execute(
+                            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                        ).fetchone()
+                        if not exists:
+                            continue
+                        cursor = source.execute(f"SELECT * FROM {table}")
+                        columns = [d[0] for d in cursor.description]
+                        records = [self._convert(columns, row) for row in cursor]
+                        if records:
+                            await conn.copy_records_to_table(table, records=records, columns=columns)
+                        copied[table] = len(records)
+                    # COPY doesn't advance BIGSERIAL sequences
+                    for table in IMPORT_TABLES:
+                        if copied.get(table) and await conn.fetchval("SELECT pg_get_serial_sequence($1, 'id')", table):
+                            await conn.execute(
+                                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+                            )
+        finally:
+            source.close()
+        return copied
+
+    @staticmethod
+    def _convert(columns: list, row: tuple) -> tuple:
+        values = []
+        for column, value in zip(columns, row):
+            if value is not None and column in TIMESTAMP_COLUMNS:
+                value = datetime.fromisoformat(value)
+            elif value is not None and column in NUMERIC_COLUMNS:
+                value = Decimal(value)
+            values.append(value)
+        return tuple(values)
+
+
+async def _import(path: str):
+    storage = PostgresStorage()
+    await storage._migrate()
+    try:
+        copied = await storage.import_sqlite(path)
+    finally:
+        await storage.close()
+    for table, count in copied.items():
+        print(f"  {table:<22}{count:>8} rows")
+    print("✅ Import complete")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "import":
+        from db import DB_PATH
+        asyncio.run(_import(sys.argv[2] if len(sys.argv) > 2 else DB_PATH))
+    else:
+        print(__doc__)
@@ -10,7 +10,7 @@ print("\n[1/4] Testing Database...", flush=True)
 try:
     from store_to_db import init_db, get_trade_count
     init_db()
-    count = get_trade_count(12345)
+    count = asyncio.run(get_trade_count(12345))
     print(f"  ✅ Database OK (trade count: {count})", flush=True)
 except Exception as e:
     print(f"  ❌ Database Error: {e}", flush=True)
@@ -0,0 +1,93 @@
+"""
+Pluggable storage behind store_to_db.
+
+Every @read_op / @write_op function in store_to_db is one operation of the
+storage interface. BASEFLOW_STORAGE selects the engine that serves them:
+
+  sqlite   - the local WAL database (db.py). The function bodies themselves run
+             on the DB writer thread / reader pool, never on the event loop. (default)
+  postgres - PostgresStorage (pg_storage.py): an asyncpg pool on DATABASE_URL that
+             any number of bot workers can share. Each operation is served by the
+             engine's coroutine method of the same name.
+
+An engine provides init_schema(), read(), write(), apply_batch() and close().
+"""
+import functools
+import os
+
+from dotenv import load_dotenv
+
+from db import get_db
+
+load_dotenv()
+
+STORAGE_BACKEND = os.getenv("BASEFLOW_STORAGE", "sqlite").lower()
+
+
+def _apply_batch(writes: list) -> list:
+    """Run on the DB writer thread: apply every write under one commit, each in its own savepoint."""
+    results = []
+    with get_db().writer():
+        for fn, args, kwargs in writes:
+            try:
+                # The undecorated body; its own writer() block nests as a savepoint
+                results.append((True, getattr(fn, "__wrapped__", fn)(*args, **kwargs)))
+            except Exception as e:
+                results.append((False, e))
+    return results
+
+
+class SQLiteStorage:
+    name = "sqlite"
+
+    def __init__(self, db=None):
+        self.db = db or get_db()
+
+    def init_schema(self) -> int:
+        from migrations import migrate
+        return migrate(self.db)
+
+    async def read(self, fn, args, kwargs):
+        return await self.db.run_read(fn, *args, **kwargs)
+
+    async def write(self, fn, args, kwargs):
+        return await self.db.run_write(fn, *args, **kwargs)
+
+    async def apply_batch(self, writes: list) -> list:
+        """
+        Apply [(operation, args, kwargs)] in a single transaction and return
+        [(ok, result_or_exception)] in the same order.
+        """
+        return await self.db.run_write(_apply_batch, writes)
+
+    async def close(self) -> None:
+        self.db.close()
+
+# Global instance for use in the bot
+_storage = None
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "postgres":
+            from pg_storage import PostgresStorage
+            _storage = PostgresStorage()
+        else:
+            _storage = SQLiteStorage()
+    return _storage
+
+
+def read_op(fn):
+    """Register a blocking SQLite read as a storage operation (awaitable on every engine)."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await get_storage().read(fn, args, kwargs)
+    return wrapper
+
+
+def write_op(fn):
+    """Register a blocking SQLite write as a storage operation (awaitable on every engine)."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await get_storage().write(fn, args, kwargs)
+    return wrapper
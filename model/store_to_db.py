@@ -1,184 +1,162 @@
-import sqlite3
+import csv
+import json
+import time
+import zlib
+from decimal import Decimal
 
+from db import get_db
+from storage import get_storage, read_op, write_op
 
-# Create a SQLite database and a table to store wallet information
-# This code creates a SQLite database and a table to store wallet information if it doesn't already exist.
+# ETH values are stored as integer gwei: exact, and a SUM over them fits SQLite's
+# 64-bit integers (wei would overflow past ~9.2 ETH)
+WEI_PER_GWEI = 10**9
 
+# Sliding leaderboard windows, in hourly buckets
+VOLUME_WINDOWS = {"24h": 24, "7d": 168, "30d": 720}
+# Windowed leaderboards are cached within an hourly bucket, but never longer than this
+LEADERBOARD_CACHE_SECONDS = 300
+_leaderboard_cache = {}
 
+# Per-token volume rollups and their bucket size in seconds (UTC-aligned)
+VOLUME_ROLLUPS = {"token_volume_1m": 60, "token_volume_1h": 3600, "token_volume_1d": 86400}
+
+# Trade history CSV export (/export): CSV column -> trades column
+TRADE_EXPORT_COLUMNS = {
+    "created_at": "created_at", "type": "trade_type", "status": "status",
+    "token_in": "token_in", "token_out": "token_out", "amount_in": "amount_in", "amount_out": "amount_out",
+    "amount_in_raw": "amount_in_raw", "amount_out_raw": "amount_out_raw", "eth_value": "eth_value_gwei",
+    "tx_hash": "tx_hash", "wallet": "wallet_address", "gas_used": "gas_used", "block_number": "block_number"
+}
+TRADE_EXPORT_SQL = f"SELECT {', '.join(TRADE_EXPORT_COLUMNS.values())} FROM trades WHERE user_id = {{}} ORDER BY created_at, id"
+EXPORT_CHUNK_ROWS = 1000
+
+DEFAULT_SETTINGS = {
+    "slippage": 0.5,
+    "auto_buy_enabled": False,
+    "auto_buy_amount": 0.1,
+    "auto_sell_tp": 100.0,
+    "auto_sell_sl": 50.0,
+    "gas_price_mode": "normal"
+}
+
+# Per-user settings and wallet lists are cached in process and invalidated by
+# every write that goes through this module. The age cap only matters when
+# several bot workers share one PostgreSQL database.
+USER_CACHE_SECONDS = 300
+_settings_cache = {}
+_wallets_cache = {}
+# Bumped on every write, so a read that raced with a write never caches stale rows
+_user_versions = {}
+
+
+def _cache_get(cache: dict, user_id: int):
+    entry = cache.get(user_id)
+    if entry and time.monotonic() - entry[0] < USER_CACHE_SECONDS:
+        return entry[1]
+    return None
+
+
+def _invalidate_user(user_id: int) -> None:
+    _user_versions[user_id] = _user_versions.get(user_id, 0) + 1
+    _settings_cache.pop(user_id, None)
+    _wallets_cache.pop(user_id, None)
 
 
 def init_db() -> None:
     """
-    Initialize the SQLite database and create tables for wallets and trades.
+    Initialize the database (SQLite or PostgreSQL), applying any pending schema migrations.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    
-    # Wallets table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS wallets (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        address TEXT UNIQUE NOT NULL,
-        private_key TEXT UNIQUE NOT NULL,
-        balance REAL NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    # Trades table for transaction tracking (Sprint 2)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS trades (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        wallet_address TEXT NOT NULL,
-        tx_hash TEXT UNIQUE NOT NULL,
-        token_in TEXT NOT NULL,
-        token_out TEXT NOT NULL,
-        amount_in TEXT NOT NULL,
-        amount_out TEXT NOT NULL,
-        trade_type TEXT NOT NULL,
-        status TEXT NOT NULL,
-        gas_used INTEGER,
-        block_number INTEGER,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    # Users table (Sprint 3)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        user_id INTEGER PRIMARY KEY,
-        username TEXT,
-        referred_by INTEGER,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    # Volume tracking table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS volume_tracking (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        token_address TEXT NOT NULL,
-        volume_eth REAL NOT NULL,
-        trade_count INTEGER NOT NULL,
-        date TEXT NOT NULL,
-        UNIQUE(token_address, date)
-    )''')
-
-    # Referral earnings table (Sprint 3)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS referral_earnings (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        referrer_id INTEGER NOT NULL,
-        referred_user_id INTEGER NOT NULL,
-        amount_eth REAL DEFAULT 0,
-        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-
-    # User Settings table (Sprint 4)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS settings (
-        user_id INTEGER PRIMARY KEY,
-        slippage REAL DEFAULT 0.5,
-        auto_buy_enabled INTEGER DEFAULT 0,
-        auto_buy_amount REAL DEFAULT 0.1,
-        auto_sell_tp REAL DEFAULT 100.0,
-        auto_sell_sl REAL DEFAULT 50.0,
-        gas_price_mode TEXT DEFAULT 'normal'
-    )''')
-    
-    # Pending Orders table (Sprint 4)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS pending_orders (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        wallet_address TEXT NOT NULL,
-        token_address TEXT NOT NULL,
-        order_type TEXT NOT NULL, -- 'limit_buy', 'limit_sell', 'auto_buy'
-        trigger_price REAL,
-        amount_eth REAL,
-        amount_tokens REAL,
-        status TEXT DEFAULT 'pending', -- 'pending', 'filled', 'cancelled'
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    # AI Signals table (Sprint 5)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS ai_signals (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        token_address TEXT NOT NULL,
-        signal_type TEXT NOT NULL, -- 'security', 'trend'
-        insight TEXT NOT NULL,
-        reliability REAL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    # Alerts table (Sprint 5)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS alerts (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        alert_type TEXT NOT NULL, -- 'price', 'new_listing', 'volume'
-        target_address TEXT,
-        target_value REAL,
-        is_active INTEGER DEFAULT 1,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    conn.commit()
-    conn.close()
-    print("✅ Database initialized with all tables through Sprint 5 (AI & Alerts)")
+    version = get_storage().init_schema()
+    print(f"✅ Database initialized (schema version {version})")
 
-  # The database file will be named 'wallet.db'
-  # and will be created in the current working directory.
-  # The connection object is used to interact with the database.
-
-  # The cursor object is used to execute SQL commands.
-  # The commit() method is used to save changes to the database.
-  # The close() method is used to close the connection to the database.
+  # The database file is model/wallet.db (override with BASEFLOW_DB_PATH).
+  # Connections are owned by db.Database: writer() wraps a transaction that
+  # commits on exit, reader() borrows a pooled read-only connection.
+  # Everything below is awaitable: @write_op bodies run on the DB writer
+  # thread and @read_op bodies on the reader pool, never on the event loop.
+  # With BASEFLOW_STORAGE=postgres the same calls are served by
+  # pg_storage.PostgresStorage instead (see storage.py).
 
   
-async def create_wallet_db(user_id:int, address: str, private_key: str, balance: float) -> None:
+async def create_wallet_db(user_id: int, address: str, private_key: str, balance: float) -> None:
+    """
+    Store a new wallet for the user; the key is sealed by the key vault when it's active.
+    """
+    from key_vault import get_vault
+    private_key, encrypted_key = await get_vault().seal(address, private_key)
+    try:
+        await _create_wallet_db(user_id, address, private_key, balance, encrypted_key)
+    finally:
+        _invalidate_user(user_id)
+
+
+@write_op
+def _create_wallet_db(user_id:int, address: str, private_key: str, balance: float, encrypted_key: bytes = None) -> None:
   """
   Create a SQLite database and a table to store wallet information.
   """
-  conn = sqlite3.connect('wallet.db')
-  cursor = conn.cursor()
-  cursor.execute("INSERT INTO wallets (user_id, address, private_key, balance) VALUES (?, ?, ?, ?)", 
-                (user_id, address, private_key, balance))
-  conn.commit()  # Save changes
-  conn.close()
+  with get_db().writer() as conn:
+      cursor = conn.cursor()
+      cursor.execute("INSERT INTO wallets (user_id, address, private_key, encrypted_key, balance) VALUES (?, ?, ?, ?, ?)", 
+                    (user_id, address, private_key, encrypted_key, balance))
 
 
+async def create_wallets_db(user_id: int, wallets: list) -> None:
+    """
+    Store a batch of generated wallets, [(private_key, address)], in one transaction.
+    """
+    from key_vault import get_vault
+    vault = get_vault()
+    rows = []
+    for private_key, address in wallets:
+        private_key, encrypted_key = await vault.seal(address, private_key)
+        rows.append((address, private_key, encrypted_key))
+    try:
+        await _create_wallets_db(user_id, rows)
+    finally:
+        _invalidate_user(user_id)
+
+
+@write_op
+def _create_wallets_db(user_id: int, rows: list) -> None:
+    """
+    Insert [(address, private_key, encrypted_key)] for the user with one executemany.
+    """
+    with get_db().writer() as conn:
+        conn.executemany(
+            "INSERT INTO wallets (user_id, address, private_key, encrypted_key, balance) VALUES (?, ?, ?, ?, 0)",
+            [(user_id, address, private_key, encrypted_key) for address, private_key, encrypted_key in rows]
+        )
+
 
-async def fetch_from_wallet(user_id:int, address:str, private_key:str) -> (str, str):
+@read_op
+def fetch_from_wallet(user_id:int, address:str, private_key:str) -> (str, str):
   """
   Fetch a wallet address and private key from the database.
   """
-  # Connect to the SQLite database (or create it if it doesn't exist)
-  conn = sqlite3.connect('wallet.db')
-  cursor = conn.cursor()
-  cursor.execute("SELECT private_key FROM wallets WHERE address = ?", (address,))
-  result = cursor.fetchone()  # Returns (private_key,) or None
+  with get_db().reader() as conn:
+      cursor = conn.cursor()
+      cursor.execute("SELECT private_key FROM wallets WHERE address = ?", (address,))
+      result = cursor.fetchone()  # Returns (private_key,) or None
 
-  cusor.execute("SELECT address FROM wallets WHERE private_key = ?", (private_key,))
-  result2 = cursor.fetchone()
+      cursor.execute("SELECT address FROM wallets WHERE private_key = ?", (private_key,))
+      result2 = cursor.fetchone()
 
-  if (result, result2):
+  if result and result2:
      return (result, result2)
   else:
       return "Wallet not found."
 
 
+@read_op
 def balance_check(address):
     """
     Check the balance of a wallet address.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT balance FROM wallets WHERE address = ?", (address,))
-    result = cursor.fetchone()  # Returns (balance,) or None
-
-    conn.close()
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT balance FROM wallets WHERE address = ?", (address,))
+        result = cursor.fetchone()  # Returns (balance,) or None
 
     if result:
         return result[0]  # Return the balance
@@ -186,47 +164,208 @@ def balance_check(address):
         return "Wallet not found."
 
 
-def fetch_all_from_wallet(user_id:int)->[dict]:
+async def fetch_all_from_wallet(user_id: int) -> list:
+    """
+    Fetches all wallet addresses as a list of dicts (cached per user).
+    Keys are never part of it; see key_vault.get_signer().
+    """
+    wallets = _cache_get(_wallets_cache, user_id)
+    if wallets is None:
+        version = _user_versions.get(user_id, 0)
+        wallets = await _fetch_all_from_wallet(user_id)
+        if _user_versions.get(user_id, 0) == version:
+            _wallets_cache[user_id] = (time.monotonic(), wallets)
+    return [dict(w) for w in wallets]
+
+
+@read_op
+def _fetch_all_from_wallet(user_id:int)->[dict]:
+    """
+    Fetches all wallet addresses as a list of dicts.
+    """
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT address FROM wallets WHERE user_id = ? ORDER BY id", (user_id,))
+        wallets = cursor.fetchall()  # List of tuples
+
+
+    return [{"address": addr} for (addr,) in wallets]
+
+
+@read_op
+def get_wallet_key(user_id: int, address: str):
+    """
+    Fetch one wallet's stored key as (private_key, encrypted_key, hd_index), or None
+    if the user has no such wallet. Only one of the three is set: HD wallets keep
+    just their derivation index.
+    """
+    with get_db().reader() as conn:
+        row = conn.execute(
+            "SELECT private_key, encrypted_key, hd_index FROM wallets WHERE address = ? COLLATE NOCASE AND user_id = ?",
+            (address, user_id)
+        ).fetchone()
+    return row
+
+
+@read_op
+def get_plaintext_wallet_keys(limit: int = 500) -> list:
+    """
+    Fetch up to `limit` wallets still holding a plaintext key, as (id, address, private_key).
+    """
+    with get_db().reader() as conn:
+        return conn.execute(
+            "SELECT id, address, private_key FROM wallets WHERE encrypted_key IS NULL AND private_key IS NOT NULL LIMIT ?",
+            (limit,)
+        ).fetchall()
+
+
+@write_op
+def seal_wallet_keys(sealed: list) -> None:
     """
-    Fetches all wallet addresses and private keys as a list of dicts.
+    Replace plaintext keys with their ciphertexts; `sealed` is [(wallet_id, encrypted_key)].
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
+    with get_db().writer() as conn:
+        conn.executemany("UPDATE wallets SET encrypted_key = ?, private_key = NULL WHERE id = ?",
+                         [(blob, wallet_id) for wallet_id, blob in sealed])
 
-    cursor.execute("SELECT address, private_key FROM wallets WHERE user_id = ?", (user_id,))
-    wallets = cursor.fetchall()  # List of tuples
 
-    conn.close()
+@read_op
+def get_vault_meta() -> dict:
+    """
+    Fetch the key vault's KDF parameters and passphrase check.
+    """
+    with get_db().reader() as conn:
+        return dict(conn.execute("SELECT name, value FROM vault_meta").fetchall())
+
+
+@write_op
+def init_vault_meta(meta: dict) -> None:
+    """
+    Store the key vault's KDF parameters unless another worker already did.
+    """
+    with get_db().writer() as conn:
+        conn.executemany("INSERT OR IGNORE INTO vault_meta (name, value) VALUES (?, ?)", list(meta.items()))
+
+
+@read_op
+def get_hd_seed(user_id: int):
+    """
+    Fetch the user's HD wallet seed as (seed, encrypted_seed, next_index), or None.
+    """
+    with get_db().reader() as conn:
+        return conn.execute(
+            "SELECT seed, encrypted_seed, next_index FROM hd_seeds WHERE user_id = ?", (user_id,)
+        ).fetchone()
+
+
+@write_op
+def create_hd_seed(user_id: int, seed: str, encrypted_seed: bytes = None) -> None:
+    """
+    Store the user's HD wallet seed unless they already have one.
+    """
+    with get_db().writer() as conn:
+        conn.execute("INSERT OR IGNORE INTO hd_seeds (user_id, seed, encrypted_seed) VALUES (?, ?, ?)",
+                     (user_id, seed, encrypted_seed))
+
 
-    return [{"address": addr, "private_key": key} for addr, key in wallets]
+@read_op
+def get_plaintext_hd_seeds(limit: int = 500) -> list:
+    """
+    Fetch up to `limit` HD seeds still stored in plaintext, as (user_id, seed).
+    """
+    with get_db().reader() as conn:
+        return conn.execute(
+            "SELECT user_id, seed FROM hd_seeds WHERE encrypted_seed IS NULL AND seed IS NOT NULL LIMIT ?", (limit,)
+        ).fetchall()
+
+
+@write_op
+def seal_hd_seeds(sealed: list) -> None:
+    """
+    Replace plaintext HD seeds with their ciphertexts; `sealed` is [(user_id, encrypted_seed)].
+    """
+    with get_db().writer() as conn:
+        conn.executemany("UPDATE hd_seeds SET encrypted_seed = ?, seed = NULL WHERE user_id = ?",
+                         [(blob, user_id) for user_id, blob in sealed])
+
+
+async def add_hd_wallets(user_id: int, start_index: int, addresses: list) -> None:
+    """
+    Store wallets derived at indexes start_index, start_index + 1, ...
+    """
+    try:
+        await _add_hd_wallets(user_id, start_index, addresses)
+    finally:
+        _invalidate_user(user_id)
+
+
+@write_op
+def _add_hd_wallets(user_id: int, start_index: int, addresses: list) -> None:
+    """
+    Claim the indexes and insert every wallet in one transaction. Raises ValueError
+    if the indexes were claimed by someone else in the meantime.
+    """
+    with get_db().writer() as conn:
+        claimed = conn.execute(
+            "UPDATE hd_seeds SET next_index = next_index + ? WHERE user_id = ? AND next_index = ?",
+            (len(addresses), user_id, start_index)
+        ).rowcount
+        if not claimed:
+            raise ValueError(f"HD wallet indexes from {start_index} are already taken for user {user_id}")
+        conn.executemany(
+            "INSERT INTO wallets (user_id, address, hd_index, balance) VALUES (?, ?, ?, 0)",
+            [(user_id, address, start_index + i) for i, address in enumerate(addresses)]
+        )
 
 
 async def delete_wallets_by_user(user_id: int) -> None:
     """
     Delete all wallets for a specific user.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM wallets WHERE user_id = ?", (user_id,))
-    conn.commit()  # Save changes
-    conn.close()
+    from key_vault import get_vault
+    try:
+        await _delete_wallets_by_user(user_id)
+    finally:
+        _invalidate_user(user_id)
+        get_vault().forget(user_id)
+
+@write_op
+def _delete_wallets_by_user(user_id: int) -> None:
+    """
+    Delete all wallets for a specific user.
+    """
+    with get_db().writer() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM wallets WHERE user_id = ?", (user_id,))
     print(f"All wallets for user {user_id} have been deleted.")
 
 async def delete_specific_wallet(user_id: int, addr: str) -> None:
     """
     Delete specific wallet from database based on user id.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM wallets WHERE address = ? AND user_id = ?", (addr, user_id))
-    conn.commit()
-    conn.close()
+    from key_vault import get_vault
+    try:
+        await _delete_specific_wallet(user_id, addr)
+    finally:
+        _invalidate_user(user_id)
+        get_vault().forget(user_id)
+
+@write_op
+def _delete_specific_wallet(user_id: int, addr: str) -> None:
+    """
+    Delete specific wallet from database based on user id.
+    """
+    with get_db().writer() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM wallets WHERE address = ? AND user_id = ?", (addr, user_id))
     print(f"Wallet with address {addr} for user {user_id} has been deleted.")
 
 
 # ============ Trade Functions (Sprint 2) ============
 
-async def save_trade(
+@write_op
+def save_trade(
     user_id: int,
     wallet_address: str,
     tx_hash: str,
@@ -237,192 +376,415 @@ async def save_trade(
     trade_type: str,
     status: str,
     gas_used: int = None,
-    block_number: int = None
+    block_number: int = None,
+    amount_in_raw: int = None,
+    amount_out_raw: int = None,
+    eth_value_wei: int = None
 ) -> None:
     """
     Save a trade to the database for tracking.
+    `amount_in`/`amount_out` are display strings; the `_raw` amounts are integer
+    base units and `eth_value_wei` is the ETH side of the trade, used for volume.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO trades (user_id, wallet_address, tx_hash, token_in, token_out, 
-                          amount_in, amount_out, trade_type, status, gas_used, block_number)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (user_id, wallet_address, tx_hash, token_in, token_out, 
-          amount_in, amount_out, trade_type, status, gas_used, block_number))
-    conn.commit()
-    conn.close()
+    with get_db().writer() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO trades (user_id, wallet_address, tx_hash, token_in, token_out, 
+                              amount_in, amount_out, trade_type, status, gas_used, block_number,
+                              amount_in_raw, amount_out_raw, eth_value_gwei)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, wallet_address, tx_hash, token_in, token_out, 
+              amount_in, amount_out, trade_type, status, gas_used, block_number,
+              None if amount_in_raw is None else str(amount_in_raw),
+              None if amount_out_raw is None else str(amount_out_raw),
+              None if eth_value_wei is None else eth_value_wei // WEI_PER_GWEI))
 
+        # Keep the per-user totals in step with the trade, in the same transaction
+        cursor.execute('''
+            INSERT INTO user_stats (user_id, trade_count, volume_gwei, last_trade_at)
+            VALUES (?, 1, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(user_id) DO UPDATE SET
+                trade_count = trade_count + 1,
+                volume_gwei = volume_gwei + excluded.volume_gwei,
+                last_trade_at = excluded.last_trade_at
+        ''', (user_id, (eth_value_wei or 0) // WEI_PER_GWEI))
+        _add_window_volume(cursor, user_id, (eth_value_wei or 0) // WEI_PER_GWEI)
 
-def get_user_trades(user_id: int, limit: int = 10) -> list:
+
+def _add_window_volume(cursor, user_id: int, volume_gwei: int) -> None:
     """
-    Get recent trades for a user.
+    Add a trade to the user's current hourly bucket and to every sliding window total.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
+    hour = int(time.time()) // 3600
     cursor.execute('''
-        SELECT tx_hash, token_in, token_out, amount_in, amount_out, 
-               trade_type, status, created_at
-        FROM trades 
-        WHERE user_id = ? 
-        ORDER BY created_at DESC 
-        LIMIT ?
-    ''', (user_id, limit))
-    trades = cursor.fetchall()
-    conn.close()
+        INSERT INTO user_volume_hourly (user_id, hour, volume_gwei, trade_count)
+        VALUES (?, ?, ?, 1)
+        ON CONFLICT(user_id, hour) DO UPDATE SET
+            volume_gwei = volume_gwei + excluded.volume_gwei,
+            trade_count = trade_count + 1
+    ''', (user_id, hour, volume_gwei))
+    for period in VOLUME_WINDOWS:
+        cursor.execute('''
+            INSERT INTO user_volume_windows (period, user_id, volume_gwei, trade_count)
+            VALUES (?, ?, ?, 1)
+            ON CONFLICT(period, user_id) DO UPDATE SET
+                volume_gwei = volume_gwei + excluded.volume_gwei,
+                trade_count = trade_count + 1
+        ''', (period, user_id, volume_gwei))
+    _expire_window_volume(cursor, hour)
+
+
+def _expire_window_volume(cursor, hour: int) -> None:
+    """
+    Subtract the buckets that have slid out of each window since the last call.
+    Only the buckets of the expired hours are read, never the whole history.
+    """
+    for period, hours in VOLUME_WINDOWS.items():
+        cutoff = hour - hours
+        cursor.execute('SELECT expired_through FROM volume_window_state WHERE period = ?', (period,))
+        row = cursor.fetchone()
+        expired_through = row[0] if row else cutoff
+        if cutoff <= expired_through:
+            continue
+        cursor.execute('''
+            UPDATE user_volume_windows
+            SET volume_gwei = user_volume_windows.volume_gwei - b.volume_gwei,
+                trade_count = user_volume_windows.trade_count - b.trade_count
+            FROM (
+                SELECT user_id, SUM(volume_gwei) AS volume_gwei, SUM(trade_count) AS trade_count
+                FROM user_volume_hourly
+                WHERE hour > ? AND hour <= ?
+                GROUP BY user_id
+            ) AS b
+            WHERE user_volume_windows.period = ? AND user_volume_windows.user_id = b.user_id
+        ''', (expired_through, cutoff, period))
+        cursor.execute('DELETE FROM user_volume_windows WHERE period = ? AND trade_count <= 0', (period,))
+        cursor.execute('INSERT OR REPLACE INTO volume_window_state (period, expired_through) VALUES (?, ?)', (period, cutoff))
+    # Buckets older than the longest window are no longer needed
+    cursor.execute('DELETE FROM user_volume_hourly WHERE hour <= ?', (hour - max(VOLUME_WINDOWS.values()),))
+
+
+@read_op
+def get_user_trades(user_id: int, limit: int = 10, before: tuple = None, after: tuple = None) -> list:
+    """
+    Get a page of a user's trades, newest first. Pass the (created_at, id) of the
+    last trade shown as `before` for the next (older) page, or of the first one
+    as `after` for the previous (newer) page.
+    """
+    # Keyset on (created_at, id): each page is an index range scan on
+    # idx_trades_user_created (whose entries end in the rowid, i.e. id), however deep.
+    # The cursor carries both values, so it still works once its row is archived
+    if before is not None:
+        where, order, keyset = "AND (created_at, id) < (?, ?)", "DESC", list(before)
+    elif after is not None:
+        where, order, keyset = "AND (created_at, id) > (?, ?)", "ASC", list(after)
+    else:
+        where, order, keyset = "", "DESC", []
+
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id, tx_hash, token_in, token_out, amount_in, amount_out,
+                   trade_type, status, created_at
+            FROM trades 
+            WHERE user_id = ? {where}
+            ORDER BY created_at {order}, id {order}
+            LIMIT ?
+        ''', (user_id, *keyset, limit))
+        trades = cursor.fetchall()
+    if order == "ASC":
+        trades.reverse()
     
     return [{
-        "tx_hash": t[0],
-        "token_in": t[1],
-        "token_out": t[2],
-        "amount_in": t[3],
-        "amount_out": t[4],
-        "trade_type": t[5],
-        "status": t[6],
-        "created_at": t[7]
+        "id": t[0],
+        "tx_hash": t[1],
+        "token_in": t[2],
+        "token_out": t[3],
+        "amount_in": t[4],
+        "amount_out": t[5],
+        "trade_type": t[6],
+        "status": t[7],
+        "created_at": t[8]
     } for t in trades]
 
 
+@read_op
+def export_user_trades(user_id: int, path: str) -> int:
+    """
+    Write a user's full trade history (archived trades included) to a CSV file at
+    `path`, oldest first, streaming rows from the cursor. Returns the number of trades written.
+    """
+    count = 0
+    with get_db().reader() as conn, open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(TRADE_EXPORT_COLUMNS.keys())
+        # Archived trades first (they are the oldest), one compressed batch at a time
+        batches = conn.execute(
+            "SELECT columns, payload FROM archive_batches WHERE source = 'trades' AND user_id = ? ORDER BY first_id",
+            (user_id,)
+        )
+        for columns, payload in batches:
+            positions = [json.loads(columns).index(c) for c in TRADE_EXPORT_COLUMNS.values()]
+            rows = _unpack_rows(payload)
+            writer.writerows(_export_row([row[i] for i in positions]) for row in rows)
+            count += len(rows)
+
+        cursor = conn.execute(TRADE_EXPORT_SQL.format("?"), (user_id,))
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if not rows:
+                break
+            writer.writerows(_export_row(row) for row in rows)
+            count += len(rows)
+    return count
+
+
+def _export_row(row) -> tuple:
+    # eth_value_gwei (index 9) is written as an exact ETH amount
+    gwei = row[9]
+    eth_value = None if gwei is None else Decimal(gwei).scaleb(-9)
+    return (*row[:9], eth_value, *row[10:])
+
+
+@read_op
 def get_trade_count(user_id: int) -> int:
     """
     Get total trade count for a user.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM trades WHERE user_id = ?', (user_id,))
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT trade_count FROM user_stats WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+    return row[0] if row else 0
 
 
-async def update_volume_tracking(token_address: str, volume_eth: float) -> None:
+@write_op
+def update_volume_tracking(token_address: str, volume_wei: int, timestamp: int = None) -> None:
     """
-    Update volume tracking for a token (daily aggregation).
+    Add one trade or indexed swap (its ETH value in wei) to the token's minute, hour and day volume.
     """
-    from datetime import date
-    today = date.today().isoformat()
-    
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    
-    # Try to update existing record
-    cursor.execute('''
-        UPDATE volume_tracking 
-        SET volume_eth = volume_eth + ?, trade_count = trade_count + 1
-        WHERE token_address = ? AND date = ?
-    ''', (volume_eth, token_address, today))
-    
-    # If no record exists, insert new one
-    if cursor.rowcount == 0:
-        cursor.execute('''
-            INSERT INTO volume_tracking (token_address, volume_eth, trade_count, date)
-            VALUES (?, ?, 1, ?)
-        ''', (token_address, volume_eth, today))
-    
-    conn.commit()
-    conn.close()
+    ts = int(timestamp or time.time())
+    volume_gwei = volume_wei // WEI_PER_GWEI
+
+    with get_db().writer() as conn:
+        cursor = conn.cursor()
+        for table, seconds in VOLUME_ROLLUPS.items():
+            cursor.execute(f'''
+                INSERT INTO {table} (bucket, token_address, volume_gwei, trade_count)
+                VALUES (?, ?, ?, 1)
+                ON CONFLICT(bucket, token_address) DO UPDATE SET
+                    volume_gwei = volume_gwei + excluded.volume_gwei,
+                    trade_count = trade_count + 1
+            ''', (ts - ts % seconds, token_address.lower(), volume_gwei))
 
 
+@write_op
+def save_trade_with_volume(token_address: str, **trade) -> None:
+    """
+    Save a trade and add its ETH value to the token's volume rollups, atomically.
+    `token_address` is the non-ETH side; `trade` takes save_trade's arguments.
+    """
+    with get_db().writer():
+        save_trade.__wrapped__(**trade)
+        update_volume_tracking.__wrapped__(token_address, trade.get("eth_value_wei") or 0)
+
+
+@read_op
 def get_total_volume() -> dict:
     """
     Get total volume statistics.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT SUM(volume_eth), SUM(trade_count) FROM volume_tracking')
-    result = cursor.fetchone()
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute('SELECT COUNT(DISTINCT user_id) FROM trades')
-    unique_traders = cursor.fetchone()[0]
+        cursor.execute('SELECT SUM(volume_gwei), SUM(trade_count) FROM token_volume_1d')
+        result = cursor.fetchone()
     
-    conn.close()
+        # user_stats outlives archived trades, so it still counts their traders
+        cursor.execute('SELECT COUNT(*) FROM user_stats')
+        unique_traders = cursor.fetchone()[0]
     
     return {
-        "total_volume_eth": result[0] or 0,
+        "total_volume_eth": (result[0] or 0) / WEI_PER_GWEI,
         "total_trades": result[1] or 0,
         "unique_traders": unique_traders or 0
     }
 
+
+def _rollup_for(seconds: int) -> str:
+    """The finest rollup table that still covers a window of this length."""
+    if seconds <= 2 * 3600:
+        return "token_volume_1m"
+    if seconds <= 7 * 86400:
+        return "token_volume_1h"
+    return "token_volume_1d"
+
+
+@read_op
+def get_top_tokens_by_volume(minutes: int = 15, limit: int = 10) -> list:
+    """
+    Get the tokens with the most ETH volume over the last `minutes` (bucket-aligned).
+    """
+    table = _rollup_for(minutes * 60)
+    seconds = VOLUME_ROLLUPS[table]
+    since = int(time.time()) - minutes * 60
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT token_address, SUM(volume_gwei) AS volume, SUM(trade_count)
+            FROM {table}
+            WHERE bucket >= ?
+            GROUP BY token_address
+            ORDER BY volume DESC
+            LIMIT ?
+        ''', (since - since % seconds, limit))
+        rows = cursor.fetchall()
+    return [{"token": r[0], "volume": r[1] / WEI_PER_GWEI, "trades": r[2]} for r in rows]
+
+
+@write_op
+def prune_volume_rollups(minute_before: int, hour_before: int) -> dict:
+    """
+    Drop minute buckets older than `minute_before` and hour buckets older than
+    `hour_before` (unix times). Day buckets are kept. Returns rows deleted per table.
+    """
+    with get_db().writer() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM token_volume_1m WHERE bucket < ?", (minute_before,))
+        minutes = cursor.rowcount
+        cursor.execute("DELETE FROM token_volume_1h WHERE bucket < ?", (hour_before,))
+        hours = cursor.rowcount
+    return {"token_volume_1m": minutes, "token_volume_1h": hours}
+
 # ============ User & Referral Functions (Sprint 3) ============
 
-async def register_user(user_id: int, username: str, referred_by: int = None) -> None:
+@write_op
+def register_user(user_id: int, username: str, referred_by: int = None) -> None:
     """
     Register a new user and their referrer if applicable.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    
-    # Check if user already exists
-    cursor.execute('SELECT user_id FROM users WHERE user_id = ?', (user_id,))
-    if cursor.fetchone() is None:
-        cursor.execute('''
-            INSERT INTO users (user_id, username, referred_by)
-            VALUES (?, ?, ?)
-        ''', (user_id, username, referred_by))
-        conn.commit()
+    with get_db().writer() as conn:
+        cursor = conn.cursor()
     
-    conn.close()
+        # Check if user already exists
+        cursor.execute('SELECT user_id FROM users WHERE user_id = ?', (user_id,))
+        if cursor.fetchone() is None:
+            cursor.execute('''
+                INSERT INTO users (user_id, username, referred_by)
+                VALUES (?, ?, ?)
+            ''', (user_id, username, referred_by))
 
+@read_op
 def get_referral_stats(user_id: int) -> dict:
     """
     Get referral statistics for a user.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
     
-    # Count people referred
-    cursor.execute('SELECT COUNT(*) FROM users WHERE referred_by = ?', (user_id,))
-    referral_count = cursor.fetchone()[0]
+        # Count people referred
+        cursor.execute('SELECT COUNT(*) FROM users WHERE referred_by = ?', (user_id,))
+        referral_count = cursor.fetchone()[0]
     
-    # Total earnings
-    cursor.execute('SELECT SUM(amount_eth) FROM referral_earnings WHERE referrer_id = ?', (user_id,))
-    total_earned = cursor.fetchone()[0] or 0.0
-    
-    conn.close()
+        # Total earnings
+        cursor.execute('SELECT SUM(amount_eth) FROM referral_earnings WHERE referrer_id = ?', (user_id,))
+        total_earned = cursor.fetchone()[0] or 0.0
     
     return {
         "referral_count": referral_count,
         "total_earned_eth": total_earned
     }
 
+@read_op
 def get_leaderboard(limit: int = 10) -> list:
     """
     Get top users by trading volume.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
     
-    # Sum up amount_in as a proxy for volume (expressed as strings in DB, so we cast)
-    cursor.execute('''
-        SELECT u.username, u.user_id, COUNT(t.id) as trades, SUM(CAST(t.amount_in AS REAL)) as volume
-        FROM users u
-        JOIN trades t ON u.user_id = t.user_id
-        GROUP BY u.user_id
-        ORDER BY volume DESC
-        LIMIT ?
-    ''', (limit,))
+        # Walks idx_user_stats_volume from the top, so the cost is O(limit) however long the history.
+        # Volume is the ETH side of each trade, so buys and sells are ranked alike
+        cursor.execute('''
+            SELECT u.username, u.user_id, s.trade_count, s.volume_gwei
+            FROM user_stats s
+            JOIN users u ON u.user_id = s.user_id
+            ORDER BY s.volume_gwei DESC
+            LIMIT ?
+        ''', (limit,))
     
-    rows = cursor.fetchall()
-    conn.close()
+        rows = cursor.fetchall()
     
     return [{
         "username": r[0] or f"User_{r[1]}",
         "trades": r[2],
-        "volume": r[3]
+        "volume": r[3] / WEI_PER_GWEI
+    } for r in rows]
+
+@write_op
+def expire_window_volume() -> None:
+    """
+    Roll the sliding leaderboard windows forward to the current hour.
+    """
+    with get_db().writer() as conn:
+        _expire_window_volume(conn.cursor(), int(time.time()) // 3600)
+
+@read_op
+def _window_leaderboard(period: str, limit: int) -> list:
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT u.username, u.user_id, w.trade_count, w.volume_gwei
+            FROM user_volume_windows w
+            JOIN users u ON u.user_id = w.user_id
+            WHERE w.period = ?
+            ORDER BY w.volume_gwei DESC
+            LIMIT ?
+        ''', (period, limit))
+        rows = cursor.fetchall()
+
+    return [{
+        "username": r[0] or f"User_{r[1]}",
+        "trades": r[2],
+        "volume": r[3] / WEI_PER_GWEI
     } for r in rows]
 
+async def get_window_leaderboard(period: str, limit: int = 10) -> list:
+    """
+    Get top users by trading volume over a sliding window ("24h", "7d" or "30d").
+    Results are reused until the hourly bucket rolls over (or for 5 minutes at most).
+    """
+    now = time.time()
+    hour = int(now) // 3600
+    cached = _leaderboard_cache.get((period, limit))
+    if cached and cached[0] == hour and now - cached[1] < LEADERBOARD_CACHE_SECONDS:
+        return cached[2]
+
+    await expire_window_volume()
+    rows = await _window_leaderboard(period, limit)
+    _leaderboard_cache[(period, limit)] = (hour, now, rows)
+    return rows
+
 # ============ Automation & Settings (Sprint 4) ============
 
-def get_user_settings(user_id: int) -> dict:
+async def get_user_settings(user_id: int) -> dict:
     """
-    Get user-specific trading settings.
+    Get user-specific trading settings (cached per user).
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT slippage, auto_buy_enabled, auto_buy_amount, auto_sell_tp, auto_sell_sl, gas_price_mode FROM settings WHERE user_id = ?', (user_id,))
-    row = cursor.fetchone()
-    conn.close()
+    settings = _cache_get(_settings_cache, user_id)
+    if settings is None:
+        version = _user_versions.get(user_id, 0)
+        settings = await _get_user_settings(user_id)
+        if _user_versions.get(user_id, 0) == version:
+            _settings_cache[user_id] = (time.monotonic(), settings)
+    return dict(settings)
+
+@read_op
+def _get_user_settings(user_id: int) -> dict:
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT slippage, auto_buy_enabled, auto_buy_amount, auto_sell_tp, auto_sell_sl, gas_price_mode FROM settings WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
     
     if row:
         return {
@@ -435,97 +797,293 @@ def get_user_settings(user_id: int) -> dict:
         }
     else:
         # Return default settings
-        return {
-            "slippage": 0.5,
-            "auto_buy_enabled": False,
-            "auto_buy_amount": 0.1,
-            "auto_sell_tp": 100.0,
-            "auto_sell_sl": 50.0,
-            "gas_price_mode": "normal"
-        }
+        return dict(DEFAULT_SETTINGS)
 
 async def update_user_settings(user_id: int, **kwargs) -> None:
     """
     Update user-specific trading settings.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    
-    # Ensure settings entry exists
-    cursor.execute('SELECT user_id FROM settings WHERE user_id = ?', (user_id,))
-    if cursor.fetchone() is None:
-        cursor.execute('INSERT INTO settings (user_id) VALUES (?)', (user_id,))
-    
-    # Dynamically update provided fields
-    for key, value in kwargs.items():
-        if key == "auto_buy_enabled":
-            value = 1 if value else 0
-        cursor.execute(f'UPDATE settings SET {key} = ? WHERE user_id = ?', (value, user_id))
-    
-    conn.commit()
-    conn.close()
+    unknown = set(kwargs) - set(DEFAULT_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown setting(s): {', '.join(sorted(unknown))}")
+    if "auto_buy_enabled" in kwargs:
+        kwargs["auto_buy_enabled"] = 1 if kwargs["auto_buy_enabled"] else 0
+    try:
+        await _update_user_settings(user_id, **kwargs)
+    finally:
+        _invalidate_user(user_id)
 
-async def create_pending_order(user_id: int, wallet: str, token: str, order_type: str, amount_eth: float = None, amount_tokens: float = None, trigger_price: float = None) -> int:
+@write_op
+def _update_user_settings(user_id: int, **kwargs) -> None:
+    # One upsert creates the row and sets every field (keys are checked by the caller)
+    columns = ", ".join(["user_id", *kwargs])
+    placeholders = ", ".join("?" for _ in range(len(kwargs) + 1))
+    action = "UPDATE SET " + ", ".join(f"{key} = excluded.{key}" for key in kwargs) if kwargs else "NOTHING"
+    with get_db().writer() as conn:
+        conn.execute(
+            f"INSERT INTO settings ({columns}) VALUES ({placeholders}) ON CONFLICT(user_id) DO {action}",
+            (user_id, *kwargs.values())
+        )
+
+@write_op
+def create_pending_order(user_id: int, wallet: str, token: str, order_type: str, amount_eth: float = None, amount_tokens: float = None, trigger_price: float = None) -> int:
     """
     Store a pending limit order or auto-trade trigger.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO pending_orders (user_id, wallet_address, token_address, order_type, trigger_price, amount_eth, amount_tokens)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (user_id, wallet, token, order_type, trigger_price, amount_eth, amount_tokens))
-    order_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    with get_db().writer() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO pending_orders (user_id, wallet_address, token_address, order_type, trigger_price, amount_eth, amount_tokens)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, wallet, token, order_type, trigger_price, amount_eth, amount_tokens))
+        order_id = cursor.lastrowid
     return order_id
 
 # ============ AI & Alerts (Sprint 5) ============
 
-async def save_ai_signal(token_address: str, signal_type: str, insight: str, reliability: float = 1.0) -> None:
+@write_op
+def save_ai_signal(token_address: str, signal_type: str, insight: str, reliability: float = 1.0) -> None:
     """
     Save an AI-generated insight for a token.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO ai_signals (token_address, signal_type, insight, reliability)
-        VALUES (?, ?, ?, ?)
-    ''', (token_address, signal_type, insight, reliability))
-    conn.commit()
-    conn.close()
+    with get_db().writer() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO ai_signals (token_address, signal_type, insight, reliability)
+            VALUES (?, ?, ?, ?)
+        ''', (token_address, signal_type, insight, reliability))
 
+@read_op
 def get_latest_ai_signals(limit: int = 5) -> list:
     """
     Fetch the most recent AI insights.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT token_address, signal_type, insight, created_at FROM ai_signals ORDER BY created_at DESC LIMIT ?', (limit,))
-    rows = cursor.fetchall()
-    conn.close()
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT token_address, signal_type, insight, created_at FROM ai_signals ORDER BY created_at DESC LIMIT ?', (limit,))
+        rows = cursor.fetchall()
     return [{"token": r[0], "type": r[1], "insight": r[2], "time": r[3]} for r in rows]
 
-async def create_alert(user_id: int, alert_type: str, target_address: str = None, target_value: float = None) -> None:
+@write_op
+def create_alert(user_id: int, alert_type: str, target_address: str = None, target_value: float = None) -> int:
     """
-    Create a new user alert.
+    Create a new user alert and return its id.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO alerts (user_id, alert_type, target_address, target_value)
-        VALUES (?, ?, ?, ?)
-    ''', (user_id, alert_type, target_address, target_value))
-    conn.commit()
-    conn.close()
+    with get_db().writer() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO alerts (user_id, alert_type, target_address, target_value)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, alert_type, target_address, target_value))
+        return cursor.lastrowid
 
+@read_op
 def get_user_alerts(user_id: int) -> list:
     """
     Fetch all active alerts for a user.
     """
-    conn = sqlite3.connect('wallet.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, alert_type, target_address, target_value FROM alerts WHERE user_id = ? AND is_active = 1', (user_id,))
-    rows = cursor.fetchall()
-    conn.close()
-    return [{"id": r[0], "type": r[1], "target": r[2], "value": r[3]} for r in rows]
\ No newline at end of file
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, alert_type, target_address, target_value FROM alerts WHERE user_id = ? AND is_active = 1', (user_id,))
+        rows = cursor.fetchall()
+    return [{"id": r[0], "type": r[1], "target": r[2], "value": r[3]} for r in rows]
+
+@read_op
+def get_active_alerts() -> list:
+    """
+    Fetch every active alert, for loading the in-memory alert index.
+    """
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, user_id, alert_type, target_address, target_value FROM alerts WHERE is_active = 1')
+        rows = cursor.fetchall()
+    return [{"id": r[0], "user_id": r[1], "type": r[2], "target": r[3], "value": r[4]} for r in rows]
+
+@write_op
+def deactivate_alerts(alert_ids: list, triggered: bool = True) -> int:
+    """
+    Deactivate alerts in bulk and return how many were still active. `triggered`
+    stamps triggered_at; pass False when the user removed them instead.
+    """
+    with get_db().writer() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "UPDATE alerts SET is_active = 0, triggered_at = CASE WHEN ? THEN CURRENT_TIMESTAMP END WHERE id = ? AND is_active = 1",
+            [(triggered, alert_id) for alert_id in alert_ids]
+        )
+        return cursor.rowcount
+
+@read_op
+def get_token_day_volumes(day: int) -> dict:
+    """
+    ETH volume per token in the UTC day starting at `day` (a token_volume_1d bucket).
+    """
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT token_address, volume_gwei FROM token_volume_1d WHERE bucket = ?', (day,))
+        rows = cursor.fetchall()
+    return {r[0]: r[1] / WEI_PER_GWEI for r in rows}
+
+# ============ Market Data (Charts) ============
+
+@write_op
+def record_price_tick(token_address: str, price: float, timestamp: int = None) -> None:
+    """
+    Fold a USD price observation into the token's current 1-minute candle.
+    """
+    if not price or price <= 0:
+        return
+    ts = int(timestamp or time.time())
+    open_time = ts - ts % 60
+
+    with get_db().writer() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO candles (token_address, open_time, open, high, low, close)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(token_address, open_time) DO UPDATE SET
+                high = MAX(high, excluded.close),
+                low = MIN(low, excluded.close),
+                close = excluded.close
+        ''', (token_address.lower(), open_time, price, price, price, price))
+
+@read_op
+def get_candles(token_address: str, since: int) -> list:
+    """
+    Fetch 1-minute candles for a token from `since` (unix seconds) onwards, oldest first.
+    """
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT open_time, open, high, low, close
+            FROM candles
+            WHERE token_address = ? AND open_time >= ?
+            ORDER BY open_time ASC
+        ''', (token_address.lower(), since))
+        rows = cursor.fetchall()
+    return rows
+
+@read_op
+def get_listing_candles(since: int) -> list:
+    """
+    Fetch 1-minute candles for every token the monitor has flagged as a new listing,
+    ordered by token then time. Rows are (token, open_time, open, high, low, close).
+    """
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT c.token_address, c.open_time, c.open, c.high, c.low, c.close
+            FROM candles c
+            WHERE c.open_time >= ? AND c.token_address IN (
+                SELECT DISTINCT LOWER(token_address) FROM ai_signals WHERE signal_type = 'listing'
+            )
+            ORDER BY c.token_address, c.open_time
+        ''', (since,))
+        rows = cursor.fetchall()
+    return rows
+
+
+# ============ Token Security ============
+
+@read_op
+def get_code_scan(code_hash: str) -> str:
+    """
+    Fetch a stored bytecode scan (JSON) by runtime code hash, or None.
+    """
+    with get_db().reader() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT result FROM code_scans WHERE code_hash = ?', (code_hash,))
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+@write_op
+def save_code_scan(code_hash: str, result: str) -> None:
+    """
+    Store a bytecode scan (JSON) under its runtime code hash.
+    """
+    with get_db().writer() as conn:
+        cursor = conn.cursor()
+        cursor.execute('INSERT OR REPLACE INTO code_scans (code_hash, result) VALUES (?, ?)', (code_hash, result))
+
+
+# ============ Retention & Archive ============
+
+def _pack_rows(rows: list) -> bytes:
+    return zlib.compress(json.dumps(rows, separators=(",", ":"), default=str).encode())
+
+
+def _unpack_rows(payload: bytes) -> list:
+    return json.loads(zlib.decompress(payload))
+
+
+def _archive(cursor, source: str, columns: list, rows: list, user_id: int = None) -> None:
+    """Store rows (ordered by id, with id and created_at among the columns) as one compressed batch."""
+    created = [row[columns.index("created_at")] for row in rows]
+    cursor.execute('''
+        INSERT INTO archive_batches (source, user_id, first_id, last_id, oldest, newest, row_count, columns, payload)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (source, user_id, rows[0][0], rows[-1][0], min(created), max(created), len(rows),
+          json.dumps(columns), _pack_rows(rows)))
+
+
+@write_op
+def archive_ai_signals(before: str, listings_before: str, limit: int = 500) -> int:
+    """
+    Move up to `limit` AI signals created before `before` into a compressed archive
+    batch; 'listing' signals (which /backtest replays) are kept until `listings_before`.
+    Timestamps are 'YYYY-MM-DD HH:MM:SS' UTC. Returns the number of rows archived.
+    """
+    with get_db().writer() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT * FROM ai_signals
+            WHERE created_at < ? AND (signal_type != 'listing' OR created_at < ?)
+            ORDER BY created_at
+            LIMIT ?
+        ''', (before, listings_before, limit))
+        rows = sorted(cursor.fetchall())
+        if not rows:
+            return 0
+        columns = [d[0] for d in cursor.description]
+        _archive(cursor, "ai_signals", columns, rows)
+        cursor.executemany("DELETE FROM ai_signals WHERE id = ?", [(row[0],) for row in rows])
+    return len(rows)
+
+
+@write_op
+def archive_trades(before: str, limit: int = 500) -> int:
+    """
+    Move up to `limit` settled (non-pending) trades created before `before` into
+    compressed archive batches, one per user. user_stats keeps their totals and
+    /export still includes them. Returns the number of rows archived.
+    """
+    with get_db().writer() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT * FROM trades
+            WHERE created_at < ? AND status != 'pending'
+            ORDER BY created_at
+            LIMIT ?
+        ''', (before, limit))
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
+        columns = [d[0] for d in cursor.description]
+        user_index = columns.index("user_id")
+        by_user = {}
+        for row in sorted(rows):
+            by_user.setdefault(row[user_index], []).append(row)
+        for user_id, user_rows in by_user.items():
+            _archive(cursor, "trades", columns, user_rows, user_id)
+        cursor.executemany("DELETE FROM trades WHERE id = ?", [(row[0],) for row in rows])
+    return len(rows)
+
+
+@write_op
+def reclaim_free_pages(pages: int) -> int:
+    """
+    Hand up to `pages` freed pages back to the filesystem (incremental vacuum).
+    Returns the number of free pages left.
+    """
+    return get_db().vacuum(pages)
+
@@ -0,0 +1,131 @@
+"""
+Bot API connection pools, one per kind of traffic.
+
+  updates     - getUpdates long polls (polling mode only): a single connection.
+                PTB adds the poll timeout to this pool's read timeout itself.
+  interactive - handler replies, edits and callback answers (the Application's bot)
+  broadcast   - the outbox's sends (channel alerts, notifications), on a Bot of
+                their own, so a burst of them never queues in front of a user's reply
+
+Pools use HTTP/2 when the h2 package is installed (python-telegram-bot[http2])
+unless BASEFLOW_HTTP2=0; requests then share a few multiplexed connections.
+
+Every request records how long it waited for a pooled connection, not counting
+connecting or the TLS handshake. pool_stats() summarises this per pool, and
+pool_stats_loop() prints it every BASEFLOW_HTTP_STATS_SECONDS.
+"""
+import asyncio
+import importlib.util
+import os
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+from telegram.request import HTTPXRequest
+
+load_dotenv()
+
+HTTP_VERSION = "2" if os.getenv("BASEFLOW_HTTP2", "1") != "0" and importlib.util.find_spec("h2") else "1.1"
+INTERACTIVE_POOL_SIZE = int(os.getenv("BASEFLOW_INTERACTIVE_POOL_SIZE", "32"))
+BROADCAST_POOL_SIZE = int(os.getenv("BASEFLOW_BROADCAST_POOL_SIZE", "8"))
+HTTP_STATS_SECONDS = int(os.getenv("BASEFLOW_HTTP_STATS_SECONDS", "300"))
+# A p95 wait above this is reported as pool saturation
+SLOW_POOL_WAIT = 0.1
+STATS_WINDOW = 1000
+
+# name -> (connections, HTTP version, read timeout, pool timeout)
+POOLS = {
+    "updates": (1, "1.1", 10.0, 30.0),
+    "interactive": (INTERACTIVE_POOL_SIZE, HTTP_VERSION, 30.0, 10.0),
+    "broadcast": (BROADCAST_POOL_SIZE, HTTP_VERSION, 30.0, 60.0),
+}
+
+# Connection setup done after a request got its pooled connection (not waiting)
+_SETUP_EVENTS = ("connection.connect_tcp.", "connection.start_tls.", "http2.send_connection_init.")
+_HEADERS_SENT = ("http11.send_request_headers.started", "http2.send_request_headers.started")
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._recent = deque(maxlen=STATS_WINDOW)
+
+    def record(self, wait: float) -> None:
+        self.requests += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self._recent.append(wait)
+
+    def snapshot(self) -> dict:
+        recent = sorted(self._recent)
+        return {
+            "requests": self.requests,
+            "avg_wait_ms": self.total_wait / self.requests * 1000 if self.requests else 0.0,
+            "p95_wait_ms": recent[int(len(recent) * 0.95) - 1] * 1000 if recent else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+class _RequestTrace:
+    """httpcore trace callback for one request: pool wait = time until its headers go out, minus setup."""
+
+    def __init__(self, metrics: PoolMetrics):
+        self.metrics = metrics
+        self.started = time.perf_counter()
+        self.setup = 0.0
+        self._setup_started = None
+
+    async def __call__(self, event_name: str, info: dict) -> None:
+        now = time.perf_counter()
+        if event_name.startswith(_SETUP_EVENTS):
+            if event_name.endswith(".started"):
+                self._setup_started = now
+            elif self._setup_started is not None:
+                self.setup += now - self._setup_started
+                self._setup_started = None
+        elif event_name in _HEADERS_SENT:
+            self.metrics.record(max(now - self.started - self.setup, 0.0))
+
+
+_metrics = {name: PoolMetrics(name) for name in POOLS}
+
+
+def make_request(pool: str) -> HTTPXRequest:
+    """An HTTPXRequest for one of POOLS, reporting its waits to pool_stats()."""
+    size, http_version, read_timeout, pool_timeout = POOLS[pool]
+    metrics = _metrics[pool]
+
+    async def trace_request(request) -> None:
+        request.extensions["trace"] = _RequestTrace(metrics)
+
+    return HTTPXRequest(
+        connection_pool_size=size,
+        connect_timeout=30.0,
+        read_timeout=read_timeout,
+        write_timeout=30.0,
+        pool_timeout=pool_timeout,
+        http_version=http_version,
+        httpx_kwargs={"event_hooks": {"request": [trace_request]}},
+    )
+
+
+def pool_stats() -> dict:
+    return {name: metrics.snapshot() for name, metrics in _metrics.items()}
+
+
+async def pool_stats_loop():
+    last = {}
+    while True:
+        await asyncio.sleep(HTTP_STATS_SECONDS)
+        stats = pool_stats()
+        for name, pool in stats.items():
+            count = pool["requests"] - last.get(name, 0)
+            last[name] = pool["requests"]
+            if not count:
+                continue
+            icon = "⚠️" if pool["p95_wait_ms"] > SLOW_POOL_WAIT * 1000 else "📡"
+            print(f"{icon} HTTP pool {name}: {count} requests, wait avg {pool['avg_wait_ms']:.1f} ms, "
+                  f"p95 {pool['p95_wait_ms']:.1f} ms, max {pool['max_wait_ms']:.1f} ms")
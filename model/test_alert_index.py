@@ -0,0 +1,111 @@
+"""
+Alert index tests: price crossings in both directions, volume targets, and ticks to ignore.
+Run from the model directory: python3 -m pytest test_alert_index.py
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import alert_index
+from alert_index import PRICE, VOLUME, WEI_PER_ETH, AlertIndex
+
+TOKEN = "0x" + "ab" * 20
+OTHER = "0x" + "cd" * 20
+
+
+class _Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+
+
+@pytest.fixture
+def index(monkeypatch):
+    """An index loaded with price alerts at 1, 2 and 3 USD and a 1 ETH volume alert on TOKEN."""
+    rows = [
+        {"id": 3, "user_id": 10, "type": PRICE, "target": TOKEN, "value": 3.0},
+        {"id": 1, "user_id": 10, "type": PRICE, "target": TOKEN, "value": 1.0},
+        {"id": 2, "user_id": 11, "type": PRICE, "target": "0x" + "AB" * 20, "value": 2.0},  # upper case, as users may type it
+        {"id": 4, "user_id": 12, "type": VOLUME, "target": TOKEN, "value": 1.0},
+    ]
+
+    async def get_active_alerts():
+        return rows
+
+    async def get_token_day_volumes(day):
+        return {}
+
+    writes, sends = _Recorder(), _Recorder()
+    monkeypatch.setattr(alert_index, "get_active_alerts", get_active_alerts)
+    monkeypatch.setattr(alert_index, "get_token_day_volumes", get_token_day_volumes)
+    monkeypatch.setattr(alert_index, "get_write_queue", lambda: writes)
+    monkeypatch.setattr(alert_index, "get_outbox", lambda: sends)
+
+    index = AlertIndex()
+    assert asyncio.run(index.load()) == len(rows)
+    index.writes, index.sends = writes, sends
+    return index
+
+
+def _fired(alerts: list) -> list:
+    return sorted(alert["id"] for alert in alerts)
+
+
+def test_first_tick_only_sets_the_baseline(index):
+    assert index.on_price(TOKEN, 5.0) == []
+    assert index.last_price(TOKEN) == 5.0
+
+
+def test_rising_crossings(index):
+    index.on_price(TOKEN, 0.5)
+    assert _fired(index.on_price(TOKEN, 2.0)) == [1, 2]  # last < value <= price
+    assert index.on_price(TOKEN, 2.5) == []
+    assert _fired(index.on_price(TOKEN, 3.5)) == [3]
+
+
+def test_falling_crossings(index):
+    index.on_price(TOKEN, 5.0)
+    assert _fired(index.on_price(TOKEN, 2.0)) == [2, 3]  # price <= value < last
+    assert _fired(index.on_price(TOKEN, 0.1)) == [1]
+
+
+def test_starting_on_a_threshold_is_not_a_crossing(index):
+    index.on_price(TOKEN, 2.0)
+    assert _fired(index.on_price(TOKEN, 2.5)) == []
+    assert _fired(index.on_price(TOKEN, 1.5)) == [2]
+
+
+def test_alerts_fire_once(index):
+    index.on_price(TOKEN, 0.5)
+    index.on_price(TOKEN, 3.5)
+    assert index.on_price(TOKEN, 0.5) == []
+    assert index.on_price(TOKEN, 3.5) == []
+    # Each fired batch is deactivated in one write and notified to its owners
+    assert [args[1] for args, _ in index.writes.calls] == [[1, 2, 3]]
+    assert sorted(args[0] for args, _ in index.sends.calls) == [10, 10, 11]
+
+
+def test_zero_and_unloaded_ticks_are_ignored(index):
+    index.on_price(TOKEN, 2.5)
+    # A failed lookup reports 0; it must neither fire nor become the baseline
+    assert index.on_price(TOKEN, 0) == []
+    assert index.last_price(TOKEN) == 2.5
+    assert _fired(index.on_price(TOKEN, 1.5)) == [2]
+    assert AlertIndex().on_price(TOKEN, 1.0) == []
+
+
+def test_other_tokens_do_not_fire(index):
+    index.on_price(OTHER, 0.5)
+    assert index.on_price(OTHER, 5.0) == []
+
+
+def test_volume_target(index):
+    assert index.on_volume(TOKEN, 6 * WEI_PER_ETH // 10) == []
+    assert _fired(index.on_volume(TOKEN, 6 * WEI_PER_ETH // 10)) == [4]
+    assert index.on_volume(TOKEN, WEI_PER_ETH) == []
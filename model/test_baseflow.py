@@ -202,7 +202,7 @@ async def test_database():
         
         # Test trade count for non-existent user
         test_user_id = 999999999
-        count = get_trade_count(test_user_id)
+        count = await get_trade_count(test_user_id)
         success(f"Trade count for test user: {count}")
         
         # Test save trade
@@ -218,12 +218,15 @@ async def test_database():
             trade_type="buy",
             status="success",
             gas_used=150000,
-            block_number=12345678
+            block_number=12345678,
+            amount_in_raw=10**17,
+            amount_out_raw=350 * 10**6,
+            eth_value_wei=10**17
         )
         success("Test trade saved to database")
         
         # Verify trade was saved
-        trades = get_user_trades(test_user_id, limit=5)
+        trades = await get_user_trades(test_user_id, limit=5)
         if trades and len(trades) > 0:
             success(f"Retrieved {len(trades)} trade(s) from database")
             for t in trades[:2]:
@@ -232,7 +235,7 @@ async def test_database():
             error("Failed to retrieve saved trade")
         
         # Test volume stats
-        stats = get_total_volume()
+        stats = await get_total_volume()
         success(f"Volume stats: {stats['total_trades']} trades, {stats['unique_traders']} traders")
         
         return True
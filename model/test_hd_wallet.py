@@ -0,0 +1,40 @@
+"""
+HD derivation tests against the BIP-39/BIP-44 "abandon ... about" vector.
+Run from the model directory: python3 -m pytest test_hd_wallet.py
+"""
+import os
+import sys
+
+from eth_account import Account
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from hd_wallet import HDNode
+
+# Seed of the mnemonic "abandon abandon abandon abandon abandon abandon abandon abandon abandon
+# abandon abandon about" with an empty passphrase
+SEED = bytes.fromhex(
+    "5eb00bbddcf069084889a8ab9155568165f5c453ccb85e70811aaed6f6da5fc1"
+    "9a5ac40b389cd370d086206dec8aa6c43daea6690f20ad3d8d48b2d2ce9e38e4"
+)
+# m/44'/60'/0'/0/i
+EXPECTED = [
+    ("0x1ab42cc412b618bdea3a599e3c9bae199ebf030895b039e9db1e30dafb12b727", "0x9858EfFD232B4033E47d90003D41EC34EcaEda94"),
+    ("0x9a983cb3d832fbde5ab49d692b7a8bf5b5d232479c99333d0fc8e1d21f1b55b6", "0x6Fac4D18c912343BF86fa7049364Dd4E424Ab9C0"),
+    ("0x5b824bd1104617939cd07c117ddc4301eb5beeca0904f964158963d69ab9d831", "0xb6716976A3ebe8D39aCEB04372f22Ff8e6802D7A"),
+]
+
+
+def test_known_vector():
+    assert HDNode(SEED).derive_range(0, 3) == EXPECTED
+
+
+def test_derive_is_order_independent():
+    node = HDNode(SEED)
+    assert node.derive(2) == EXPECTED[2]
+    assert node.derive_range(1, 2) == EXPECTED[1:]
+
+
+def test_addresses_match_their_keys():
+    for private_key, address in HDNode(SEED).derive_range(1000, 5):
+        assert Account.from_key(private_key).address == address
@@ -0,0 +1,78 @@
+"""
+Key vault tests: seal/open round trips and the passphrase check.
+Run from the model directory: python3 -m pytest test_key_vault.py
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from eth_account import Account
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import key_vault
+from key_vault import KeyVault
+
+PRIVATE_KEY = "0x4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318"
+ADDRESS = Account.from_key(PRIVATE_KEY).address
+
+
+@pytest.fixture
+def vault_meta(monkeypatch):
+    """Keep vault_meta in memory and make scrypt cheap."""
+    meta = {}
+
+    async def get_vault_meta():
+        return dict(meta)
+
+    async def init_vault_meta(values):
+        for name, value in values.items():
+            meta.setdefault(name, value)
+
+    monkeypatch.setattr(key_vault, "get_vault_meta", get_vault_meta)
+    monkeypatch.setattr(key_vault, "init_vault_meta", init_vault_meta)
+    monkeypatch.setattr(key_vault, "KDF_N", 2**10)
+    return meta
+
+
+def test_seal_round_trip(vault_meta):
+    vault = KeyVault("correct horse")
+    private_key, blob = asyncio.run(vault.seal(ADDRESS, PRIVATE_KEY))
+    assert private_key is None
+    assert PRIVATE_KEY.encode() not in blob
+    assert vault._decrypt(vault._kek, ADDRESS, blob) == PRIVATE_KEY
+    # Contexts are compared case-insensitively, like addresses
+    assert vault._decrypt(vault._kek, ADDRESS.lower(), blob) == PRIVATE_KEY
+
+
+def test_blob_is_bound_to_its_address(vault_meta):
+    vault = KeyVault("correct horse")
+    _, blob = asyncio.run(vault.seal(ADDRESS, PRIVATE_KEY))
+    with pytest.raises(InvalidTag):
+        vault._decrypt(vault._kek, "0x" + "11" * 20, blob)
+
+
+def test_signer_from_sealed_key(vault_meta, monkeypatch):
+    vault = KeyVault("correct horse")
+    _, blob = asyncio.run(vault.seal(ADDRESS, PRIVATE_KEY))
+
+    async def get_wallet_key(user_id, address):
+        return (None, blob, None) if address.lower() == ADDRESS.lower() else None
+
+    monkeypatch.setattr(key_vault, "get_wallet_key", get_wallet_key)
+    # A fresh process: the KEK is re-derived from the stored salt
+    signer = asyncio.run(KeyVault("correct horse").get_signer(1, ADDRESS))
+    assert signer.address == ADDRESS
+
+
+def test_wrong_passphrase_is_rejected(vault_meta):
+    asyncio.run(KeyVault("correct horse").seal(ADDRESS, PRIVATE_KEY))
+    with pytest.raises(ValueError, match="doesn't match"):
+        asyncio.run(KeyVault("battery staple").seal(ADDRESS, PRIVATE_KEY))
+
+
+def test_inactive_vault_stores_plaintext(vault_meta):
+    assert asyncio.run(KeyVault(None).seal(ADDRESS, PRIVATE_KEY)) == (PRIVATE_KEY, None)
+    assert vault_meta == {}
@@ -0,0 +1,86 @@
+"""
+Schema migration tests: a fresh file, the pre-versioning wallet.db, and re-runs.
+Run from the model directory: python3 -m pytest test_migrations.py
+"""
+import os
+import shutil
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import migrations
+from db import Database
+
+BASELINE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wallet.db")
+LATEST = migrations.MIGRATIONS[-1][0]
+
+
+def _migrate(path: str) -> int:
+    db = Database(path, readers=1)
+    try:
+        return migrations.migrate(db)
+    finally:
+        db.close()
+
+
+def _columns(conn, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _tables(conn) -> set:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_fresh_database(tmp_path):
+    path = str(tmp_path / "fresh.db")
+    assert _migrate(path) == LATEST
+
+    conn = sqlite3.connect(path)
+    versions = [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+    assert versions == [number for number, _, _ in migrations.MIGRATIONS]
+    assert {"encrypted_key", "hd_index"} <= _columns(conn, "wallets")
+    assert "triggered_at" in _columns(conn, "alerts")
+    assert {"eth_value_gwei", "amount_in_raw", "amount_out_raw"} <= _columns(conn, "trades")
+    tables = _tables(conn)
+    assert {"user_stats", "hd_seeds", "vault_meta", "archive_batches", *migrations.ROLLUP_TABLES} <= tables
+    assert "volume_tracking" not in tables
+
+
+def test_baseline_database(tmp_path):
+    # The checked-in wallet.db predates versioning (and wallets.created_at)
+    path = str(tmp_path / "baseline.db")
+    shutil.copy(BASELINE_DB, path)
+    before = sqlite3.connect(path)
+    wallets = before.execute("SELECT id, user_id, address, private_key FROM wallets ORDER BY id").fetchall()
+    trades = before.execute("SELECT user_id, COUNT(*) FROM trades GROUP BY user_id ORDER BY user_id").fetchall()
+    before.close()
+
+    assert _migrate(path) == LATEST
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT id, user_id, address, private_key FROM wallets ORDER BY id").fetchall() == wallets
+    assert conn.execute("SELECT user_id, trade_count FROM user_stats ORDER BY user_id").fetchall() == trades
+    assert "encrypted_key" in _columns(conn, "wallets")
+
+
+def test_rerun_is_a_no_op(tmp_path):
+    path = str(tmp_path / "rerun.db")
+    _migrate(path)
+    assert _migrate(path) == LATEST
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == len(migrations.MIGRATIONS)
+
+
+def test_steps_are_idempotent(tmp_path):
+    # Every step must survive running against a schema it already produced
+    path = str(tmp_path / "steps.db")
+    _migrate(path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    for _, _, step in migrations.MIGRATIONS:
+        if callable(step):
+            step(conn)
+        else:
+            for sql in step:
+                conn.execute(sql)
+    assert "encrypted_key" in _columns(conn, "wallets")
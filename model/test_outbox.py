@@ -0,0 +1,71 @@
+"""
+Outbox tests: token-bucket pacing, globally and per chat, and lane order.
+Run from the model directory: python3 -m pytest test_outbox.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from outbox import CHAT_BURST, LANE_ALERT, LANE_BROADCAST, LANE_TRADE, Outbox, TokenBucket
+
+
+class _Bot:
+    def __init__(self):
+        self.sent = []  # (monotonic time, chat_id, text)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((time.monotonic(), chat_id, text))
+        return text
+
+
+async def _deliver(outbox: Outbox, messages: list) -> _Bot:
+    bot = _Bot()
+    futures = [outbox.submit(chat_id, text, lane=lane) for chat_id, text, lane in messages]
+    outbox.start(bot)
+    await asyncio.wait_for(asyncio.gather(*futures), 10)
+    await outbox.close()
+    return bot
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=2, burst=3)
+    now = bucket.updated
+    for _ in range(3):
+        assert bucket.delay(now) == 0
+        bucket.take(now)
+    assert bucket.delay(now) == pytest.approx(0.5)
+    assert bucket.delay(now + 0.5) == 0
+    # Refills stop at the burst size
+    assert bucket.is_full(now + 60)
+    assert bucket.tokens == 3
+
+
+def test_global_rate():
+    rate = 50
+    bot = asyncio.run(_deliver(Outbox(rate), [(chat_id, "hi", LANE_BROADCAST) for chat_id in range(1, 101)]))
+    times = [t for t, _, _ in bot.sent]
+    assert len(times) == 100
+    # The burst (a fifth of the rate) goes at once, the rest at the rate
+    assert times[-1] - times[0] >= (100 - rate / 5) / rate * 0.95
+    for i, start in enumerate(times):
+        assert sum(1 for t in times[i:] if t < start + 1) <= rate * 1.2
+
+
+def test_private_chat_rate():
+    bot = asyncio.run(_deliver(Outbox(100), [(7, str(i), LANE_BROADCAST) for i in range(CHAT_BURST + 2)]))
+    times = [t for t, _, _ in bot.sent]
+    assert [text for _, _, text in bot.sent] == [str(i) for i in range(CHAT_BURST + 2)]
+    # One message a second once the chat's burst is spent
+    assert times[CHAT_BURST] - times[0] >= 0.95
+    assert times[CHAT_BURST + 1] - times[CHAT_BURST] >= 0.95
+
+
+def test_lanes_order_a_chats_messages():
+    messages = [(7, "broadcast", LANE_BROADCAST), (7, "alert", LANE_ALERT), (7, "trade", LANE_TRADE)]
+    bot = asyncio.run(_deliver(Outbox(100), messages))
+    assert [text for _, _, text in bot.sent] == ["trade", "alert", "broadcast"]
@@ -0,0 +1,55 @@
+"""
+Vanity search tests: every wallet a walk returns must be the key's real address.
+Run from the model directory: python3 -m pytest test_vanity.py
+"""
+import multiprocessing
+import os
+import sys
+import threading
+
+import pytest
+from eth_keys import keys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vanity import normalize_pattern, _search
+
+
+class _Results:
+    """Stands in for the worker's result queue; stops the search after `limit` wallets."""
+
+    def __init__(self, stop, limit: int):
+        self.stop = stop
+        self.limit = limit
+        self.wallets = []
+
+    def put(self, wallet):
+        self.wallets.append(wallet)
+        if len(self.wallets) >= self.limit:
+            self.stop.set()
+
+
+def _run(prefix: str, suffix: str, limit: int) -> list:
+    stop = threading.Event()
+    results = _Results(stop, limit)
+    attempts = multiprocessing.Value("Q", 0)
+    _search(prefix, suffix, results, attempts, stop)
+    assert attempts.value >= len(results.wallets)
+    return results.wallets
+
+
+@pytest.mark.parametrize("prefix, suffix", [("a", ""), ("", "b"), ("c", "d")])
+def test_walk_matches_eth_keys(prefix, suffix):
+    # One-character patterns make each walk take about 16 steps before it matches
+    wallets = _run(prefix, suffix, 100)
+    assert len({key for key, _ in wallets}) == len(wallets)
+    for private_key, address in wallets:
+        assert keys.PrivateKey(bytes.fromhex(private_key[2:])).public_key.to_checksum_address() == address
+        assert address[2:].lower().startswith(prefix) and address.lower().endswith(suffix)
+
+
+def test_normalize_pattern():
+    assert normalize_pattern("0xABc") == "abc"
+    assert normalize_pattern(None) == ""
+    with pytest.raises(ValueError):
+        normalize_pattern("xyz")
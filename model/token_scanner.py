@@ -0,0 +1,253 @@
+"""
+Bytecode-based token security scanner.
+
+Runtime bytecode is disassembled and checked for privileged function selectors
+(owner-only mint, blacklist, fee setters, pause/trading switches) and proxy
+patterns. Launchpad tokens are mostly clones of a handful of templates, so
+analyses are cached by code hash: each template is analyzed once, and every
+further token from it costs a single eth_getCode (plus an owner() call when the
+code is Ownable).
+"""
+import asyncio
+import json
+import os
+from collections import OrderedDict
+
+from web3 import Web3
+from dotenv import load_dotenv
+
+from store_to_db import get_code_scan, save_code_scan
+
+load_dotenv()
+
+BASE_RPC_URL = os.getenv('BASE_RPC_URL', 'https://mainnet.base.org')
+
+# Function signatures that grant the owner control over holders' tokens
+RISK_SIGNATURES = {
+    "mint": [
+        "mint(address,uint256)", "mint(uint256)", "mintTo(address,uint256)",
+        "mint(address[],uint256[])", "issue(uint256)",
+    ],
+    "blacklist": [
+        "blacklist(address)", "blacklist(address,bool)", "addToBlacklist(address)",
+        "addBlackList(address)", "setBlacklist(address,bool)", "setBlacklisted(address,bool)",
+        "blacklistAddress(address,bool)", "bulkBlacklist(address[],bool)",
+        "setBots(address[],bool)", "addBots(address[])", "blockBots(address[])",
+        "isBlacklisted(address)", "isBot(address)",
+    ],
+    "fees": [
+        "setFee(uint256)", "setFees(uint256,uint256)", "setTaxes(uint256,uint256)",
+        "setBuyFee(uint256)", "setSellFee(uint256)", "setBuyTax(uint256)", "setSellTax(uint256)",
+        "setTaxFeePercent(uint256)", "updateFees(uint256,uint256)", "updateBuyFees(uint256,uint256)",
+        "updateSellFees(uint256,uint256)", "setSwapFee(uint256)", "setFeePercent(uint256)",
+    ],
+    "pause": [
+        "pause()", "unpause()", "setPaused(bool)", "enableTrading()", "openTrading()",
+        "setTradingEnabled(bool)", "setTrading(bool)", "setMaxTxAmount(uint256)",
+    ],
+    "proxy": [
+        "upgradeTo(address)", "upgradeToAndCall(address,bytes)", "implementation()",
+    ],
+}
+OWNER_SIGNATURE = "owner()"
+
+RISK_LABELS = {
+    "mint": "Owner can mint",
+    "blacklist": "Blacklist function",
+    "fees": "Adjustable fees",
+    "pause": "Trading can be paused",
+    "proxy": "Upgradeable proxy",
+}
+
+# bytes32(uint256(keccak256('eip1967.proxy.implementation')) - 1)
+EIP1967_IMPL_SLOT = bytes.fromhex("360894a13ba1a3210667c828492db98dca3e2076cc3735a920a3ca505d382bbc")
+EIP1167_PREFIX = bytes.fromhex("363d3d373d3d3d363d73")
+
+OP_DELEGATECALL = 0xf4
+OP_SELFDESTRUCT = 0xff
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+def _selector(signature: str) -> bytes:
+    return bytes(Web3.keccak(text=signature)[:4])
+
+SELECTORS = {
+    category: {_selector(sig): sig for sig in sigs}
+    for category, sigs in RISK_SIGNATURES.items()
+}
+OWNER_SELECTOR = _selector(OWNER_SIGNATURE)
+
+
+def strip_metadata(code: bytes) -> bytes:
+    """Drop the trailing CBOR metadata solc appends, so it isn't parsed as opcodes."""
+    if len(code) > 2:
+        meta_len = int.from_bytes(code[-2:], "big")
+        if 0 < meta_len + 2 <= len(code) and code[-meta_len - 2] in (0xa1, 0xa2, 0xa3, 0xa4):
+            return code[:-meta_len - 2]
+    return code
+
+
+def disassemble(code: bytes) -> tuple:
+    """
+    Walk EVM bytecode and return (PUSH4 operands, PUSH32 operands, opcodes used).
+    PUSH data is skipped, so selector-like bytes inside constants aren't read as instructions.
+    """
+    push4, push32, opcodes = set(), set(), set()
+    code = strip_metadata(code)
+    i, n = 0, len(code)
+    while i < n:
+        op = code[i]
+        if 0x60 <= op <= 0x7f:
+            size = op - 0x5f
+            if size == 4:
+                push4.add(code[i + 1:i + 5])
+            elif size == 32:
+                push32.add(code[i + 1:i + 33])
+            i += 1 + size
+        else:
+            opcodes.add(op)
+            i += 1
+    return push4, push32, opcodes
+
+
+def analyze_bytecode(code: bytes) -> dict:
+    """
+    Static analysis of runtime bytecode. Depends only on the code itself, so the
+    result can be shared by every contract with the same code hash.
+    """
+    if code[:len(EIP1167_PREFIX)] == EIP1167_PREFIX:
+        return {
+            "flags": {category: False for category in SELECTORS},
+            "matched": [],
+            "has_owner": False,
+            "proxy": "eip1167",
+            "proxy_target": Web3.to_checksum_address(code[10:30]),
+            "selfdestruct": False,
+        }
+
+    push4, push32, opcodes = disassemble(code)
+    flags, matched = {}, []
+    for category, selectors in SELECTORS.items():
+        hits = [sig for sel, sig in selectors.items() if sel in push4]
+        flags[category] = bool(hits)
+        matched.extend(hits)
+
+    proxy = None
+    if EIP1967_IMPL_SLOT in push32:
+        proxy = "eip1967"
+    elif OP_DELEGATECALL in opcodes and flags["proxy"]:
+        proxy = "custom"
+    flags["proxy"] = proxy is not None
+
+    return {
+        "flags": flags,
+        "matched": matched,
+        "has_owner": OWNER_SELECTOR in push4,
+        "proxy": proxy,
+        "proxy_target": None,
+        "selfdestruct": OP_SELFDESTRUCT in opcodes,
+    }
+
+
+class TokenScanner:
+    def __init__(self, rpc_url: str, cache_size: int = 2048):
+        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.cache_size = cache_size
+        self._by_hash = OrderedDict()
+
+    async def _analysis_for(self, code: bytes) -> tuple:
+        """Return (code_hash, analysis), reusing any earlier scan of identical code."""
+        code_hash = bytes(Web3.keccak(code)).hex()
+        analysis = self._by_hash.get(code_hash)
+        if analysis is None:
+            stored = await get_code_scan(code_hash)
+            if stored:
+                analysis = json.loads(stored)
+            else:
+                analysis = analyze_bytecode(code)
+                await save_code_scan(code_hash, json.dumps(analysis))
+            self._by_hash[code_hash] = analysis
+            while len(self._by_hash) > self.cache_size:
+                self._by_hash.popitem(last=False)
+        else:
+            self._by_hash.move_to_end(code_hash)
+        return code_hash, analysis
+
+    def _implementation_of(self, address: str, analysis: dict):
+        if analysis["proxy"] == "eip1167":
+            return analysis["proxy_target"]
+        if analysis["proxy"] == "eip1967":
+            slot = bytes(self.w3.eth.get_storage_at(address, int.from_bytes(EIP1967_IMPL_SLOT, "big")))
+            impl = slot[-20:]
+            if any(impl):
+                return Web3.to_checksum_address(impl)
+        return None
+
+    def _get_code(self, address: str) -> bytes:
+        return bytes(self.w3.eth.get_code(address))
+
+    def _owner_of(self, address: str):
+        try:
+            raw = self.w3.eth.call({"to": address, "data": "0x" + OWNER_SELECTOR.hex()})
+            return Web3.to_checksum_address(bytes(raw)[-20:]) if len(raw) >= 20 else None
+        except Exception:
+            return None
+
+    async def scan(self, token_address: str) -> dict:
+        """
+        Scan a token and return its security report:
+        code hash, per-category flags, owner / renounced status and readable risk labels.
+        """
+        # web3's HTTP provider blocks, so RPC calls run in threads, off the event loop
+        address = Web3.to_checksum_address(token_address)
+        code = await asyncio.to_thread(self._get_code, address)
+        if not code:
+            return {"address": address, "is_contract": False, "risks": ["Not a contract"],
+                    "renounced": False, "frozen": False, "flags": {}}
+
+        code_hash, analysis = await self._analysis_for(code)
+        flags = dict(analysis["flags"])
+        has_owner = analysis["has_owner"]
+        implementation = None
+
+        # Privileged functions of a proxy live in its implementation
+        if analysis["proxy"]:
+            implementation = await asyncio.to_thread(self._implementation_of, address, analysis)
+            if implementation:
+                impl_code = await asyncio.to_thread(self._get_code, implementation)
+                if impl_code:
+                    _, impl_analysis = await self._analysis_for(impl_code)
+                    for category, hit in impl_analysis["flags"].items():
+                        flags[category] = flags[category] or hit
+                    has_owner = has_owner or impl_analysis["has_owner"]
+
+        privileged = any(flags[c] for c in ("mint", "blacklist", "fees", "pause", "proxy"))
+
+        # Ownership is per-token state, so it is the one thing read beyond the code
+        owner = await asyncio.to_thread(self._owner_of, address) if has_owner else None
+        renounced = (owner == ZERO_ADDRESS) if has_owner else not privileged
+        active = privileged and not renounced
+
+        return {
+            "address": address,
+            "is_contract": True,
+            "code_hash": code_hash,
+            "flags": flags,
+            "matched": analysis["matched"],
+            "proxy": analysis["proxy"],
+            "implementation": implementation,
+            "owner": owner,
+            "renounced": renounced,
+            "frozen": active and (flags["blacklist"] or flags["pause"]),
+            # An upgradeable proxy stays a risk even with Ownable renounced (it may have a separate admin)
+            "risks": [label for c, label in RISK_LABELS.items() if flags.get(c) and (active or c == "proxy")],
+        }
+
+# Global instance for use in the bot
+_scanner = None
+
+def get_scanner() -> TokenScanner:
+    global _scanner
+    if _scanner is None:
+        _scanner = TokenScanner(BASE_RPC_URL)
+    return _scanner
@@ -0,0 +1,65 @@
+"""
+Concurrent update processing with per-user ordering.
+
+By default python-telegram-bot handles one update at a time, so one user's slow
+trade stalls everyone. With this processor, different users' updates run in
+parallel, up to BASEFLOW_MAX_CONCURRENT_UPDATES handlers at once. Each user's own
+updates still run one after another, in arrival order, because context.user_data
+state machines (awaiting_config, awaiting_confirmation, ...) depend on it.
+Updates without a user, such as channel posts, only count against the cap.
+"""
+import asyncio
+import os
+import sys
+from typing import Any, Awaitable
+
+from dotenv import load_dotenv
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+load_dotenv()
+
+MAX_CONCURRENT_UPDATES = int(os.getenv("BASEFLOW_MAX_CONCURRENT_UPDATES", "64"))
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int = MAX_CONCURRENT_UPDATES):
+        # The base class takes its semaphore before do_process_update, so a user's
+        # queued updates would hold slots while they wait for their turn. It is left
+        # unbounded and the cap is applied below, once the user's lock is held.
+        super().__init__(sys.maxsize)
+        self.max_running_updates = max_concurrent_updates
+        self.running_updates = 0
+        self._running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        # user_id -> [lock, updates holding or waiting for it]
+        self._user_locks = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        user = update.effective_user if isinstance(update, Update) else None
+        if user is None:
+            async with self._running:
+                await self._run(coroutine)
+            return
+
+        entry = self._user_locks.setdefault(user.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0], self._running:
+                await self._run(coroutine)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._user_locks[user.id]
+
+    async def _run(self, coroutine: Awaitable[Any]) -> None:
+        self.running_updates += 1
+        try:
+            await coroutine
+        finally:
+            self.running_updates -= 1
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
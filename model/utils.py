@@ -9,4 +9,13 @@ def escape_markdown_v2(text:str) -> str:
 
 def shorten_address(address: str, chars: int = 4) -> str:
     """Shorten an ethereum address to a specific number of characters"""
-    return f"{address[:chars]}...{address[-chars:]}"
\ No newline at end of file
+    return f"{address[:chars]}...{address[-chars:]}"
+
+def format_honeypot(info: dict) -> str:
+    """Human readable honeypot status with simulated taxes, from a get_token_info result"""
+    status = info.get("honeypot")
+    if status is None:
+        return "❔ Unchecked"
+    if status:
+        return "🚨 Detected"
+    return f"✅ Clean (tax {info.get('buy_tax', 0):.1%} / {info.get('sell_tax', 0):.1%})"
@@ -0,0 +1,232 @@
+"""
+Vanity and bulk wallet generation on every CPU core.
+
+Worker processes search independently and send matching wallets back to the
+parent. VanityJob.stream() yields the results in batches, so callers can
+persist them as they arrive.
+
+For a pattern search, each worker runs WALKS walks over keys k, k+1, k+2, ...,
+each from a random k. The next public key is one point addition instead of a
+full scalar multiplication. A single modular inverse serves all of a worker's
+walks (Montgomery's batch inversion), so each attempt costs little more than
+its keccak hash. A walk that finds a match restarts from a fresh random key, so
+no two returned wallets are related. Without a pattern every key matches, so
+each wallet gets an independent key.
+
+Ops can pre-generate wallets for a campaign account with:
+    python vanity.py generate <user_id> <count> [--prefix abc] [--suffix def]
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import secrets
+import sys
+import time
+
+from dotenv import load_dotenv
+from eth_hash.auto import keccak
+from eth_keys import keys
+from eth_utils import to_checksum_address
+
+load_dotenv()
+
+VANITY_WORKERS = int(os.getenv("BASEFLOW_VANITY_WORKERS", "0")) or os.cpu_count() or 1
+VANITY_MAX_SECONDS = int(os.getenv("BASEFLOW_VANITY_MAX_SECONDS", "600"))
+# Longest prefix + suffix users may ask for from the bot; each character is 16x the work
+VANITY_MAX_PATTERN = int(os.getenv("BASEFLOW_VANITY_MAX_PATTERN", "5"))
+# Searches use every core, so the bot runs this many at a time
+VANITY_MAX_JOBS = int(os.getenv("BASEFLOW_VANITY_MAX_JOBS", "1"))
+VANITY_BATCH_SIZE = 100
+PROGRESS_SECONDS = 5
+REPORT_EVERY = 5000  # attempts between a worker's counter updates and stop checks
+WALKS = 64  # parallel walks per worker sharing one modular inverse per step
+
+# secp256k1
+_P = 2**256 - 2**32 - 977
+_N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+_GX = 0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798
+_GY = 0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8
+
+_HEX_DIGITS = set("0123456789abcdef")
+
+
+def normalize_pattern(pattern: str) -> str:
+    """Lowercase a prefix/suffix (an optional 0x is dropped); raises ValueError unless it's hex."""
+    pattern = (pattern or "").lower()
+    if pattern.startswith("0x"):
+        pattern = pattern[2:]
+    if not set(pattern) <= _HEX_DIGITS:
+        raise ValueError("Address patterns may only use 0-9 and a-f")
+    if len(pattern) > 40:
+        raise ValueError("Address patterns can't be longer than an address")
+    return pattern
+
+
+def _walk_start() -> tuple:
+    key = 0
+    while not 0 < key < _N:
+        key = int.from_bytes(secrets.token_bytes(32), "big")
+    public_key = keys.PrivateKey(key.to_bytes(32, "big")).public_key.to_bytes()
+    return key, int.from_bytes(public_key[:32], "big"), int.from_bytes(public_key[32:], "big")
+
+
+def _search(prefix: str, suffix: str, results, attempts, stop) -> None:
+    """Worker process: put every matching (private_key, address) on `results` until `stop` is set."""
+    walks = [list(_walk_start()) for _ in range(WALKS)]
+    partials = [0] * WALKS
+    tried = 0
+    while True:
+        matched = False
+        for walk in walks:
+            key, x, y = walk
+            address = keccak(x.to_bytes(32, "big") + y.to_bytes(32, "big"))[-20:].hex()
+            if address.startswith(prefix) and address.endswith(suffix):
+                results.put(("0x%064x" % key, to_checksum_address("0x" + address)))
+                walk[:] = _walk_start()
+                matched = True
+        tried += WALKS
+
+        # Step every walk by G: invert all (GX - x) with one pow() via running products
+        product = 1
+        for i, walk in enumerate(walks):
+            partials[i] = product
+            product = product * (_GX - walk[1]) % _P
+        inverse = pow(product, -1, _P)
+        for i in range(WALKS - 1, -1, -1):
+            walk = walks[i]
+            key, x, y = walk
+            slope = (_GY - y) * (inverse * partials[i]) % _P
+            inverse = inverse * (_GX - x) % _P
+            next_x = (slope * slope - x - _GX) % _P
+            walk[0], walk[1], walk[2] = key + 1, next_x, (slope * (x - next_x) - y) % _P
+
+        if matched or tried >= REPORT_EVERY:
+            with attempts.get_lock():
+                attempts.value += tried
+            tried = 0
+            if stop.is_set():
+                return
+
+
+def _worker_context():
+    """
+    fork where available: spawned (and fork-server) workers re-import the bot's
+    main module. Forking the threaded bot process is safe here because workers
+    only use their own arguments and never a lock another thread could hold.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+class VanityJob:
+    def __init__(self, count: int = 1, prefix: str = "", suffix: str = "",
+                 workers: int = VANITY_WORKERS, batch_size: int = VANITY_BATCH_SIZE,
+                 max_seconds: int = VANITY_MAX_SECONDS):
+        self.count = count
+        self.prefix = normalize_pattern(prefix)
+        self.suffix = normalize_pattern(suffix)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_seconds = max_seconds
+        self.found = 0
+        self.cancelled = False
+        self.timed_out = False
+        self.started = None
+        self._ctx = _worker_context()
+        self._stop = self._ctx.Event()
+        self._attempts = self._ctx.Value("Q", 0)
+        self._results = self._ctx.Queue()
+
+    @property
+    def expected_attempts(self) -> int:
+        return 16 ** (len(self.prefix) + len(self.suffix)) * self.count
+
+    def progress(self) -> dict:
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        attempts = self._attempts.value
+        return {
+            "found": self.found,
+            "count": self.count,
+            "attempts": attempts,
+            "expected_attempts": self.expected_attempts,
+            "rate": attempts / elapsed if elapsed else 0.0,
+            "elapsed": elapsed,
+        }
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        self._stop.set()
+
+    async def stream(self, on_progress=None):
+        """
+        Run the search, yielding lists of (private_key, address) until `count` are
+        found, the job is cancelled or max_seconds pass. `on_progress` (async, given
+        progress()) is called every PROGRESS_SECONDS.
+        """
+        processes = [
+            self._ctx.Process(
+                target=_search, args=(self.prefix, self.suffix, self._results, self._attempts, self._stop), daemon=True
+            )
+            for _ in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+        self.started = time.monotonic()
+        next_progress = self.started + PROGRESS_SECONDS
+
+        try:
+            while self.found < self.count and not self._stop.is_set():
+                batch = []
+                try:
+                    batch.append(await asyncio.to_thread(self._results.get, True, 0.5))
+                    while len(batch) < min(self.batch_size, self.count - self.found):
+                        batch.append(self._results.get_nowait())
+                except queue.Empty:
+                    pass
+                batch = batch[:self.count - self.found]
+                if batch:
+                    self.found += len(batch)
+                    yield batch
+
+                now = time.monotonic()
+                if now - self.started > self.max_seconds:
+                    self.timed_out = True
+                    break
+                if on_progress and now >= next_progress:
+                    await on_progress(self.progress())
+                    next_progress = now + PROGRESS_SECONDS
+        finally:
+            self._stop.set()
+            await asyncio.to_thread(self._shutdown, processes)
+
+    def _shutdown(self, processes: list) -> None:
+        for process in processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._results.close()
+
+
+async def _generate(user_id: int, count: int, prefix: str, suffix: str) -> None:
+    from store_to_db import create_wallets_db, init_db
+
+    async def report(progress: dict) -> None:
+        print(f"⏳ {progress['found']}/{count} wallets, {progress['attempts']:,} attempts ({progress['rate']:,.0f}/s)")
+
+    init_db()
+    job = VanityJob(count, prefix, suffix, batch_size=500, max_seconds=sys.maxsize)
+    async for batch in job.stream(report):
+        await create_wallets_db(user_id, batch)
+    print(f"✅ Stored {job.found} wallets for user {user_id} in {job.progress()['elapsed']:.1f}s")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) >= 3 and args[0] == "generate":
+        options = dict(zip(args[3::2], args[4::2]))
+        asyncio.run(_generate(int(args[1]), int(args[2]), options.get("--prefix", ""), options.get("--suffix", "")))
+    else:
+        print(__doc__)
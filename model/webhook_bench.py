@@ -0,0 +1,218 @@
+"""
+Local end-to-end latency harness for webhook mode.
+
+Runs the bot's webhook server in process, pointed at a stand-in Bot API server,
+and posts updates to it (with the secret token header) from many simulated users
+at once. Latency runs from the POST until every handler for the update has
+finished. It covers the HTTP server, the update queue, per-user ordering, the
+handlers and the database.
+
+    python webhook_bench.py [--updates recorded.jsonl] [--users 50] [--rounds 5]
+                            [--api-latency-ms 0] [--port 8479]
+
+Recorded updates are Telegram Update JSON objects, one per line. Each simulated
+user replays them under its own user and chat id. Without a file, a mix of
+database-backed commands is sent. The bot runs on a scratch copy of the
+database unless BASEFLOW_DB_PATH is set, and never talks to Telegram.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+BENCH_TOKEN = "123456:webhook-bench"
+BENCH_USER_BASE = 9_000_000_000  # far from real Telegram ids in a copied database
+DEFAULT_COMMANDS = ["/help", "/settings", "/wallet", "/profile", "/Trades"]
+UPDATE_TIMEOUT = 30
+
+
+def _command_update(text: str) -> dict:
+    return {
+        "update_id": 0,
+        "message": {
+            "message_id": 1, "date": int(time.time()), "text": text,
+            "chat": {"id": 0, "type": "private"},
+            "from": {"id": 0, "is_bot": False, "first_name": "Bench"},
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+        },
+    }
+
+
+def _retarget(template: dict, update_id: int, user_id: int) -> dict:
+    """A copy of a recorded update, as if sent by `user_id` in their private chat."""
+    update = json.loads(json.dumps(template))
+    update["update_id"] = update_id
+    for key in ("message", "edited_message", "callback_query"):
+        body = update.get(key)
+        if not body:
+            continue
+        if "from" in body:
+            body["from"]["id"] = user_id
+        message = body.get("message", body)
+        if "chat" in message:
+            message["chat"]["id"] = user_id
+    return update
+
+
+class FakeBotApi:
+    """Answers the Bot API methods the handlers call, after an optional delay."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self._message_id = 0
+
+    async def call(self, method: str, params: dict):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        method = method.lower()
+        if method == "getme":
+            return {"id": 123456, "is_bot": True, "first_name": "BaseFlow Bench", "username": "baseflow_bench_bot"}
+        if method in ("sendmessage", "editmessagetext", "senddocument", "sendphoto"):
+            self._message_id += 1
+            return {
+                "message_id": self._message_id, "date": int(time.time()), "text": params.get("text", ""),
+                "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+            }
+        return True
+
+    def serve(self) -> int:
+        """Start serving on a free local port (on the running loop) and return it."""
+        from tornado.httpserver import HTTPServer
+        from tornado.netutil import bind_sockets
+        from tornado.web import Application as TornadoApplication, RequestHandler
+
+        api = self
+
+        class Handler(RequestHandler):
+            async def post(self, method):
+                params = {k: self.get_body_argument(k) for k in self.request.body_arguments}
+                self.write({"ok": True, "result": await api.call(method, params)})
+
+        sockets = bind_sockets(0, "127.0.0.1")
+        server = HTTPServer(TornadoApplication([(r"/bot[^/]+/(\w+)", Handler)]))
+        server.add_sockets(sockets)
+        return sockets[0].getsockname()[1]
+
+
+async def run_bench(templates: list, users: int, rounds: int, api_latency: float, port: int) -> dict:
+    import httpx
+    from telegram import Update
+    from telegram.ext import TypeHandler
+    from baseflow_bot import WEBHOOK_MAX_CONNECTIONS, WEBHOOK_PATH, WEBHOOK_SECRET, build_application
+    from telegram_http import pool_stats
+
+    api = FakeBotApi(api_latency)
+    api_port = api.serve()
+    app = build_application(base_url=f"http://127.0.0.1:{api_port}/bot", background_tasks=False)
+
+    handled = {}
+
+    async def mark_handled(update: Update, context) -> None:
+        waiter = handled.pop(update.update_id, None)
+        if waiter and not waiter.done():
+            waiter.set_result(time.perf_counter())
+
+    # Groups run in order, so this fires once the real handlers are done
+    app.add_handler(TypeHandler(Update, mark_handled), group=99)
+
+    latencies = []
+    timeouts = 0
+    update_ids = iter(range(1, 1 << 62))
+    url = f"http://127.0.0.1:{port}/{WEBHOOK_PATH}"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET}
+
+    async def simulate_user(client, user_id: int) -> None:
+        nonlocal timeouts
+        for _ in range(rounds):
+            for template in templates:
+                update = _retarget(template, next(update_ids), user_id)
+                waiter = asyncio.get_running_loop().create_future()
+                handled[update["update_id"]] = waiter
+                started = time.perf_counter()
+                response = await client.post(url, json=update, headers=headers)
+                response.raise_for_status()
+                try:
+                    latencies.append(await asyncio.wait_for(waiter, UPDATE_TIMEOUT) - started)
+                except asyncio.TimeoutError:
+                    timeouts += 1
+
+    async with app:
+        await app.updater.start_webhook(listen="127.0.0.1", port=port, url_path=WEBHOOK_PATH, secret_token=WEBHOOK_SECRET)
+        await app.start()
+        try:
+            limits = httpx.Limits(max_connections=WEBHOOK_MAX_CONNECTIONS)
+            async with httpx.AsyncClient(limits=limits, timeout=UPDATE_TIMEOUT) as client:
+                # A request without the secret must be turned away
+                rejected = (await client.post(url, json=_retarget(templates[0], 0, BENCH_USER_BASE))).status_code
+                started = time.perf_counter()
+                await asyncio.gather(*(simulate_user(client, BENCH_USER_BASE + i) for i in range(users)))
+                elapsed = time.perf_counter() - started
+        finally:
+            await app.updater.stop()
+            await app.stop()
+
+    return {
+        "updates": len(latencies) + timeouts, "elapsed": elapsed, "latencies": latencies,
+        "timeouts": timeouts, "api_calls": api.calls, "rejected_status": rejected,
+        "pool": pool_stats()["interactive"],
+    }
+
+
+def _report(result: dict, users: int) -> None:
+    latencies = sorted(result["latencies"])
+    print(f"📊 {result['updates']} updates from {users} users in {result['elapsed']:.2f}s "
+          f"({result['updates'] / result['elapsed']:.0f} updates/s)")
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        print(f"⏱️ Handler latency: p50 {cuts[49] * 1000:.1f} ms | p95 {cuts[94] * 1000:.1f} ms | "
+              f"p99 {cuts[98] * 1000:.1f} ms | max {latencies[-1] * 1000:.1f} ms")
+    print(f"📨 Bot API calls: {result['api_calls']} | Timeouts: {result['timeouts']} | "
+          f"Request without secret: HTTP {result['rejected_status']}")
+    pool = result["pool"]
+    print(f"📡 Interactive pool wait: avg {pool['avg_wait_ms']:.1f} ms | p95 {pool['p95_wait_ms']:.1f} ms | "
+          f"max {pool['max_wait_ms']:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Webhook end-to-end latency harness")
+    parser.add_argument("--updates", help="JSON-lines file of recorded Telegram updates")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--api-latency-ms", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8479)
+    args = parser.parse_args()
+
+    if args.updates:
+        with open(args.updates) as f:
+            templates = [json.loads(line) for line in f if line.strip()]
+    else:
+        templates = [_command_update(command) for command in DEFAULT_COMMANDS]
+
+    # Set before baseflow_bot is imported: it reads these at import time
+    os.environ["BASEFLOW_BOT_API"] = BENCH_TOKEN
+    # The stand-in Bot API is plain http://, where HTTP/2 would need prior knowledge
+    os.environ["BASEFLOW_HTTP2"] = "0"
+    scratch = None
+    if not os.getenv("BASEFLOW_DB_PATH"):
+        scratch = tempfile.mkdtemp(prefix="baseflow_bench_")
+        source = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wallet.db")
+        if os.path.exists(source):
+            shutil.copy(source, os.path.join(scratch, "wallet.db"))
+        os.environ["BASEFLOW_DB_PATH"] = os.path.join(scratch, "wallet.db")
+
+    try:
+        result = asyncio.run(run_bench(templates, args.users, args.rounds, args.api_latency_ms / 1000, args.port))
+        _report(result, args.users)
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Write-behind queue for high-frequency writes (trades, volume, signals, price ticks).
+
+Writes submitted within a few milliseconds of each other (or until a batch is
+full) are handed to the storage engine as one batch, applied in a single
+transaction with each write in its own savepoint, so a failing write doesn't
+take the rest of the batch down.
+
+Trade rows honour BASEFLOW_TRADE_DURABILITY:
+  sync    - the swap waits until its trade row is committed (default)
+  batched - the trade is queued like everything else and the swap returns at once
+"""
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+from storage import get_storage
+from store_to_db import save_trade_with_volume
+
+load_dotenv()
+
+WRITE_BATCH_SIZE = int(os.getenv("BASEFLOW_WRITE_BATCH_SIZE", "200"))
+WRITE_BATCH_DELAY = float(os.getenv("BASEFLOW_WRITE_BATCH_MS", "5")) / 1000
+TRADE_DURABILITY = os.getenv("BASEFLOW_TRADE_DURABILITY", "sync").lower()
+
+
+def _report_failure(future: asyncio.Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        print(f"❌ Write-behind error: {future.exception()}")
+
+
+class WriteBehindQueue:
+    def __init__(self, max_batch: int = WRITE_BATCH_SIZE, max_delay: float = WRITE_BATCH_DELAY):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = []
+        self._wakeup = None
+        self._full = None
+        self._task = None
+        self._closed = False
+
+    def submit(self, fn, *args, **kwargs) -> asyncio.Future:
+        """
+        Queue a store_to_db write (a @write_op function) and return a future that
+        resolves once its batch is committed. Callers that don't need durability
+        can ignore the future; failures are logged either way.
+        """
+        if self._closed:
+            raise RuntimeError("Write-behind queue is closed")
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._full = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_report_failure)
+        self._pending.append((fn, args, kwargs, future))
+        self._wakeup.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        return future
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if not self._closed:
+                # Give concurrent writers a few milliseconds to join the batch
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            await self._commit_pending()
+            if self._closed and not self._pending:
+                return
+
+    async def _commit_pending(self):
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if not self._pending:
+            self._wakeup.clear()
+        if len(self._pending) < self.max_batch:
+            self._full.clear()
+        if not batch:
+            return
+
+        try:
+            results = await get_storage().apply_batch([(fn, args, kwargs) for fn, args, kwargs, _ in batch])
+        except Exception as e:
+            # The commit itself failed: nothing in the batch was stored
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (*_, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    async def flush(self) -> None:
+        """Commit everything queued so far."""
+        while self._pending:
+            await self._commit_pending()
+
+    async def close(self) -> None:
+        """Stop accepting writes and wait until everything queued is committed (called on shutdown)."""
+        self._closed = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+# Global instance for use in the bot
+_queue = None
+
+def get_write_queue() -> WriteBehindQueue:
+    global _queue
+    if _queue is None:
+        _queue = WriteBehindQueue()
+    return _queue
+
+
+async def record_trade(token_address: str, **trade) -> None:
+    """
+    Queue a successful swap: the trade row plus the traded token's volume.
+    `token_address` is the non-ETH side; `trade` takes save_trade's arguments
+    and must include `eth_value_wei`.
+    """
+    write = get_write_queue().submit(save_trade_with_volume, token_address, **trade)
+    # Volume alerts count the same trades as the rollups
+    try:
+        from alert_index import get_alert_index
+        get_alert_index().on_volume(token_address, trade.get("eth_value_wei"))
+    except Exception as e:
+        print(f"⚠️ Alert matching error: {e}")
+    if TRADE_DURABILITY == "sync":
+        await write